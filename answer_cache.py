@@ -0,0 +1,77 @@
+"""
+In-process LRU cache for answers of the simple assistant
+"""
+
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+WHITESPACE_PATTERN = re.compile(r"\s+")
+# Punctuation outside words ("?", "(", trailing "."); "S7-1500", "16#8087" and "I0.0" stay intact,
+# and so do double quotes, which make a "quoted phrase" a different question
+LOOSE_PUNCTUATION_PATTERN = re.compile(r'(?<!\w)[^\w\s"]+|[^\w\s"]+(?!\w)')
+
+def normalize_question(question: str) -> str:
+    """Case-fold, strip loose punctuation and collapse whitespace so near-variants share a key"""
+    text = LOOSE_PUNCTUATION_PATTERN.sub(" ", question.casefold())
+    return WHITESPACE_PATTERN.sub(" ", text).strip()
+
+class AnswerCache:
+    """Size- and TTL-bounded LRU mapping of cache keys to answers"""
+
+    def __init__(self, max_size: int = 256, ttl: float = 300.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries: "OrderedDict[Hashable, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Optional[Dict[str, Any]]:
+        """Return a cached answer and mark it recently used, or None on a miss"""
+        with self.lock:
+            cached = self.entries.get(key)
+            if cached is not None:
+                expires_at, value = cached
+                if expires_at > time.monotonic():
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                # Expired answers count as evictions
+                del self.entries[key]
+                self.evictions += 1
+            self.misses += 1
+            return None
+
+    def put(self, key: Hashable, value: Dict[str, Any]):
+        """Store an answer, evicting the least recently used ones beyond max_size"""
+        if self.max_size <= 0:
+            return
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Drop all cached answers, keeping the counters"""
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss/eviction counters and current occupancy"""
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size": len(self.entries),
+                "max_size": self.max_size,
+                "ttl": self.ttl,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0
+            }
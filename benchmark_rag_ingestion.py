@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Benchmark script for the RAG assistant's document ingestion
+"""
+
+import os
+import sys
+from pathlib import Path
+from typing import List, Optional
+from pdf_ingestion import extract_pdf_files
+from embedding_cache import CachedEmbeddings
+
+PDF_DIRS = ["./siemens_docs", "./manuals", "./pdfs"]
+
+def pdf_files_in(pdf_dirs: List[str]) -> List[Path]:
+    """Return the PDFs the assistant would load from pdf_dirs, in loading order"""
+    pdf_files = []
+    for pdf_dir_path in pdf_dirs:
+        pdf_dir = Path(pdf_dir_path)
+        if pdf_dir.exists():
+            pdf_files.extend(sorted(set(pdf_dir.glob("*.pdf")) | set(pdf_dir.glob("*.PDF"))))
+    return pdf_files
+
+def benchmark_pdf_extraction(pdf_dirs: Optional[List[str]] = None, worker_counts: Optional[List[int]] = None):
+    """Compare pages per second of extracting the PDF directories with 1 to 8 worker processes"""
+
+    print("\n⏱️  PDF Extraction")
+    print("=" * 30)
+
+    pdf_dirs = pdf_dirs or PDF_DIRS
+    worker_counts = worker_counts or [1, 2, 4, 8]
+
+    pdf_files = pdf_files_in(pdf_dirs)
+    if not pdf_files:
+        print(f"⚠️  No PDFs found in {', '.join(pdf_dirs)}")
+        return True
+    print(f"📄 {len(pdf_files)} PDFs, {os.cpu_count() or 1} CPU cores")
+
+    baseline = None
+    for workers in worker_counts:
+        pages, stats = extract_pdf_files(pdf_files, workers)
+        # Parallel extraction must give the serial output, in the same order
+        if baseline is None:
+            baseline = pages
+        elif pages != baseline:
+            print(f"❌ {workers} workers extracted different pages than 1 worker")
+            return False
+        print(f"   {workers} workers: {stats['pages']} pages in {stats['seconds']:.2f} s, {stats['pages_per_second']:.1f} pages/s")
+
+    return True
+
+def benchmark_embedding_throughput(num_chunks: int = 2000, batch_sizes: Optional[List[int]] = None,
+                                   pdf_dirs: Optional[List[str]] = None):
+    """Compare chunks per second of embedding with each batch size, sorted by length and unsorted"""
+
+    print("\n⏱️  Embedding Throughput")
+    print("=" * 30)
+
+    batch_sizes = batch_sizes or [16, 32, 64, 128]
+    pdf_dirs = pdf_dirs or PDF_DIRS
+
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+    from langchain_community.embeddings import HuggingFaceEmbeddings
+
+    # Chunks as process_documents makes them: of the local PDFs, or varied-length synthetic text without any
+    pages, _ = extract_pdf_files(pdf_files_in(pdf_dirs))
+    texts = [text for file_pages in pages if file_pages for _, text in file_pages]
+    if not texts:
+        texts = [" ".join(["PROFINET device configuration in TIA Portal"] * (1 + i % 25)) for i in range(num_chunks)]
+    splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
+    chunks = [chunk for text in texts for chunk in splitter.split_text(text)][:num_chunks]
+    print(f"🧩 {len(chunks)} chunks, {os.cpu_count() or 1} CPU cores")
+
+    for batch_size in batch_sizes:
+        for sort_by_length in (True, False):
+            model = HuggingFaceEmbeddings(
+                model_name="sentence-transformers/all-MiniLM-L6-v2",
+                model_kwargs={'device': 'cpu'},
+                encode_kwargs={'normalize_embeddings': True, 'batch_size': batch_size}
+            )
+            # No cache, so every chunk is embedded
+            embeddings = CachedEmbeddings(model, None, "benchmark", batch_size=batch_size, sort_by_length=sort_by_length)
+            embeddings.embed_documents(chunks)
+            stats = embeddings.stats()
+            print(f"   batch {batch_size}, {'sorted' if sort_by_length else 'unsorted'}: {stats['chunks_per_second']:.1f} chunks/s")
+
+    return True
+
+def main():
+    """Run all benchmarks"""
+
+    print("🚀 RAG Ingestion Benchmarks")
+    print("=" * 60)
+
+    benchmarks = [
+        ("PDF Extraction", benchmark_pdf_extraction),
+        ("Embedding Throughput", benchmark_embedding_throughput)
+    ]
+
+    failed = 0
+    for name, benchmark in benchmarks:
+        print(f"\n📊 Running {name} benchmark...")
+        if not benchmark():
+            failed += 1
+
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,383 @@
+#!/usr/bin/env python3
+"""
+Benchmark script for the Simple Siemens PLC QA Assistant
+"""
+
+import gc
+import json
+import os
+import signal
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import List, Optional
+from simple_plc_assistant import SimplePLCQAAssistant
+from knowledge_artifact import build_artifact
+import knowledge_index
+from knowledge_index import KnowledgeIndex, KnowledgeEntry
+
+BENCHMARK_QUESTIONS = [
+    "What is the difference between S7-1500 and S7-1200?",
+    "What programming languages are supported in TIA Portal?",
+    "How do I configure PROFINET communication?",
+    "What is the difference between PROFINET RT and IRT?",
+    "How do I troubleshoot communication errors?",
+    "PROFINET error 16#8087",
+    "What is retain memory?",
+    "How do I configure a safety function?",
+    "What is the difference between optimized and non-optimized data blocks?",
+    "How do I use ladder logic?"
+]
+
+def synthetic_entries(num_entries: int) -> List[dict]:
+    """Return num_entries numbered copies of the built-in entries"""
+    builtin = SimplePLCQAAssistant(artifact_path="", knowledge_dir="").knowledge_base
+    entries = []
+    for i in range(num_entries):
+        item = builtin[i % len(builtin)]
+        entries.append({
+            "title": f"{item['title']} #{i}",
+            "keywords": item["keywords"],
+            "content": f"{item['content']}\nArticle {i}"
+        })
+    return entries
+
+def synthetic_assistant(num_entries: int, **kwargs) -> SimplePLCQAAssistant:
+    """Build an assistant over num_entries copies of the built-in entries"""
+    return SimplePLCQAAssistant.from_entries(synthetic_entries(num_entries), **kwargs)
+
+def unique_rss_kb(pid: int) -> int:
+    """Return the private (not shared with other processes) resident memory of a process in kB"""
+    total = 0
+    with open(f"/proc/{pid}/smaps_rollup") as file:
+        for line in file:
+            if line.startswith(("Private_Clean:", "Private_Dirty:")):
+                total += int(line.split()[1])
+    return total
+
+def time_calls(func, questions, repeat: int = 50) -> float:
+    """Return the mean latency of func over the questions in microseconds"""
+    start_time = time.perf_counter()
+    for _ in range(repeat):
+        for question in questions:
+            func(question)
+    elapsed = time.perf_counter() - start_time
+    return elapsed / (repeat * len(questions)) * 1e6
+
+def benchmark_ranking_modes():
+    """Compare latency and top results of the legacy and BM25 scorers"""
+
+    print("\n⏱️  Ranking Mode Comparison")
+    print("=" * 30)
+
+    assistant = SimplePLCQAAssistant()
+
+    for ranking in ["legacy", "bm25"]:
+        latency = time_calls(lambda q: assistant.search_knowledge(q, ranking=ranking), BENCHMARK_QUESTIONS)
+        print(f"🔍 {ranking}: {latency:.1f} µs per search")
+
+    print("\n📋 Top result per question (legacy | bm25):")
+    for question in BENCHMARK_QUESTIONS:
+        tops = []
+        for ranking in ["legacy", "bm25"]:
+            results = assistant.search_knowledge(question, ranking=ranking)
+            tops.append(results[0]["title"] if results else "-")
+        print(f"   {question}\n      {tops[0]} | {tops[1]}")
+
+    return True
+
+def benchmark_top_k():
+    """Measure search latency across the supported range of k"""
+
+    print("\n⏱️  Top-k Retrieval")
+    print("=" * 30)
+
+    assistant = SimplePLCQAAssistant()
+
+    for k in [1, 3, 10, 20]:
+        for ranking in ["legacy", "bm25"]:
+            latency = time_calls(lambda q: assistant.search_knowledge(q, ranking=ranking, k=k), BENCHMARK_QUESTIONS)
+            print(f"🔍 k={k:<2} {ranking}: {latency:.1f} µs per search")
+
+    return True
+
+def benchmark_startup():
+    """Compare assistant construction from the built-in literal and from a compiled artifact"""
+
+    print("\n⏱️  Startup Time")
+    print("=" * 30)
+
+    source = SimplePLCQAAssistant(artifact_path="")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "kb.plckb")
+        info = build_artifact(source.knowledge_base, source.index, path)
+        print(f"📦 Artifact: {info['header_bytes']} index bytes, {info['body_bytes']} body bytes")
+
+        for label, artifact_path in [("built-in", ""), ("artifact", path)]:
+            start_time = time.perf_counter()
+            for _ in range(20):
+                SimplePLCQAAssistant(artifact_path=artifact_path)
+            elapsed = (time.perf_counter() - start_time) / 20
+            print(f"🚀 {label}: {elapsed * 1000:.2f} ms per assistant")
+
+    return True
+
+def measure_workers(preload: bool, freeze: bool, num_workers: int, num_entries: int) -> List[int]:
+    """Fork workers like gunicorn does and return each worker's unique RSS after serving questions"""
+    assistant = None
+    if preload:
+        # What gunicorn.conf.py does: build in the master, then freeze before forking
+        assistant = synthetic_assistant(num_entries)
+        if freeze:
+            gc.collect()
+            gc.freeze()
+
+    workers = []
+    for _ in range(num_workers):
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            worker_assistant = assistant or synthetic_assistant(num_entries)
+            for question in BENCHMARK_QUESTIONS:
+                worker_assistant.ask_question(question)
+            gc.collect()  # A collection in the worker is what dirties unfrozen shared pages
+            os.write(write_fd, b"1")
+            signal.pause()
+            os._exit(0)
+        os.close(write_fd)
+        workers.append((pid, read_fd))
+
+    sizes = []
+    for pid, read_fd in workers:
+        os.read(read_fd, 1)
+        os.close(read_fd)
+        sizes.append(unique_rss_kb(pid))
+    for pid, _ in workers:
+        os.kill(pid, signal.SIGTERM)
+        os.waitpid(pid, 0)
+
+    if freeze:
+        gc.unfreeze()
+    return sizes
+
+def benchmark_worker_memory(num_workers: int = 4, num_entries: int = 5000):
+    """Report per-worker unique RSS with and without preloading in the master"""
+
+    print("\n💾 Per-worker Unique RSS")
+    print("=" * 30)
+
+    if not hasattr(os, "fork") or not os.path.exists("/proc/self/smaps_rollup"):
+        print("⚠️  Skipped: requires Linux /proc/<pid>/smaps_rollup")
+        return True
+
+    print(f"👷 {num_workers} workers, {num_entries} entries")
+    variants = [
+        ("per-worker build", False, False),
+        ("preload only", True, False),
+        ("preload + gc.freeze", True, True)
+    ]
+    for label, preload, freeze in variants:
+        sizes = measure_workers(preload, freeze, num_workers, num_entries)
+        average = sum(sizes) / len(sizes)
+        print(f"   {label}: {', '.join(f'{size / 1024:.1f}' for size in sizes)} MB (avg {average / 1024:.1f} MB)")
+
+    return True
+
+def benchmark_batch_questions(num_entries: int = 5000, num_questions: int = 500):
+    """Compare questions per second of ask_questions against looping over ask_question"""
+
+    print("\n⏱️  Batch Question Answering")
+    print("=" * 30)
+
+    questions = [f"{question} {i}" for i, question in enumerate(BENCHMARK_QUESTIONS * (num_questions // len(BENCHMARK_QUESTIONS)))]
+    backend = "SciPy sparse matrices" if knowledge_index.sparse is not None else "postings fallback (SciPy not installed)"
+    print(f"📚 {num_entries} entries, {len(questions)} questions, {backend}")
+
+    for ranking in ["legacy", "bm25"]:
+        # Caching disabled so both paths do the full work for every question
+        assistant = synthetic_assistant(num_entries, ranking=ranking, cache_size=0)
+
+        start_time = time.perf_counter()
+        for question in questions:
+            assistant.ask_question(question)
+        loop_rate = len(questions) / (time.perf_counter() - start_time)
+
+        start_time = time.perf_counter()
+        assistant.ask_questions(questions)
+        batch_rate = len(questions) / (time.perf_counter() - start_time)
+
+        print(f"   {ranking}: loop {loop_rate:.0f} q/s, batch {batch_rate:.0f} q/s ({batch_rate / loop_rate:.1f}x)")
+
+    return True
+
+def benchmark_fuzzy_latency(num_entries: int = 5000):
+    """Compare p50/p99 search latency of exact and fuzzy mode on misspelled questions"""
+
+    print("\n⏱️  Fuzzy Search Latency")
+    print("=" * 30)
+
+    typo_questions = [
+        "profinett configuration",
+        "s71500 work memory",
+        "tia protal programming languages",
+        "how to troubleshoot comunication erors",
+        "diagnostik bufer entries",
+        "safetyrelay feedback monitoring",
+        "ladder logik examples"
+    ]
+    assistant = synthetic_assistant(num_entries)
+    print(f"📚 {num_entries} entries")
+
+    for fuzzy in [False, True]:
+        latencies = []
+        for _ in range(30):
+            for question in typo_questions + BENCHMARK_QUESTIONS:
+                start_time = time.perf_counter()
+                assistant.search_knowledge(question, fuzzy=fuzzy)
+                latencies.append((time.perf_counter() - start_time) * 1e6)
+        latencies.sort()
+        p50 = latencies[len(latencies) // 2]
+        p99 = latencies[int(len(latencies) * 0.99)]
+        print(f"   {'fuzzy' if fuzzy else 'exact'}: p50 {p50:.0f} µs, p99 {p99:.0f} µs")
+
+    return True
+
+def benchmark_incremental_reload(sizes: Optional[List[int]] = None):
+    """Compare re-indexing a few edited entries against rebuilding the whole index"""
+
+    print("\n⏱️  Incremental Reload")
+    print("=" * 30)
+
+    sizes = sizes or [5000, 20000]
+
+    for num_entries in sizes:
+        assistant = synthetic_assistant(num_entries, ranking="bm25")
+        index = assistant.index
+        start_time = time.perf_counter()
+        KnowledgeIndex(list(assistant.knowledge_base))
+        full_build = time.perf_counter() - start_time
+        print(f"📚 {num_entries} entries: full rebuild {full_build * 1000:.0f} ms")
+
+        for num_changed in [1, 10, 100]:
+            changes = {
+                doc_id: dict(index.entries[doc_id], content=index.entries[doc_id]["content"] + f"\nRevision {num_changed}")
+                for doc_id in range(0, num_entries, num_entries // num_changed)
+            }
+            start_time = time.perf_counter()
+            index.update_entries(changes)
+            elapsed = time.perf_counter() - start_time
+            print(f"   {num_changed:>3} changed: {elapsed * 1000:.1f} ms")
+
+    return True
+
+def benchmark_sharded_search(num_entries: int = 100000, shard_counts: Optional[List[int]] = None,
+                             num_questions: int = 400, batch_size: int = 50):
+    """Compare build time, latency and throughput per core of searching 1 to 8 shard processes"""
+
+    print("\n⏱️  Sharded Search")
+    print("=" * 30)
+
+    shard_counts = shard_counts or [1, 2, 4, 8]
+
+    cores = os.cpu_count() or 1
+    entries = synthetic_entries(num_entries)
+    questions = [f"{question} {i}" for i, question in enumerate(BENCHMARK_QUESTIONS * (num_questions // len(BENCHMARK_QUESTIONS)))]
+    print(f"📚 {num_entries} entries, {len(questions)} questions, {cores} CPU cores")
+
+    for num_shards in shard_counts:
+        # Caching disabled so every question is searched
+        assistant = SimplePLCQAAssistant(ranking="bm25", cache_size=0)
+        start_time = time.perf_counter()
+        assistant.start_shards(num_shards, entries)
+        build = time.perf_counter() - start_time
+        try:
+            latencies = []
+            for question in questions[:100]:
+                start_time = time.perf_counter()
+                assistant.ask_question(question)
+                latencies.append((time.perf_counter() - start_time) * 1000)
+            latencies.sort()
+
+            start_time = time.perf_counter()
+            for i in range(0, len(questions), batch_size):
+                assistant.ask_questions(questions[i:i + batch_size])
+            rate = len(questions) / (time.perf_counter() - start_time)
+        finally:
+            assistant.stop_shards()
+
+        used_cores = min(num_shards, cores)
+        print(f"   {num_shards} shards: build {build:.1f} s, p50 {latencies[len(latencies) // 2]:.2f} ms, "
+              f"p99 {latencies[int(len(latencies) * 0.99)]:.2f} ms, {rate:.0f} q/s ({rate / used_cores:.0f} q/s per core)")
+
+    return True
+
+def benchmark_entry_memory(num_entries: int = 20000, num_questions: int = 200):
+    """Compare memory per entry of plain dicts and compact records, and allocations per query"""
+
+    print("\n🧮 Entry Memory")
+    print("=" * 30)
+
+    # Entries as they would be loaded from JSON: indented content, keyword strings allocated per entry
+    source = [
+        {"title": item["title"], "keywords": [" ".join(keyword.split()) for keyword in item["keywords"]],
+         "content": "\n".join("        " + line for line in item["content"].splitlines())}
+        for item in synthetic_entries(num_entries)
+    ]
+    document = json.dumps(source)
+    for name, convert in [("dict", dict), ("KnowledgeEntry", KnowledgeEntry.from_item)]:
+        # Everything parsed from the JSON is traced, so each representation's strings are counted
+        gc.collect()
+        tracemalloc.start()
+        loaded = json.loads(document)
+        entries = [convert(item) for item in loaded]
+        del loaded
+        gc.collect()
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"   {name}: {current / len(entries):.0f} bytes per entry")
+        del entries
+
+    assistant = synthetic_assistant(num_entries // 4, cache_size=0)
+    questions = [f"{question} {i}" for i, question in enumerate(BENCHMARK_QUESTIONS * (num_questions // len(BENCHMARK_QUESTIONS)))]
+    for question in questions[:10]:
+        assistant.search_knowledge(question)  # Warm the analyzer memo and lazy structures
+    tracemalloc.start()
+    peaks = []
+    for question in questions:
+        baseline, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        assistant.search_knowledge(question)
+        peaks.append(tracemalloc.get_traced_memory()[1] - baseline)
+    tracemalloc.stop()
+    print(f"   search_knowledge: {sum(peaks) / len(peaks) / 1024:.1f} KB peak allocation per query over {len(questions)} queries")
+
+    return True
+
+def main():
+    """Run all benchmarks"""
+
+    print("🚀 Simple PLC QA Assistant Benchmarks")
+    print("=" * 60)
+
+    benchmarks = [
+        ("Ranking Modes", benchmark_ranking_modes),
+        ("Top-k Retrieval", benchmark_top_k),
+        ("Startup", benchmark_startup),
+        ("Worker Memory", benchmark_worker_memory),
+        ("Batch Questions", benchmark_batch_questions),
+        ("Fuzzy Latency", benchmark_fuzzy_latency),
+        ("Incremental Reload", benchmark_incremental_reload),
+        ("Sharded Search", benchmark_sharded_search),
+        ("Entry Memory", benchmark_entry_memory)
+    ]
+
+    for name, benchmark in benchmarks:
+        print(f"\n📊 Running {name} benchmark...")
+        benchmark()
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
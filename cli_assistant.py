@@ -6,7 +6,7 @@ Command-line interface for the Siemens PLC QA Assistant
 import argparse
 import sys
 from pathlib import Path
-from plc_qa_assistant import SiemensPLCQAAssistant
+from plc_qa_assistant import SiemensPLCQAAssistant, configure_embedding_threads
 
 def main():
     parser = argparse.ArgumentParser(
@@ -45,10 +45,19 @@ Examples:
         help="Path to save/load vector store (default: ./vectorstore)"
     )
     
+    parser.add_argument(
+        "--embedding-threads",
+        type=int,
+        help="Torch threads for the embedding model (default: PLC_EMBEDDING_THREADS, else torch's choice)"
+    )
+    
     args = parser.parse_args()
     
+    # Torch's thread count is process-wide, so it is set once here rather than per assistant
+    configure_embedding_threads(args.embedding_threads)
+    
     # Create assistant instance
-    assistant = SiemensPLCQAAssistant()
+    assistant = SiemensPLCQAAssistant(persist_directory=args.vectorstore_path)
     
     if args.init:
         print("🚀 Initializing Siemens PLC QA Assistant...")
@@ -0,0 +1,140 @@
+"""
+Persistent embedding cache for the RAG assistant
+
+Embeddings are stored in SQLite, keyed by the embedding model and the SHA-256 of
+the chunk text, so rebuilding the vector store, re-chunking or migrating it only
+runs the model on text it has not embedded before. CachedEmbeddings wraps any
+embeddings object with embed_documents/embed_query and is used in its place; it
+also feeds the model fixed-size batches, longest texts first, so each batch pads
+to similar lengths, and times the model to report chunks per second.
+"""
+
+import hashlib
+import sqlite3
+import threading
+import time
+from array import array
+from typing import List, Dict, Any, Optional
+
+DEFAULT_CACHE_PATH = "./embedding_cache.sqlite"
+# SQLite's default limit on host parameters per statement is 999
+LOOKUP_BATCH = 500
+DEFAULT_BATCH_SIZE = 64
+
+def text_hash(text: str) -> str:
+    """SHA-256 of a chunk's text"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+class EmbeddingCache:
+    """SQLite table of float32 embeddings keyed by (model, text hash)"""
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH):
+        self.path = path
+        self.lock = threading.Lock()
+        # Dashboards initialize in a background thread and answer in request threads
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "model TEXT NOT NULL, text_hash TEXT NOT NULL, vector BLOB NOT NULL, "
+            "PRIMARY KEY (model, text_hash))"
+        )
+        self.connection.commit()
+
+    def get_many(self, model: str, hashes: List[str]) -> Dict[str, List[float]]:
+        """Return the cached embeddings among hashes"""
+        found = {}
+        with self.lock:
+            for i in range(0, len(hashes), LOOKUP_BATCH):
+                batch = hashes[i:i + LOOKUP_BATCH]
+                rows = self.connection.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({','.join('?' * len(batch))})",
+                    [model, *batch]
+                )
+                for key, blob in rows:
+                    found[key] = array("f", blob).tolist()
+        return found
+
+    def put_many(self, model: str, vectors: Dict[str, List[float]]):
+        """Store embeddings by text hash"""
+        with self.lock:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, text_hash, vector) VALUES (?, ?, ?)",
+                [(model, key, array("f", vector).tobytes()) for key, vector in vectors.items()]
+            )
+            self.connection.commit()
+
+    def size(self, model: Optional[str] = None) -> int:
+        """Number of cached embeddings, for one model or all"""
+        with self.lock:
+            if model is None:
+                return self.connection.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            return self.connection.execute("SELECT COUNT(*) FROM embeddings WHERE model = ?", (model,)).fetchone()[0]
+
+    def close(self):
+        """Close the database"""
+        with self.lock:
+            self.connection.close()
+
+class CachedEmbeddings:
+    """Embeddings that consult the cache (if any) before the model; queries go straight to the model"""
+
+    def __init__(self, embeddings: Any, cache: Optional[EmbeddingCache], model: str,
+                 batch_size: int = DEFAULT_BATCH_SIZE, sort_by_length: bool = True):
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1")
+        self.embeddings = embeddings
+        self.cache = cache
+        self.model = model  # Cache key: the model name and anything else that changes its vectors
+        self.batch_size = batch_size
+        self.sort_by_length = sort_by_length
+        self.hits = 0
+        self.misses = 0
+        self.embedded = 0  # Texts run through the model, and the seconds it took
+        self.embed_seconds = 0.0
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts, running the model only on those not in the cache"""
+        hashes = [text_hash(text) for text in texts]
+        vectors = self.cache.get_many(self.model, list(dict.fromkeys(hashes))) if self.cache else {}
+        # Each distinct uncached text is embedded once
+        missing = {key: text for key, text in zip(hashes, texts) if key not in vectors}
+        misses = sum(1 for key in hashes if key not in vectors)
+        self.hits += len(texts) - misses
+        self.misses += misses
+        if missing:
+            computed = self.embed_batches(missing)
+            if self.cache:
+                self.cache.put_many(self.model, computed)
+            vectors.update(computed)
+        return [vectors[key] for key in hashes]
+
+    def embed_batches(self, texts: Dict[str, str]) -> Dict[str, List[float]]:
+        """Run the model on texts by hash, batch_size at a time, longest first when sorting"""
+        keys = list(texts)
+        if self.sort_by_length:
+            keys.sort(key=lambda key: len(texts[key]), reverse=True)
+        computed = {}
+        start_time = time.perf_counter()
+        for i in range(0, len(keys), self.batch_size):
+            batch = keys[i:i + self.batch_size]
+            computed.update(zip(batch, self.embeddings.embed_documents([texts[key] for key in batch])))
+        self.embed_seconds += time.perf_counter() - start_time
+        self.embedded += len(keys)
+        return computed
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embed a query with the model"""
+        return self.embeddings.embed_query(text)
+
+    def stats(self) -> Dict[str, Any]:
+        """Cache hits, misses and hit rate, and model throughput of embed_documents so far"""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            "cached": self.cache.size(self.model) if self.cache else 0,
+            "embedded": self.embedded,
+            "embed_seconds": round(self.embed_seconds, 3),
+            "chunks_per_second": round(self.embedded / self.embed_seconds, 1) if self.embed_seconds > 0 else 0.0
+        }
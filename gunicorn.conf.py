@@ -0,0 +1,34 @@
+"""
+Gunicorn settings for the production dashboard
+
+With preloading, production_dashboard (and its SimplePLCQAAssistant) is imported once
+in the master process. The knowledge base and index are then moved to the permanent
+GC generation so the collector never writes to their pages, and the forked workers
+share them copy-on-write instead of each building a private copy.
+
+Threads do not survive fork, so each worker starts its own knowledge directory
+watcher (PLC_KB_DIR) after forking. The master never runs one: a fork during a
+master-side update would copy a half-applied index into the worker.
+"""
+
+import gc
+import os
+import sys
+
+preload_app = os.getenv("GUNICORN_PRELOAD", "true").lower() == "true"
+if preload_app:
+    # Read by production_dashboard at import time in the master: leave watching to post_fork
+    os.environ["PLC_KB_WATCH_AFTER_FORK"] = "true"
+
+def when_ready(server):
+    """Freeze everything allocated while preloading, right before workers are forked"""
+    if preload_app:
+        gc.collect()
+        gc.freeze()
+        server.log.info(f"Preloaded app frozen for copy-on-write sharing ({gc.get_freeze_count()} objects)")
+
+def post_fork(server, worker):
+    """Start the knowledge directory watcher in each worker forked from a preloaded master"""
+    dashboard = sys.modules.get("production_dashboard")
+    if preload_app and dashboard is not None and dashboard.assistant is not None:
+        dashboard.assistant.start_watching()
@@ -0,0 +1,103 @@
+"""
+Content-hash manifest of what the RAG assistant's vector store holds
+
+The manifest lives next to the Chroma files in the persist directory and maps
+every ingested source (a PDF path, a URL, "knowledge_base") to the hash of the
+file it was read from and the ids of its chunks. Chunk ids are content hashes,
+so re-ingestion can skip unchanged PDFs, add only new chunks, and delete the
+chunks of changed or removed sources without re-embedding the rest.
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Iterable, NamedTuple
+
+MANIFEST_FILE = "ingest_manifest.json"
+MANIFEST_VERSION = 1
+
+def file_hash(path: str) -> str:
+    """SHA-256 of a file's bytes, read in blocks"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def chunk_id(source: str, page: Any, text: str) -> str:
+    """Vector-store id of a chunk: a hash of its text and where it came from"""
+    return hashlib.sha256(f"{source}\0{page}\0{text}".encode("utf-8")).hexdigest()
+
+class IngestPlan(NamedTuple):
+    """The vector-store changes that bring it in line with the current chunks"""
+    added: List[str]  # Chunk ids to embed and add, in the order given
+    stale: List[str]  # Chunk ids to delete
+    removed: List[str]  # File sources whose file was deleted
+    unchanged: int  # Chunks already stored
+
+class IngestManifest:
+    """Source file hashes and chunk ids of a persisted vector store"""
+
+    def __init__(self, persist_directory: str):
+        self.path = Path(persist_directory) / MANIFEST_FILE
+        # source -> {"file_hash": str or None, "chunk_ids": [str]}
+        self.sources: Dict[str, Dict[str, Any]] = {}
+        if self.path.exists():
+            try:
+                with open(self.path, "r", encoding="utf-8") as file:
+                    data = json.load(file)
+                if data.get("version") == MANIFEST_VERSION:
+                    self.sources = data["sources"]
+            except (OSError, ValueError, KeyError) as e:
+                print(f"⚠️  Ignoring unreadable ingest manifest {self.path}: {e}")
+
+    def exists(self) -> bool:
+        """Whether a manifest was written for this vector store"""
+        return self.path.exists()
+
+    def is_unchanged(self, source: str, source_hash: str) -> bool:
+        """Whether a file source was ingested with exactly this content"""
+        entry = self.sources.get(source)
+        return entry is not None and entry.get("file_hash") == source_hash
+
+    def chunk_ids(self, source: str) -> List[str]:
+        """Ids of the chunks stored for a source"""
+        return self.sources.get(source, {}).get("chunk_ids", [])
+
+    def removed_files(self) -> List[str]:
+        """File sources whose file no longer exists"""
+        return [source for source, entry in self.sources.items() if entry.get("file_hash") and not os.path.exists(source)]
+
+    def plan(self, source_ids: Dict[str, Iterable[str]]) -> IngestPlan:
+        """Diff the chunk ids of the sources being ingested against what is stored
+
+        Sources not in source_ids are left alone unless their file was deleted.
+        """
+        source_ids = {source: list(ids) for source, ids in source_ids.items()}
+        removed = [source for source in self.removed_files() if source not in source_ids]
+        stale = [id for source in removed for id in self.chunk_ids(source)]
+        added = []
+        for source, ids in source_ids.items():
+            stored_ids = set(self.chunk_ids(source))
+            current_ids = set(ids)
+            stale.extend(id for id in self.chunk_ids(source) if id not in current_ids)
+            added.extend(id for id in ids if id not in stored_ids)
+        unchanged = sum(len(ids) for ids in source_ids.values()) - len(added)
+        return IngestPlan(added, stale, removed, unchanged)
+
+    def record(self, source: str, source_hash: Optional[str], ids: Iterable[str]):
+        """Set a source's file hash and chunk ids"""
+        self.sources[source] = {"file_hash": source_hash, "chunk_ids": list(ids)}
+
+    def remove(self, source: str):
+        """Forget a source"""
+        self.sources.pop(source, None)
+
+    def save(self):
+        """Write the manifest atomically, so an interrupted write never leaves a partial file"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temporary = self.path.with_suffix(".tmp")
+        with open(temporary, "w", encoding="utf-8") as file:
+            json.dump({"version": MANIFEST_VERSION, "sources": self.sources}, file)
+        os.replace(temporary, self.path)
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Compiled knowledge-base artifact for the simple assistant
+
+The artifact holds the search index and entry metadata in a pickled header followed
+by the UTF-8 entry bodies. Loading memory-maps the file, so bodies stay in the page
+cache (shared by every worker) and are only decoded when an entry is returned.
+
+Only the bodies are shared this way. The index in the header (postings, weights,
+positions and lookup tables, several times the size of the bodies) is unpickled into
+private memory by every process that loads the artifact, so per-worker memory still
+grows with the knowledge base; the artifact saves the build time, not that memory.
+Load it once in the gunicorn master (preload) to share the index copy-on-write.
+"""
+
+import argparse
+import hashlib
+import mmap
+import pickle
+import struct
+import sys
+from collections.abc import Mapping
+from pathlib import Path
+from typing import List, Dict, Any, Tuple
+
+from knowledge_index import KnowledgeIndex
+
+ARTIFACT_MAGIC = b"PLCKB1\n"
+HEADER_LENGTH = struct.Struct("<Q")
+DEFAULT_ARTIFACT_PATH = "knowledge_base.plckb"
+
+# The artifact is stale whenever the KB literal, the index layout or the text analysis changes
+SOURCE_FILES = ["simple_plc_assistant.py", "knowledge_index.py", "query_analyzer.py", "knowledge_synonyms.py",
+                "product_specs.py", "ladder_cross_reference.py"]
+
+def source_digest() -> str:
+    """Hash the files that define the knowledge base and its index"""
+    digest = hashlib.sha1()
+    base_dir = Path(__file__).resolve().parent
+    for name in SOURCE_FILES:
+        digest.update((base_dir / name).read_bytes())
+    return digest.hexdigest()
+
+class LazyEntry(Mapping):
+    """Read-only knowledge entry whose content is decoded from the mapped artifact on access"""
+
+    __slots__ = ("buffer", "title", "keywords", "offset", "length")
+
+    def __init__(self, buffer: mmap.mmap, title: str, keywords: List[str], offset: int, length: int):
+        self.buffer = buffer
+        self.title = title
+        self.keywords = keywords
+        self.offset = offset
+        self.length = length
+
+    def __getitem__(self, key: str) -> Any:
+        if key == "title":
+            return self.title
+        if key == "keywords":
+            return self.keywords
+        if key == "content":
+            return self.buffer[self.offset:self.offset + self.length].decode("utf-8")
+        raise KeyError(key)
+
+    def __iter__(self):
+        return iter(("title", "keywords", "content"))
+
+    def __len__(self) -> int:
+        return 3
+
+def build_artifact(entries: List[Dict[str, Any]], index: KnowledgeIndex, path: str = DEFAULT_ARTIFACT_PATH) -> Dict[str, Any]:
+    """Write entries and their index to a compiled artifact"""
+    bodies = []
+    entry_records = []
+    offset = 0
+    for item in entries:
+        body = item["content"].encode("utf-8")
+        entry_records.append({
+            "title": item["title"],
+            "keywords": list(item["keywords"]),
+            "offset": offset,
+            "length": len(body)
+        })
+        bodies.append(body)
+        offset += len(body)
+
+    header = pickle.dumps({
+        "source_digest": source_digest(),
+        "entries": entry_records,
+        "index": index.export_state()
+    }, protocol=pickle.HIGHEST_PROTOCOL)
+
+    with open(path, "wb") as file:
+        file.write(ARTIFACT_MAGIC)
+        file.write(HEADER_LENGTH.pack(len(header)))
+        file.write(header)
+        for body in bodies:
+            file.write(body)
+
+    return {"path": path, "entries": len(entries), "header_bytes": len(header), "body_bytes": offset}
+
+def load_artifact(path: str) -> Tuple[List[LazyEntry], KnowledgeIndex]:
+    """Memory-map a compiled artifact and return its lazy entries and index
+
+    Entry bodies are read from the mapping; the index is unpickled into this process.
+    """
+    with open(path, "rb") as file:
+        buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    if buffer[:len(ARTIFACT_MAGIC)] != ARTIFACT_MAGIC:
+        buffer.close()
+        raise ValueError(f"{path} is not a knowledge-base artifact")
+
+    header_start = len(ARTIFACT_MAGIC) + HEADER_LENGTH.size
+    (header_length,) = HEADER_LENGTH.unpack_from(buffer, len(ARTIFACT_MAGIC))
+    header = pickle.loads(buffer[header_start:header_start + header_length])
+    if header["source_digest"] != source_digest():
+        buffer.close()
+        raise ValueError(f"{path} is stale; rebuild it with 'python knowledge_artifact.py'")
+
+    body_start = header_start + header_length
+    entries = [
+        LazyEntry(buffer, record["title"], record["keywords"], body_start + record["offset"], record["length"])
+        for record in header["entries"]
+    ]
+    return entries, KnowledgeIndex.from_state(entries, header["index"])
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile the simple assistant's knowledge base into a binary artifact")
+    parser.add_argument(
+        "--output", "-o",
+        type=str,
+        default=DEFAULT_ARTIFACT_PATH,
+        help=f"Artifact path (default: {DEFAULT_ARTIFACT_PATH})"
+    )
+    args = parser.parse_args()
+
+    from simple_plc_assistant import SimplePLCQAAssistant
+
+    print("🔨 Compiling knowledge base artifact...")
+    assistant = SimplePLCQAAssistant(artifact_path="")
+    info = build_artifact(assistant.knowledge_base, assistant.index, args.output)
+    print(f"✅ Wrote {info['entries']} entries to {info['path']} "
+          f"({info['header_bytes']} index bytes, {info['body_bytes']} body bytes)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
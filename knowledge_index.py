@@ -0,0 +1,1293 @@
+"""
+Inverted index over the simple assistant's built-in knowledge base
+
+Entries are indexed with the same analysis queries get (see query_analyzer.py),
+plus the aliases of any synonym they mention (see knowledge_synonyms.py).
+"""
+
+import hashlib
+import heapq
+import json
+import math
+import re
+import sys
+import textwrap
+from collections.abc import Mapping
+from collections import deque
+from typing import List, Dict, Any, Optional, Set, Tuple, NamedTuple
+
+from query_analyzer import WORD_PATTERN, analyze_text, fold, positioned_terms, stem
+from knowledge_synonyms import SYNONYMS
+from product_specs import ProductSpecs, product_of
+from ladder_cross_reference import AddressReference, AddressFacts, entry_references, has_ladder_content, query_symbols, describe
+
+try:
+    import numpy as np
+    from scipy import sparse
+except ImportError:  # Batch scoring falls back to accumulating over the postings lists
+    np = None
+    sparse = None
+
+# Siemens error and event codes: 16#8087 (also W#16#/DW#16#), drive faults/alarms such as F7902 or A07910
+HEX_CODE_PATTERN = re.compile(r"\b(?:(?:DW|W|B)#)?16#([0-9a-f]{2,8})\b", re.IGNORECASE)
+DRIVE_CODE_PATTERN = re.compile(r"\b([FA]\d{4,5})\b", re.IGNORECASE)
+# Extra spellings accepted in questions: 0x8087, and a bare 8087 next to a word such as "error" or "status"
+QUERY_HEX_PATTERN = re.compile(r"\b0x([0-9a-f]{4})\b", re.IGNORECASE)
+QUERY_WORD_PATTERN = re.compile(r"\w+")
+BARE_HEX_PATTERN = re.compile(r"[0-9a-f]{4}", re.IGNORECASE)
+CODE_CONTEXT_PATTERN = re.compile(r"(?:error|fault|alarm|status|code|event|diagnostic)s?", re.IGNORECASE)
+CODE_CONTEXT_WINDOW = 3  # Words on either side of a bare number searched for a code keyword
+
+# BM25F parameters: per-field boost and length normalization
+FIELD_WEIGHTS = {"title": 3.0, "keywords": 2.0, "content": 1.0}
+FIELD_B = {"title": 0.3, "keywords": 0.3, "content": 0.75}
+BM25_K1 = 1.2
+
+# Fuzzy matching: shortest term worth correcting and the most trigram candidates verified per term
+MIN_FUZZY_LENGTH = 4
+MAX_FUZZY_CANDIDATES = 64
+
+# Positions skipped after every field and keyword, so phrases never match across them
+PHRASE_GAP = 8
+# Proximity boost: query word pairs found within this many positions add
+# PROXIMITY_WEIGHT * min(idf) / distance, re-ranking PROXIMITY_POOL x k BM25 candidates
+PROXIMITY_WINDOW = 4
+PROXIMITY_WEIGHT = 0.5
+PROXIMITY_POOL = 3
+
+# Entries with fewer content lines are answered as a whole instead of per section
+MIN_SECTIONED_LINES = 30
+# Lines that start a section even when content follows directly: "Example 2: Timer-Based Sequence",
+# and short title-case labels such as "Debugging Techniques:" or "3. Timer Programming Issues:"
+EXAMPLE_HEADING_PATTERN = re.compile(r"^Example \d+:")
+NUMBERED_HEADING_PATTERN = re.compile(r"^\d+\.\s*")
+HEADING_SMALL_WORDS = {"a", "an", "and", "as", "at", "by", "for", "in", "of", "on", "or", "the", "to", "vs", "with"}
+MIN_HEADING_WORDS = 2
+MAX_HEADING_WORDS = 6
+
+# Questions scored per sparse matrix product, bounding the dense score block to rows x entries
+BATCH_BLOCK_SIZE = 64
+
+# Incremental updates applied before one is done as a full rebuild, which refreshes every idf and field norm
+MAX_INCREMENTAL_UPDATES = 32
+
+class KnowledgeEntry(Mapping):
+    """Compact read-only knowledge entry: interned title and keywords, content stored without indentation"""
+
+    __slots__ = ("title", "keywords", "content")
+
+    def __init__(self, title: str, keywords: Tuple[str, ...], content: str):
+        self.title = title
+        self.keywords = keywords
+        self.content = content
+
+    @classmethod
+    def from_item(cls, item: Mapping) -> "KnowledgeEntry":
+        """Compact an entry mapping; compact and memory-mapped entries are kept as they are"""
+        if isinstance(item, KnowledgeEntry) or not isinstance(item, dict):
+            return item
+        return cls(
+            sys.intern(item["title"]),
+            tuple(sys.intern(keyword) for keyword in item["keywords"]),
+            textwrap.dedent(item["content"]).strip()
+        )
+
+    def __getitem__(self, key: str) -> Any:
+        if key == "title":
+            return self.title
+        if key == "keywords":
+            return self.keywords
+        if key == "content":
+            return self.content
+        raise KeyError(key)
+
+    def __iter__(self):
+        return iter(("title", "keywords", "content"))
+
+    def __len__(self) -> int:
+        return 3
+
+    def __reduce__(self):
+        return KnowledgeEntry, (self.title, self.keywords, self.content)
+
+# Stands in for a removed entry so the ids of the other entries stay stable
+EMPTY_ENTRY = KnowledgeEntry("", (), "")
+
+def is_live(item: Mapping) -> bool:
+    """Whether an entry counts towards the collection size, i.e. is not a removed entry's placeholder"""
+    return bool(item["title"] or item["keywords"] or item["content"])
+
+def entry_json(item: Mapping) -> Dict[str, Any]:
+    """Plain-dict form of an entry for hashing index versions"""
+    return {"title": item["title"], "keywords": list(item["keywords"]), "content": item["content"]}
+
+def extract_codes(text: str) -> List[str]:
+    """Return the canonical error/event codes written in a piece of content"""
+    codes = [f"16#{code.upper()}" for code in HEX_CODE_PATTERN.findall(text)]
+    codes.extend(code.upper() for code in DRIVE_CODE_PATTERN.findall(text))
+    return codes
+
+def extract_query_codes(query: str) -> List[str]:
+    """Return candidate canonical codes for a question, including 0x and bare hex spellings
+
+    A bare number only counts as a code near an error/status keyword: "status 3501"
+    asks for 16#3501, "what is 3501" does not.
+    """
+    codes = extract_codes(query)
+    codes.extend(f"16#{code.upper()}" for code in QUERY_HEX_PATTERN.findall(query))
+    words = QUERY_WORD_PATTERN.findall(query)
+    for position, word in enumerate(words):
+        nearby = words[max(0, position - CODE_CONTEXT_WINDOW):position + CODE_CONTEXT_WINDOW + 1]
+        if BARE_HEX_PATTERN.fullmatch(word) and any(CODE_CONTEXT_PATTERN.fullmatch(other) for other in nearby):
+            codes.append(f"16#{word.upper()}")
+    return list(dict.fromkeys(codes))
+
+class CodeReference(NamedTuple):
+    """Where an error code is described: its line records and how many lines the description spans"""
+    doc_id: int
+    line: int
+    length: int
+
+class Section(NamedTuple):
+    """An addressable part of an entry, e.g. "Example 3: Automatic Door Control", as a line record range"""
+    doc_id: int
+    title: str
+    start: int
+    end: int
+
+class LineRecord(NamedTuple):
+    """One non-empty content line prepared for answer extraction"""
+    text: str
+    terms: Tuple[str, ...]
+    tokens: frozenset
+
+class KeywordAutomaton:
+    """Aho-Corasick automaton that finds every keyword of every entry in one pass over a query"""
+
+    def __init__(self):
+        # Trie nodes: goto transitions, failure links and the entry ids whose keyword ends here
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.outputs: List[Set[int]] = [set()]
+
+    def add(self, keyword: str, doc_id: int):
+        """Insert one keyword pattern for an entry"""
+        node = 0
+        for char in keyword:
+            next_node = self.goto[node].get(char)
+            if next_node is None:
+                next_node = len(self.goto)
+                self.goto[node][char] = next_node
+                self.goto.append({})
+                self.fail.append(0)
+                self.outputs.append(set())
+            node = next_node
+        self.outputs[node].add(doc_id)
+
+    def finalize(self):
+        """Compute failure links breadth-first and merge outputs along them"""
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self.goto[node].items():
+                queue.append(child)
+                fallback = self.fail[node]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[child] = self.goto[fallback].get(char, 0)
+                self.outputs[child] |= self.outputs[self.fail[child]]
+
+    def match(self, text: str) -> Set[int]:
+        """Return the ids of all entries with at least one keyword occurring in text"""
+        matched: Set[int] = set()
+        node = 0
+        for char in text:
+            while node and char not in self.goto[node]:
+                node = self.fail[node]
+            node = self.goto[node].get(char, 0)
+            if self.outputs[node]:
+                matched |= self.outputs[node]
+        return matched
+
+def update_postings(postings_map: Dict[str, Dict[int, int]], removed: Dict[str, Set[int]],
+                    added: Dict[str, Dict[int, Any]]):
+    """Apply removed and added postings, replacing each touched postings dict with an edited copy
+
+    Postings dicts are never edited in place, so a snapshot sharing them with the
+    version being updated keeps seeing its own postings.
+    """
+    for term in removed.keys() | added.keys():
+        postings = dict(postings_map.get(term) or {})
+        for key in removed.get(term, ()):
+            postings.pop(key, None)
+        postings.update(added.get(term, {}))
+        if postings:
+            postings_map[term] = postings
+        else:
+            postings_map.pop(term, None)
+
+def bm25_idf(num_docs: int, doc_frequency: int) -> float:
+    """Smoothed BM25 inverse document frequency (never negative)"""
+    return math.log(1 + (num_docs - doc_frequency + 0.5) / (doc_frequency + 0.5))
+
+def edit_distance(a: str, b: str, max_distance: int) -> int:
+    """Optimal string alignment distance, giving up with max_distance + 1 once it is exceeded"""
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    previous_previous: List[int] = []
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous_previous[j - 2] + 1)  # Transposition
+        if min(current) > max_distance:
+            return max_distance + 1
+        previous_previous, previous = previous, current
+    return previous[-1]
+
+class TrigramIndex:
+    """Character-trigram postings over the index vocabulary for typo-tolerant term lookup"""
+
+    def __init__(self, doc_frequencies: Dict[str, int]):
+        self.doc_frequencies = doc_frequencies
+        # trigram -> vocabulary terms containing it
+        self.postings: Dict[str, List[str]] = {}
+        for term in doc_frequencies:
+            for trigram in self.term_trigrams(term):
+                self.postings.setdefault(trigram, []).append(term)
+
+    def term_trigrams(self, term: str) -> Set[str]:
+        """Return the trigrams a vocabulary term is indexed under; terms too short to correct have none"""
+        return self.trigrams(term) if len(term) >= MIN_FUZZY_LENGTH - 1 else set()
+
+    def add_postings(self, term: str):
+        """Index the trigrams of one new vocabulary term, replacing the postings lists it extends"""
+        for trigram in self.term_trigrams(term):
+            self.postings[trigram] = self.postings.get(trigram, []) + [term]
+
+    def set_frequency(self, term: str, doc_frequency: int):
+        """Record a term's new document frequency; terms dropped to zero stay indexed but are never suggested"""
+        if term not in self.doc_frequencies:
+            self.add_postings(term)
+        self.doc_frequencies[term] = doc_frequency
+
+    def copy(self) -> "TrigramIndex":
+        """Return a copy to update; the postings lists are shared, as add_postings never edits them in place"""
+        index = TrigramIndex.__new__(TrigramIndex)
+        index.doc_frequencies = dict(self.doc_frequencies)
+        index.postings = dict(self.postings)
+        return index
+
+    @staticmethod
+    def trigrams(term: str) -> Set[str]:
+        """Return the trigrams of a term padded with boundary markers"""
+        padded = f"${term}$"
+        return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+    def correct(self, term: str) -> Optional[str]:
+        """Return the closest vocabulary term within the edit budget, or None
+
+        Candidates come only from the postings of the term's trigrams; the ones
+        sharing the most trigrams are verified with a bounded edit distance, and
+        ties go to the term found in the most entries.
+        """
+        shared: Dict[str, int] = {}
+        for trigram in self.trigrams(term):
+            for candidate in self.postings.get(trigram, ()):
+                shared[candidate] = shared.get(candidate, 0) + 1
+
+        max_distance = 1 if len(term) <= 5 else 2
+        best = None
+        best_key = None
+        for candidate in heapq.nlargest(MAX_FUZZY_CANDIDATES, shared, key=shared.get):
+            doc_frequency = self.doc_frequencies.get(candidate)
+            if not doc_frequency:
+                continue
+            distance = edit_distance(term, candidate, max_distance)
+            if distance <= max_distance:
+                key = (distance, -doc_frequency, candidate)
+                if best_key is None or key < best_key:
+                    best, best_key = candidate, key
+        return best
+
+class KnowledgeIndex:
+    """Maps normalized terms to the knowledge entries that contain them"""
+
+    def __init__(self, entries: List[Mapping]):
+        # Entries are kept compact (see KnowledgeEntry); updates publish a new list, so read it from the index
+        self.entries = [KnowledgeEntry.from_item(item) for item in entries]
+        # Digest of the indexed entries; changes whenever any entry is edited
+        self.version = ""
+        # Entries that are not removed-entry placeholders: the N of idf and of average field lengths
+        self.num_docs = 0
+        # Incremental updates since the last full build (see update_entries)
+        self.updates_since_build = 0
+        # field -> term -> {entry id: term frequency in that field}
+        self.field_postings: Dict[str, Dict[str, Dict[int, int]]] = {}
+        self.field_lengths: Dict[str, List[int]] = {}
+        # term -> {entry id: ascending word positions over all fields}, for phrases and proximity
+        self.positions: Dict[str, Dict[int, Tuple[int, ...]]] = {}
+        self.field_length_totals: Dict[str, int] = {}
+        self.avg_field_lengths: Dict[str, float] = {}
+        self.idf: Dict[str, float] = {}
+        # term -> {entry id: precomputed BM25F contribution}
+        self.bm25_weights: Dict[str, Dict[int, float]] = {}
+        # term -> largest contribution in its postings, the MaxScore upper bound
+        self.max_weights: Dict[str, float] = {}
+        self.keyword_automaton = KeywordAutomaton()
+        # Sparse term-document matrices (terms x entries) for batch scoring, when SciPy is installed
+        self.term_ids: Dict[str, int] = {}
+        self.trigram_index: Optional[TrigramIndex] = None
+        # Sections with parent entry pointers, section term postings and each entry's section ids
+        self.sections: List[Section] = []
+        self.section_postings: Dict[str, Dict[int, int]] = {}
+        self.entry_sections: List[List[int]] = []
+        # canonical code -> references, most detailed description first
+        self.code_index: Dict[str, List[CodeReference]] = {}
+        # address or tag key -> its uses in ladder rungs and I/O lists, in entry and line order
+        self.address_index: Dict[str, List[AddressReference]] = {}
+        # Typed specs of the products with their own entry, for spec and comparison questions
+        self.product_specs: Optional[ProductSpecs] = None
+        self.tf_matrix = None
+        self.bm25_matrix = None
+        # entry id -> stripped and analyzed content lines (None until first needed)
+        self.lines: List[Optional[List[LineRecord]]] = []
+        self.build()
+
+    @property
+    def postings(self) -> Dict[str, Dict[int, int]]:
+        """Content postings used by the legacy scorer"""
+        return self.field_postings["content"]
+
+    @staticmethod
+    def field_texts(item: Dict[str, Any], field: str) -> List[str]:
+        """Return the indexable texts of one entry field, each keyword on its own"""
+        if field == "keywords":
+            return list(item["keywords"])
+        return [item[field]]
+
+    def build(self):
+        """Tokenize every entry once and precompute postings and BM25F statistics"""
+        self.num_docs = sum(1 for item in self.entries if is_live(item))
+        self.updates_since_build = 0
+        self.version = hashlib.sha1(json.dumps(self.entries, sort_keys=True, default=entry_json).encode("utf-8")).hexdigest()[:12]
+        self.field_postings = {field: {} for field in FIELD_WEIGHTS}
+        self.field_lengths = {field: [0] * len(self.entries) for field in FIELD_WEIGHTS}
+        self.positions = {}
+
+        for doc_id, item in enumerate(self.entries):
+            field_positions, lengths = self.field_term_positions(item)
+            for field, term_positions in field_positions.items():
+                self.field_lengths[field][doc_id] = lengths[field]
+                field_postings = self.field_postings[field]
+                for term, positions in term_positions.items():
+                    field_postings.setdefault(term, {})[doc_id] = len(positions)
+            for term, positions in self.entry_positions(field_positions).items():
+                self.positions.setdefault(term, {})[doc_id] = positions
+
+        # Line records let answer extraction work on cached token sets instead of re-splitting content
+        self.lines = [self.build_line_records(item) for item in self.entries]
+        self.build_code_index()
+        self.build_sections()
+        self.build_address_index()
+        self.product_specs = ProductSpecs(self.entries)
+
+        self.build_keyword_automaton()
+
+        self.field_length_totals = {field: sum(lengths) for field, lengths in self.field_lengths.items()}
+        self.update_avg_field_lengths()
+
+        doc_sets = self.term_doc_sets()
+        doc_frequencies = {term: len(docs) for term, docs in doc_sets.items()}
+        self.compute_weights(doc_sets, self.num_docs, doc_frequencies)
+        self.trigram_index = TrigramIndex(doc_frequencies)
+        # Row ids are only ever appended, so a term keeps its row across incremental updates
+        self.term_ids = {term: term_id for term_id, term in enumerate(self.bm25_weights)}
+        self.build_matrices()
+
+    def term_doc_sets(self) -> Dict[str, Set[int]]:
+        """Collect the entries containing each term; document frequency counts an entry once even if the term is in several fields"""
+        doc_sets: Dict[str, Set[int]] = {}
+        for field_postings in self.field_postings.values():
+            for term, postings in field_postings.items():
+                doc_sets.setdefault(term, set()).update(postings)
+        return doc_sets
+
+    def compute_weights(self, doc_sets: Dict[str, Set[int]], num_docs: int, doc_frequencies: Dict[str, int]):
+        """Compute idf, BM25F contributions and MaxScore bounds of every term from collection statistics"""
+        self.idf = {term: bm25_idf(num_docs, doc_frequencies[term]) for term in doc_sets}
+
+        # Field norms are fixed per entry, so each term/entry contribution can be computed up front
+        norms = {
+            field: [
+                1 - FIELD_B[field] + FIELD_B[field] * length / self.avg_field_lengths[field]
+                for length in lengths
+            ]
+            for field, lengths in self.field_lengths.items()
+        }
+        self.bm25_weights = {term: self.term_weights(term, docs, norms) for term, docs in doc_sets.items()}
+        self.max_weights = {term: max(weights.values()) for term, weights in self.bm25_weights.items()}
+
+    def collection_statistics(self) -> Tuple[int, Dict[str, int], Dict[str, int]]:
+        """Return the entry count, document frequencies and field length totals BM25F is computed from"""
+        doc_frequencies = {term: df for term, df in self.trigram_index.doc_frequencies.items() if df}
+        return self.num_docs, doc_frequencies, dict(self.field_length_totals)
+
+    def apply_collection_statistics(self, num_docs: int, doc_frequencies: Dict[str, int],
+                                    field_length_totals: Dict[str, int]):
+        """Rescore this index as one part of a larger collection with the given statistics
+
+        Weights then equal those of a single index over the whole collection, so the
+        scores of indexes over different parts can be merged directly.
+        """
+        self.avg_field_lengths = {
+            field: (total / num_docs if num_docs else 0.0) or 1.0
+            for field, total in field_length_totals.items()
+        }
+        self.compute_weights(self.term_doc_sets(), num_docs, doc_frequencies)
+        self.build_matrices()
+
+    def field_term_positions(self, item: Dict[str, Any]) -> Tuple[Dict[str, Dict[str, List[int]]], Dict[str, int]]:
+        """Analyze each field of an entry into term positions, and count each field's length
+
+        Positions run on through the fields of an entry, with a gap after every field
+        text and keyword so that a phrase never matches across two of them. Synonym
+        aliases share the position of the words they stand for and are left out of
+        the field length, so expansion does not penalize an entry's normalization.
+        """
+        positions = {}
+        lengths = {}
+        base = 0
+        for field in FIELD_WEIGHTS:
+            field_positions: Dict[str, List[int]] = {}
+            length = 0
+            for text in self.field_texts(item, field):
+                terms = positioned_terms(fold(text))
+                length += len(terms)
+                end = 0
+                for term, position in terms + SYNONYMS.expand(terms):
+                    field_positions.setdefault(term, []).append(base + position)
+                    end = max(end, position + 1)
+                base += end + PHRASE_GAP
+            positions[field] = field_positions
+            lengths[field] = length
+        return positions, lengths
+
+    @staticmethod
+    def entry_positions(field_positions: Dict[str, Dict[str, List[int]]]) -> Dict[str, Tuple[int, ...]]:
+        """Merge an entry's per-field term positions into one ascending tuple per term"""
+        merged: Dict[str, List[int]] = {}
+        for term_positions in field_positions.values():
+            for term, positions in term_positions.items():
+                merged.setdefault(term, []).extend(positions)
+        # Aliases are appended after the analyzed terms, so a term's positions need sorting
+        return {term: tuple(sorted(positions)) for term, positions in merged.items()}
+
+    def update_avg_field_lengths(self):
+        """Derive average field lengths from the running totals"""
+        self.avg_field_lengths = {
+            field: (total / self.num_docs if self.num_docs else 0.0) or 1.0
+            for field, total in self.field_length_totals.items()
+        }
+
+    def term_weights(self, term: str, docs: Set[int], norms: Dict[str, Any]) -> Dict[int, float]:
+        """Compute a term's BM25F contribution to each entry containing it, given per-entry field norms"""
+        weights = {}
+        for doc_id in docs:
+            tf = sum(
+                FIELD_WEIGHTS[field] * self.field_postings[field].get(term, {}).get(doc_id, 0) / norms[field][doc_id]
+                for field in FIELD_WEIGHTS
+            )
+            weights[doc_id] = self.idf[term] * tf / (BM25_K1 + tf)
+        return weights
+
+    def build_keyword_automaton(self):
+        """Compile all keyword lists into a single automaton for one-pass matching"""
+        automaton = KeywordAutomaton()
+        for doc_id, item in enumerate(self.entries):
+            for keyword in item["keywords"]:
+                automaton.add(fold(keyword), doc_id)
+                for variant in SYNONYMS.keyword_variants(keyword):
+                    automaton.add(variant, doc_id)
+        automaton.finalize()
+        self.keyword_automaton = automaton
+
+    def snapshot(self) -> "KnowledgeIndex":
+        """Return a view of the current version of the index that later updates never change
+
+        update_entries publishes each update as a new version instead of editing the
+        current one, so a query reading only from a snapshot sees one consistent version.
+        """
+        view = type(self).__new__(type(self))
+        view.__dict__ = self.__dict__
+        return view
+
+    def draft(self) -> "KnowledgeIndex":
+        """Return a copy of the current version for an update to edit before it is published
+
+        The containers an update edits are copied one level deep. The postings, weights
+        and reference lists inside them stay shared, as updates replace them instead of
+        editing them, so drafting costs a pass over the vocabulary, not over the postings.
+        """
+        draft = type(self).__new__(type(self))
+        draft.__dict__.update(self.__dict__)
+        for name in ("entries", "lines", "sections", "entry_sections"):
+            setattr(draft, name, list(getattr(self, name)))
+        for name in ("positions", "section_postings", "code_index", "address_index", "idf", "bm25_weights",
+                     "max_weights", "term_ids", "field_length_totals"):
+            setattr(draft, name, dict(getattr(self, name)))
+        draft.field_postings = {field: dict(postings) for field, postings in self.field_postings.items()}
+        draft.field_lengths = {field: list(lengths) for field, lengths in self.field_lengths.items()}
+        draft.trigram_index = self.trigram_index.copy()
+        # Batch matrices are rebuilt on the next batch instead of on every update
+        draft.tf_matrix = draft.bm25_matrix = None
+        return draft
+
+    def update_entries(self, changes: Dict[int, Optional[Dict[str, Any]]]):
+        """Re-index only the given entries: id -> new entry, None to remove it, ids past the end to add
+
+        The update is applied to a draft (see draft) and published by swapping the
+        draft's state in with a single assignment, so a query holding a snapshot keeps
+        its version and no query ever sees a half-applied update. Only the changed
+        entries are re-tokenized, and BM25F weights are recomputed for the terms they
+        contain. Entries the update does not touch keep their field-length
+        normalization, and terms it does not touch keep the idf of the old entry count,
+        until the next full build: every MAX_INCREMENTAL_UPDATES-th update rebuilds the
+        index over the updated entries instead. Removed entries stay as placeholders,
+        so the other ids are stable, but do not count towards N. Callers must
+        serialize updates.
+        """
+        num_entries = len(self.entries)
+        new_ids = sorted(doc_id for doc_id in changes if doc_id >= num_entries)
+        if any(doc_id < 0 for doc_id in changes) or new_ids != list(range(num_entries, num_entries + len(new_ids))):
+            raise ValueError("Added entries must take the ids directly after the last entry")
+
+        if self.updates_since_build + 1 >= MAX_INCREMENTAL_UPDATES:
+            entries = self.entries + [EMPTY_ENTRY] * len(new_ids)
+            for doc_id, item in changes.items():
+                entries[doc_id] = item or EMPTY_ENTRY
+            updated = type(self)(entries)
+        else:
+            updated = self.draft()
+            updated.apply_changes(changes)
+        self.__dict__ = updated.__dict__
+
+    def apply_changes(self, changes: Dict[int, Optional[Dict[str, Any]]]):
+        """Re-index the changed entries of a draft in place (see update_entries)"""
+        field_removed: Dict[str, Dict[str, Set[int]]] = {field: {} for field in FIELD_WEIGHTS}
+        field_added: Dict[str, Dict[str, Dict[int, int]]] = {field: {} for field in FIELD_WEIGHTS}
+        # term -> changed entries that contained it (in any field) before and after the update
+        term_before: Dict[str, Set[int]] = {}
+        term_after: Dict[str, Set[int]] = {}
+        positions_added: Dict[str, Dict[int, Tuple[int, ...]]] = {}
+        section_removed: Dict[str, Set[int]] = {}
+        section_added: Dict[str, Dict[int, int]] = {}
+        code_removed: Dict[str, Set[int]] = {}
+        code_added: Dict[str, List[CodeReference]] = {}
+        address_removed: Set[str] = set()
+        address_added: Dict[str, List[AddressReference]] = {}
+        keywords_changed = False
+        products_changed = False
+
+        for doc_id in sorted(changes):
+            item = KnowledgeEntry.from_item(changes[doc_id]) if changes[doc_id] else EMPTY_ENTRY
+            old_section_ids: List[int] = []
+            if doc_id < len(self.entries):
+                old_item = self.entries[doc_id]
+                self.num_docs -= is_live(old_item)
+                keywords_changed |= list(old_item["keywords"]) != list(item["keywords"])
+                products_changed |= product_of(old_item["title"]) is not None
+                for field, counts in self.field_term_positions(old_item)[0].items():
+                    for term in counts:
+                        field_removed[field].setdefault(term, set()).add(doc_id)
+                        term_before.setdefault(term, set()).add(doc_id)
+                    self.field_length_totals[field] -= self.field_lengths[field][doc_id]
+                for code in self.entry_code_references(doc_id):
+                    code_removed.setdefault(code, set()).add(doc_id)
+                address_removed.update(self.entry_address_references(doc_id))
+                old_section_ids = self.entry_sections[doc_id]
+                for section_id in old_section_ids:
+                    section = self.sections[section_id]
+                    for term in self.section_term_counts(doc_id, section.start, section.end):
+                        section_removed.setdefault(term, set()).add(section_id)
+                self.entries[doc_id] = item
+            else:
+                keywords_changed |= bool(item["keywords"])
+                for lengths in self.field_lengths.values():
+                    lengths.append(0)
+                self.lines.append(None)
+                self.entry_sections.append([])
+                self.entries.append(item)
+            products_changed |= product_of(item["title"]) is not None
+            self.num_docs += is_live(item)
+
+            self.lines[doc_id] = self.build_line_records(item)
+            field_positions, lengths = self.field_term_positions(item)
+            for field, term_positions in field_positions.items():
+                for term, positions in term_positions.items():
+                    field_added[field].setdefault(term, {})[doc_id] = len(positions)
+                    term_after.setdefault(term, set()).add(doc_id)
+                self.field_lengths[field][doc_id] = lengths[field]
+                self.field_length_totals[field] += self.field_lengths[field][doc_id]
+            for term, positions in self.entry_positions(field_positions).items():
+                positions_added.setdefault(term, {})[doc_id] = positions
+            for code, references in self.entry_code_references(doc_id).items():
+                code_added.setdefault(code, []).extend(references)
+            # Sections reuse the entry's previous ids so their postings keep the same keys
+            section_ids = []
+            for position, (title, start, end) in enumerate(self.section_spans(doc_id)):
+                if position < len(old_section_ids):
+                    section_id = old_section_ids[position]
+                    self.sections[section_id] = Section(doc_id, title, start, end)
+                else:
+                    section_id = len(self.sections)
+                    self.sections.append(Section(doc_id, title, start, end))
+                section_ids.append(section_id)
+                for term, tf in self.section_term_counts(doc_id, start, end).items():
+                    section_added.setdefault(term, {})[section_id] = tf
+            self.entry_sections[doc_id] = section_ids
+            for symbol, references in self.entry_address_references(doc_id).items():
+                address_added.setdefault(symbol, []).extend(references)
+
+        for field in FIELD_WEIGHTS:
+            update_postings(self.field_postings[field], field_removed[field], field_added[field])
+        update_postings(self.positions, term_before, positions_added)
+        update_postings(self.section_postings, section_removed, section_added)
+        for code in code_removed.keys() | code_added.keys():
+            references = [reference for reference in self.code_index.get(code, ()) if reference.doc_id not in changes]
+            references.extend(code_added.get(code, ()))
+            references.sort(key=lambda reference: (-reference.length, reference.doc_id))
+            if references:
+                self.code_index[code] = references
+            else:
+                self.code_index.pop(code, None)
+        for symbol in address_removed | address_added.keys():
+            references = [reference for reference in self.address_index.get(symbol, ()) if reference.doc_id not in changes]
+            references.extend(address_added.get(symbol, ()))
+            references.sort(key=lambda reference: (reference.doc_id, reference.line))
+            if references:
+                self.address_index[symbol] = references
+            else:
+                self.address_index.pop(symbol, None)
+        if keywords_changed:
+            self.build_keyword_automaton()
+        if products_changed:
+            self.product_specs = ProductSpecs(self.entries)
+
+        self.update_avg_field_lengths()
+        norms: Dict[str, Dict[int, float]] = {field: {} for field in FIELD_WEIGHTS}
+        for doc_id in changes:
+            for field, field_norms in norms.items():
+                length = self.field_lengths[field][doc_id]
+                field_norms[doc_id] = 1 - FIELD_B[field] + FIELD_B[field] * length / self.avg_field_lengths[field]
+        for term in term_before.keys() | term_after.keys():
+            before = term_before.get(term, set())
+            after = term_after.get(term, set())
+            doc_frequency = self.trigram_index.doc_frequencies.get(term, 0) + len(after - before) - len(before - after)
+            self.trigram_index.set_frequency(term, doc_frequency)
+            if not doc_frequency:
+                self.bm25_weights.pop(term, None)
+                self.max_weights.pop(term, None)
+                self.idf.pop(term, None)
+                continue
+
+            self.term_ids.setdefault(term, len(self.term_ids))
+            old_idf = self.idf.get(term)
+            self.idf[term] = bm25_idf(self.num_docs, doc_frequency)
+            ratio = self.idf[term] / old_idf if old_idf else 1.0
+            # Untouched entries only scale with the idf; the changed ones are weighed afresh
+            weights = {
+                doc_id: weight * ratio for doc_id, weight in self.bm25_weights.get(term, {}).items() if doc_id not in before
+            }
+            weights.update(self.term_weights(term, after, norms))
+            self.bm25_weights[term] = weights
+            self.max_weights[term] = max(weights.values())
+
+        self.updates_since_build += 1
+        digest = hashlib.sha1(self.version.encode("utf-8"))
+        digest.update(json.dumps({str(doc_id): changes[doc_id] for doc_id in sorted(changes)}, sort_keys=True, default=entry_json).encode("utf-8"))
+        self.version = digest.hexdigest()[:12]
+
+    def entry_code_references(self, doc_id: int) -> Dict[str, List[CodeReference]]:
+        """Find the error/event codes in one entry and the lines that describe them"""
+        code_references: Dict[str, List[CodeReference]] = {}
+        records = self.line_records(doc_id)
+        for position, record in enumerate(records):
+            codes = extract_codes(record.text)
+            if not codes:
+                continue
+            # A description runs until the next list item or heading
+            end = position + 1
+            while end < len(records) and not records[end].text.startswith("-") and not records[end].text.endswith(":"):
+                end += 1
+            for code in dict.fromkeys(codes):
+                code_references.setdefault(code, []).append(CodeReference(doc_id, position, end - position))
+        return code_references
+
+    def build_code_index(self):
+        """Map every error/event code in the content to the lines that describe it"""
+        self.code_index = {}
+        for doc_id in range(len(self.entries)):
+            for code, references in self.entry_code_references(doc_id).items():
+                self.code_index.setdefault(code, []).extend(references)
+        for references in self.code_index.values():
+            references.sort(key=lambda reference: (-reference.length, reference.doc_id))
+
+    def entry_address_references(self, doc_id: int) -> Dict[str, List[AddressReference]]:
+        """Find the addresses and tags used in one entry's ladder rungs and I/O lists"""
+        content = self.entries[doc_id]["content"]
+        if not has_ladder_content(content):
+            return {}
+        return entry_references(doc_id, content, self.section_spans(doc_id))
+
+    def build_address_index(self):
+        """Map every address and tag in the ladder content to the rungs and I/O lists that use it"""
+        self.address_index = {}
+        for doc_id in range(len(self.entries)):
+            for symbol, references in self.entry_address_references(doc_id).items():
+                self.address_index.setdefault(symbol, []).extend(references)
+
+    def address_facts(self, folded_query: str, query_terms: Set[str], k: int) -> Optional[AddressFacts]:
+        """Look the addresses and tags a question names up in the cross-reference
+
+        Uses are grouped by entry and example; when the question's other words
+        ("door example") match some groups' titles, only the best matching groups
+        are kept. Up to k groups are answered with their network lines.
+        """
+        symbols = query_symbols(folded_query, self.address_index)
+        if not symbols:
+            return None
+        groups: Dict[Tuple[int, str], List[Tuple[str, AddressReference]]] = {}
+        for symbol in symbols:
+            for reference in self.address_index.get(symbol, ()):
+                groups.setdefault((reference.doc_id, reference.context), []).append((symbol, reference))
+        other_terms = set(query_terms).difference(*(analyze_text(symbol) for symbol in symbols))
+
+        keys = {}
+        for (doc_id, context), uses in groups.items():
+            matched = 0
+            if other_terms:
+                titles = f"{self.entries[doc_id]['title']} {context} " + " ".join(reference.network for _, reference in uses)
+                matched = len(other_terms.intersection(analyze_text(titles)))
+            keys[(doc_id, context)] = (-matched, -len({symbol for symbol, _ in uses}), doc_id, uses[0][1].line)
+        ranked = sorted(groups, key=keys.get)
+        best = keys[ranked[0]][0]
+        ranked = [group for group in ranked if keys[group][0] == best][:k]
+
+        lines: List[str] = []
+        references: List[AddressReference] = []
+        for doc_id, context in ranked:
+            uses = sorted(groups[(doc_id, context)], key=lambda use: use[1].line)
+            title = self.entries[doc_id]["title"]
+            lines.append(f"{context} ({title})" if context and context != title else title)
+            roles: Dict[str, List[str]] = {}
+            for symbol, reference in uses:
+                if reference.address.lower() == symbol:
+                    roles.setdefault(reference.address, []).append(describe(reference))
+                else:
+                    # Asked by tag: give the address it is wired to instead of repeating the tag
+                    roles.setdefault(reference.tag, []).append(
+                        f"{reference.role} ({reference.address})" if reference.address else reference.role
+                    )
+            lines.extend(f"{name}: {', '.join(dict.fromkeys(descriptions))}" for name, descriptions in roles.items())
+            records = self.line_records(doc_id)
+            shown: Set[int] = set()
+            network = ""
+            for _, reference in uses:
+                references.append(reference)
+                if reference.line in shown:
+                    continue
+                if reference.network and reference.network != network:
+                    network = reference.network
+                    lines.append(network)
+                for position in range(reference.line, reference.line + reference.length):
+                    if position not in shown:
+                        shown.add(position)
+                        lines.append(records[position].text)
+        doc_ids = tuple(dict.fromkeys(doc_id for doc_id, _ in ranked))
+        return AddressFacts(tuple(symbols), tuple(references), tuple(lines), doc_ids)
+
+    @staticmethod
+    def is_titled_label(text: str) -> bool:
+        """Whether a line is a short title-case label ending in a colon, optionally numbered"""
+        if not text.endswith(":"):
+            return False
+        words = NUMBERED_HEADING_PATTERN.sub("", text[:-1]).split()
+        return MIN_HEADING_WORDS <= len(words) <= MAX_HEADING_WORDS and all(
+            word[0].isupper() or word[0].isdigit() or word in HEADING_SMALL_WORDS for word in words
+        )
+
+    @staticmethod
+    def find_section_headings(content: str) -> List[Tuple[int, str]]:
+        """Return (line record position, heading) pairs where sections of an entry start
+
+        Headings follow a blank line. Entries with standalone headings (a blank line
+        after them too) split at those, at "Example 3: Automatic Door Control" lines
+        and at short title-case labels such as "3. Timer Programming Issues:", even
+        when content follows the last two directly. Entries without standalone
+        headings split at every "Label:" line and "Example N:" line.
+        """
+        lines = [line.strip() for line in content.strip().split('\n')]
+        headings, labelled = [], []
+        has_standalone = False
+        position = 0
+        for i, text in enumerate(lines):
+            if not text:
+                continue
+            after_blank = i > 0 and not lines[i - 1]
+            if after_blank and not text.startswith(("-", "*", "──")):
+                heading = text.rstrip(":")
+                example = EXAMPLE_HEADING_PATTERN.match(text) is not None
+                standalone = i + 1 < len(lines) and not lines[i + 1]
+                has_standalone = has_standalone or standalone
+                if standalone or example or KnowledgeIndex.is_titled_label(text):
+                    headings.append((position, heading))
+                if example or text.endswith(":"):
+                    labelled.append((position, heading))
+            position += 1
+        return headings if has_standalone else labelled
+
+    def section_spans(self, doc_id: int) -> List[Tuple[str, int, int]]:
+        """Return the (title, start, end) line record ranges an entry is split into"""
+        item = self.entries[doc_id]
+        records = self.line_records(doc_id)
+        starts = [(0, item["title"])]
+        if len(records) >= MIN_SECTIONED_LINES:
+            headings = self.find_section_headings(item["content"])
+            if headings and headings[0][0] <= 2:
+                # A one- or two-line preamble belongs to the first section
+                starts = [(0, headings[0][1])]
+                headings = headings[1:]
+            starts += headings
+        return [(title, start, end) for (start, title), (end, _) in zip(starts, starts[1:] + [(len(records), "")])]
+
+    def section_term_counts(self, doc_id: int, start: int, end: int) -> Dict[str, int]:
+        """Count the terms in a range of an entry's line records"""
+        counts: Dict[str, int] = {}
+        for record in self.line_records(doc_id)[start:end]:
+            for term in record.terms:
+                counts[term] = counts.get(term, 0) + 1
+        return counts
+
+    def build_sections(self):
+        """Split every entry into sections and index their terms with a parent pointer"""
+        self.sections = []
+        self.section_postings = {}
+        self.entry_sections = []
+        for doc_id in range(len(self.entries)):
+            section_ids = []
+            for title, start, end in self.section_spans(doc_id):
+                section_id = len(self.sections)
+                self.sections.append(Section(doc_id, title, start, end))
+                section_ids.append(section_id)
+                for term, tf in self.section_term_counts(doc_id, start, end).items():
+                    self.section_postings.setdefault(term, {})[section_id] = tf
+            self.entry_sections.append(section_ids)
+
+    def best_section(self, doc_id: int, terms: Set[str]) -> Optional[Section]:
+        """Return the section of an entry that best matches the query terms, or None for single-section entries"""
+        section_ids = self.entry_sections[doc_id]
+        if len(section_ids) < 2:
+            return None
+        # Terms of the entry's title describe every section, so the other query terms pick one when they can
+        title_postings = self.field_postings["title"]
+        topical = {term for term in terms if doc_id not in title_postings.get(term, {})}
+        return self.score_sections(section_ids, topical) or self.score_sections(section_ids, terms)
+
+    def score_sections(self, section_ids: List[int], terms: Set[str]) -> Optional[Section]:
+        """Return the section among section_ids with the best idf-weighted term frequencies, if any matches"""
+        scores: Dict[int, float] = {}
+        for term in terms:
+            postings = self.section_postings.get(term)
+            if not postings:
+                continue
+            for section_id in section_ids:
+                tf = postings.get(section_id)
+                if tf:
+                    scores[section_id] = scores.get(section_id, 0.0) + self.idf.get(term, 0.0) * tf / (tf + 1)
+        if not scores:
+            return None
+        return self.sections[max(scores, key=lambda section_id: (scores[section_id], -section_id))]
+
+    def section_text(self, section: Section) -> str:
+        """Return the stripped text of a section"""
+        return '\n'.join(record.text for record in self.line_records(section.doc_id)[section.start:section.end])
+
+    def code_matches(self, query: str) -> Dict[int, List[str]]:
+        """Look the codes in a query up directly; entries ordered by codes matched, then detail"""
+        matches: Dict[int, List[str]] = {}
+        for code in extract_query_codes(query):
+            for reference in self.code_index.get(code, ()):
+                codes = matches.setdefault(reference.doc_id, [])
+                if code not in codes:
+                    codes.append(code)
+        ordered = sorted(matches, key=lambda doc_id: self.code_match_key(doc_id, matches[doc_id]) + (doc_id,))
+        return {doc_id: matches[doc_id] for doc_id in ordered}
+
+    def code_match_key(self, doc_id: int, codes: List[str]) -> Tuple[int, int]:
+        """Sort key of an entry matching the given codes: more codes first, then the longest description"""
+        detail = max(
+            reference.length for code in codes for reference in self.code_index[code] if reference.doc_id == doc_id
+        )
+        return -len(codes), -detail
+
+    def code_lines(self, doc_id: int, codes: List[str]) -> List[str]:
+        """Return the description lines of the given codes within one entry"""
+        records = self.line_records(doc_id)
+        lines = []
+        for code in codes:
+            for reference in self.code_index.get(code, ()):
+                if reference.doc_id == doc_id:
+                    lines.extend(record.text for record in records[reference.line:reference.line + reference.length])
+        return list(dict.fromkeys(lines))
+
+    def entry_score(self, doc_id: int, terms: List[str], ranking: str, keyword_hits: Set[int]) -> float:
+        """Score a single entry directly from the postings (used for entries found outside ranking)"""
+        if ranking == "legacy":
+            return (10 if doc_id in keyword_hits else 0) + sum(self.postings.get(term, {}).get(doc_id, 0) for term in terms)
+        return sum(self.bm25_weights.get(term, {}).get(doc_id, 0.0) for term in set(terms))
+
+    def explain_score(self, doc_id: int, terms: List[str], ranking: str, keyword_hits: Set[int]) -> Dict[str, Any]:
+        """Break an entry's score down into the keyword bonus and each query term's contribution per field"""
+        if ranking == "legacy":
+            counts = {term: terms.count(term) for term in terms}
+            term_scores = {}
+            for term, count in counts.items():
+                tf = self.postings.get(term, {}).get(doc_id, 0)
+                if tf:
+                    term_scores[term] = {"fields": {"content": tf}, "contribution": tf * count}
+            return {"keyword_hit": 10 if doc_id in keyword_hits else 0, "terms": term_scores}
+
+        term_scores = {}
+        for term in dict.fromkeys(terms):
+            weight = self.bm25_weights.get(term, {}).get(doc_id)
+            if weight is None:
+                continue
+            fields = {
+                field: self.field_postings[field][term][doc_id] for field in FIELD_WEIGHTS
+                if doc_id in self.field_postings[field].get(term, {})
+            }
+            term_scores[term] = {"idf": round(self.idf[term], 4), "fields": fields, "contribution": round(weight, 4)}
+        return {"keyword_hit": 0, "terms": term_scores}
+
+    def build_matrices(self):
+        """Lay the content postings and BM25F weights out as sparse term-document matrices"""
+        if sparse is None:
+            self.tf_matrix = self.bm25_matrix = None
+            return
+
+        shape = (len(self.term_ids), len(self.entries))
+        for name, postings_map in [("tf_matrix", self.postings), ("bm25_matrix", self.bm25_weights)]:
+            rows, cols, values = [], [], []
+            for term, postings in postings_map.items():
+                term_id = self.term_ids[term]
+                for doc_id, value in postings.items():
+                    rows.append(term_id)
+                    cols.append(doc_id)
+                    values.append(value)
+            matrix = sparse.csr_matrix((np.array(values, dtype=np.float64), (rows, cols)), shape=shape)
+            setattr(self, name, matrix)
+
+    def batch_top_k(self, queries: List[List[str]], k: int, ranking: str = "bm25",
+                    keyword_hits: Optional[List[Set[int]]] = None) -> List[List[Tuple[int, float]]]:
+        """Score a batch of tokenized queries together and return each query's top k entries
+
+        The legacy ranking counts repeated query words and adds 10 for each entry in
+        keyword_hits; BM25 sums precomputed contributions of the distinct query terms.
+        With SciPy the batch is a sparse query matrix multiplied by the term-document
+        matrix; without it, each query is scored from the postings lists.
+        """
+        legacy = ranking == "legacy"
+        keyword_hits = keyword_hits or [set() for _ in queries]
+        if sparse is None:
+            if not legacy:
+                return [self.bm25_top_k(terms, k) for terms in queries]
+            return [self.top_from_scores(self.legacy_scores(terms, hits), k)
+                    for terms, hits in zip(queries, keyword_hits)]
+
+        matrix = self.tf_matrix if legacy else self.bm25_matrix
+        if matrix is None:
+            # Dropped by an incremental update; built once per published version
+            self.build_matrices()
+            matrix = self.tf_matrix if legacy else self.bm25_matrix
+        tops = []
+        for start in range(0, len(queries), BATCH_BLOCK_SIZE):
+            block = queries[start:start + BATCH_BLOCK_SIZE]
+            rows, cols, values = [], [], []
+            for row, terms in enumerate(block):
+                counts: Dict[int, int] = {}
+                for term in terms:
+                    term_id = self.term_ids.get(term)
+                    if term_id is not None:
+                        counts[term_id] = counts.get(term_id, 0) + 1 if legacy else 1
+                rows.extend([row] * len(counts))
+                cols.extend(counts.keys())
+                values.extend(counts.values())
+            query_matrix = sparse.csr_matrix(
+                (np.array(values, dtype=np.float64), (rows, cols)), shape=(len(block), matrix.shape[0])
+            )
+            scores = (query_matrix @ matrix).toarray()
+            if legacy:
+                for row, hits in enumerate(keyword_hits[start:start + BATCH_BLOCK_SIZE]):
+                    if hits:
+                        scores[row, list(hits)] += 10
+            for row in scores:
+                tops.append(self.top_from_row(row, k, legacy))
+        return tops
+
+    def legacy_scores(self, terms: List[str], keyword_hits: Set[int]) -> Dict[int, int]:
+        """Legacy scores: 10 per keyword hit plus the content frequency of every query word"""
+        scores: Dict[int, int] = dict.fromkeys(keyword_hits, 10)
+        for term in terms:
+            for doc_id, tf in self.postings.get(term, {}).items():
+                scores[doc_id] = scores.get(doc_id, 0) + tf
+        return scores
+
+    @staticmethod
+    def top_from_scores(scores: Dict[int, float], k: int) -> List[Tuple[int, float]]:
+        """Select the k best positive (entry id, score) pairs from a score map"""
+        top = heapq.nlargest(k, scores.items(), key=lambda x: (x[1], -x[0]))
+        return [(doc_id, score) for doc_id, score in top if score > 0]
+
+    @staticmethod
+    def top_from_row(row, k: int, legacy: bool) -> List[Tuple[int, float]]:
+        """Select the k best positive entries from a dense score row, ties broken by entry id"""
+        candidates = np.flatnonzero(row > 0)
+        if len(candidates) > k:
+            # Keep everything tied with the k-th score so the id tie-break stays exact
+            kth_score = np.partition(row[candidates], len(candidates) - k)[len(candidates) - k]
+            candidates = candidates[row[candidates] >= kth_score]
+        order = np.lexsort((candidates, -row[candidates]))[:k]
+        if legacy:
+            return [(int(candidates[i]), int(round(row[candidates[i]]))) for i in order]
+        return [(int(candidates[i]), float(row[candidates[i]])) for i in order]
+
+    @staticmethod
+    def build_line_records(item: Dict[str, Any]) -> List[LineRecord]:
+        """Split an entry's content into non-empty line records, with the aliases of synonyms they mention"""
+        records = []
+        for line in item["content"].strip().split('\n'):
+            text = line.strip()
+            if text:
+                analyzed = positioned_terms(fold(text))
+                terms = tuple(term for term, _ in analyzed + SYNONYMS.expand(analyzed))
+                records.append(LineRecord(text, terms, frozenset(terms)))
+        return records
+
+    def line_records(self, doc_id: int) -> List[LineRecord]:
+        """Return an entry's line records, building them on first use for lazily loaded entries"""
+        records = self.lines[doc_id]
+        if records is None:
+            records = self.lines[doc_id] = self.build_line_records(self.entries[doc_id])
+        return records
+
+    def export_state(self) -> Dict[str, Any]:
+        """Return the precomputed structures, without entry bodies, for a compiled artifact"""
+        return {key: value for key, value in self.__dict__.items() if key not in ("entries", "lines")}
+
+    @classmethod
+    def from_state(cls, entries: List[Any], state: Dict[str, Any]) -> "KnowledgeIndex":
+        """Rebuild an index from exported state without re-tokenizing the entries"""
+        index = cls.__new__(cls)
+        index.__dict__.update(state)
+        index.entries = entries
+        index.lines = [None] * len(entries)
+        return index
+
+    def correct_term(self, term: str) -> Optional[str]:
+        """Return the replacement for an unknown query term: known terms split apart, or a fuzzy match"""
+        if term in self.bm25_weights or stem(term) in self.bm25_weights or len(term) < MIN_FUZZY_LENGTH:
+            return None
+        if any(char.isdigit() for char in term):
+            return None  # Never guess a different error code or order number, not even by splitting it
+        # Run-together words such as "tiaportal" -> "tia portal"
+        for split in range(2, len(term) - 1):
+            if term[:split] in self.bm25_weights and term[split:] in self.bm25_weights:
+                return f"{term[:split]} {term[split:]}"
+        return self.trigram_index.correct(term)
+
+    def correct_query(self, query: str) -> str:
+        """Fold a query and replace unknown words with their closest vocabulary terms"""
+        folded = fold(query)
+        corrections = {}
+        for word in set(WORD_PATTERN.findall(folded)):
+            correction = self.correct_term(word)
+            if correction:
+                corrections[word] = correction
+        if not corrections:
+            return folded
+        return WORD_PATTERN.sub(lambda match: corrections.get(match.group(), match.group()), folded)
+
+    def keyword_matches(self, folded_query: str) -> Set[int]:
+        """Return ids of entries whose keywords occur in the folded query text"""
+        return self.keyword_automaton.match(folded_query)
+
+    def term_frequencies(self, terms: List[str]) -> Dict[int, Dict[str, int]]:
+        """Collect per-entry frequencies for the given terms, touching only matching entries"""
+        matches: Dict[int, Dict[str, int]] = {}
+        for term in set(terms):
+            for doc_id, tf in self.postings.get(term, {}).items():
+                matches.setdefault(doc_id, {})[term] = tf
+        return matches
+
+    def bm25_scores(self, terms: List[str]) -> Dict[int, float]:
+        """Score matching entries with BM25F by summing precomputed term contributions"""
+        scores: Dict[int, float] = {}
+        for term in set(terms):
+            for doc_id, weight in self.bm25_weights.get(term, {}).items():
+                scores[doc_id] = scores.get(doc_id, 0.0) + weight
+        return scores
+
+    def bm25_top_k(self, terms: List[str], k: int) -> List[Tuple[int, float]]:
+        """Return the k best (entry id, score) pairs, skipping entries that cannot reach the top k
+
+        Terms are visited from the highest MaxScore bound down. An entry first seen in a
+        term's postings cannot contain any higher term, so its best possible score is
+        its weight plus the bounds of the remaining lower terms. Entries whose bound
+        cannot beat the current k-th score are dropped before they are fully scored, and
+        once the bounds of the remaining terms fall below that score the scan stops.
+        """
+        # Take each term's postings once; an incremental update swaps in new maps rather than editing these
+        term_weights = {term: self.bm25_weights.get(term) for term in set(terms)}
+        term_weights = {term: weights for term, weights in term_weights.items() if weights}
+        bounds = {term: self.max_weights.get(term) or max(weights.values()) for term, weights in term_weights.items()}
+        terms = sorted(term_weights, key=bounds.get)
+        upper_bounds = []
+        total = 0.0
+        for term in terms:
+            total += bounds[term]
+            upper_bounds.append(total)
+
+        heap: List[Tuple[float, int]] = []  # min-heap of (score, -entry id)
+        seen: Set[int] = set()
+        for i in range(len(terms) - 1, -1, -1):
+            # An entry tying the k-th score can still win on a lower id, so only a lower bound stops the scan
+            if len(heap) == k and upper_bounds[i] < heap[0][0]:
+                break
+            for doc_id, weight in term_weights[terms[i]].items():
+                if doc_id in seen:
+                    continue
+                seen.add(doc_id)
+                score = weight
+                for j in range(i - 1, -1, -1):
+                    if len(heap) == k and (score + upper_bounds[j], -doc_id) <= heap[0]:
+                        break
+                    score += term_weights[terms[j]].get(doc_id, 0.0)
+                else:
+                    entry = (score, -doc_id)
+                    if len(heap) < k:
+                        heapq.heappush(heap, entry)
+                    elif entry > heap[0]:
+                        heapq.heapreplace(heap, entry)
+
+        return [(-neg_id, score) for score, neg_id in sorted(heap, reverse=True)]
+
+    def phrase_matches(self, phrase: Tuple[Tuple[str, int], ...]) -> Dict[int, int]:
+        """Return the entries containing a phrase, with its number of occurrences
+
+        Entries are the intersection of the terms' positional postings, rarest term
+        first; an occurrence is an anchor position at which every other term sits at
+        its offset within the phrase. No entry text is read.
+        """
+        postings = []
+        for term, offset in phrase:
+            term_positions = self.positions.get(term)
+            if not term_positions:
+                return {}
+            postings.append((term_positions, offset))
+        postings.sort(key=lambda item: len(item[0]))
+        (anchor, anchor_offset), others = postings[0], postings[1:]
+        doc_ids = set(anchor)
+        for term_positions, _ in others:
+            doc_ids &= term_positions.keys()
+
+        matches = {}
+        for doc_id in doc_ids:
+            shifted = [(set(term_positions[doc_id]), offset - anchor_offset) for term_positions, offset in others]
+            count = sum(
+                1 for position in anchor[doc_id]
+                if all(position + delta in positions for positions, delta in shifted)
+            )
+            if count:
+                matches[doc_id] = count
+        return matches
+
+    def phrase_top_k(self, phrases: Tuple[Tuple[Tuple[str, int], ...], ...], terms: List[str], k: int,
+                     ranking: str = "bm25", keyword_hits: Optional[Set[int]] = None) -> List[Tuple[int, float]]:
+        """Rank only the entries containing every quoted phrase, more occurrences first among equal scores"""
+        matches: Optional[Dict[int, int]] = None
+        for phrase in phrases:
+            found = self.phrase_matches(phrase)
+            matches = found if matches is None else {doc_id: matches[doc_id] + found[doc_id] for doc_id in matches.keys() & found.keys()}
+        scores = {doc_id: self.entry_score(doc_id, terms, ranking, keyword_hits or set()) for doc_id in matches or {}}
+        top = heapq.nlargest(k, scores, key=lambda doc_id: (scores[doc_id], matches[doc_id], -doc_id))
+        return [(doc_id, scores[doc_id]) for doc_id in top if scores[doc_id] > 0]
+
+    @staticmethod
+    def min_distance(first: Tuple[int, ...], second: Tuple[int, ...]) -> int:
+        """Smallest gap between two ascending position lists, by a merge walk"""
+        i = j = 0
+        best = None
+        while i < len(first) and j < len(second):
+            gap = abs(first[i] - second[j])
+            if best is None or gap < best:
+                best = gap
+            if first[i] < second[j]:
+                i += 1
+            else:
+                j += 1
+        return best
+
+    def proximity_rerank(self, top: List[Tuple[int, float]], terms: List[str], positions: List[int],
+                         k: int) -> List[Tuple[int, float]]:
+        """Boost candidates in which neighbouring query words also appear close together, and keep the best k
+
+        Pairs are consecutive words of the query (compounds are covered by their
+        parts); a pair within PROXIMITY_WINDOW positions adds
+        PROXIMITY_WEIGHT * min(idf) / distance.
+        """
+        words = [(term, position) for term, position in zip(terms, positions) if WORD_PATTERN.fullmatch(term)]
+        pairs = [
+            (first, second) for (first, first_position), (second, second_position) in zip(words, words[1:])
+            if first != second and second_position > first_position
+        ]
+        if not pairs:
+            return top[:k]
+
+        rescored = []
+        for doc_id, score in top:
+            for first, second in pairs:
+                first_positions = self.positions.get(first, {}).get(doc_id)
+                second_positions = self.positions.get(second, {}).get(doc_id)
+                if first_positions and second_positions:
+                    distance = self.min_distance(first_positions, second_positions)
+                    if 0 < distance <= PROXIMITY_WINDOW:
+                        score += PROXIMITY_WEIGHT * min(self.idf.get(first, 0.0), self.idf.get(second, 0.0)) / distance
+            rescored.append((doc_id, score))
+        rescored.sort(key=lambda item: (-item[1], item[0]))
+        return rescored[:k]
+
+    def relevant_lines(self, doc_id: int, terms: Set[str], limit: int = 5, section: Optional[Section] = None) -> List[str]:
+        """Pick the lines of an entry (or one of its sections) whose shared query terms weigh most, in content order
+
+        Shared terms are weighted by idf, so the line holding a rare, decisive term
+        beats generic lines that repeat terms every entry has.
+        """
+        records = self.line_records(doc_id)
+        if section is not None:
+            records = records[section.start:section.end]
+        ranked = heapq.nlargest(
+            limit,
+            (
+                (sum(self.idf.get(term, 0.0) for term in shared), len(shared), -position)
+                for position, shared in ((position, terms & record.tokens) for position, record in enumerate(records))
+            ),
+        )
+        positions = sorted(-position for _, overlap, position in ranked if overlap > 0)
+        if not positions:
+            # Fallback to first few lines
+            return [record.text for record in records[:limit]]
+        return [records[position].text for position in positions]
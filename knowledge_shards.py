@@ -0,0 +1,168 @@
+"""
+Knowledge base partitioned across worker processes
+
+Entries are dealt round-robin to N shards, each a worker process holding an
+assistant over its part. A search is sent to every shard at once; each ranks its
+own top k and returns it with merge keys, and the parent merges them into the
+global top k. Entry i lives in shard i % N as its entry i // N, so ids map back
+without a table and ties still break by global id.
+
+Scores from different shards are comparable: once built, the shards exchange
+their BM25F collection statistics (entry count, document frequencies, field
+lengths) and rescore with the totals, so every weight equals that of one index
+over the whole knowledge base. Legacy scores depend only on the entry itself.
+Fuzzy correction uses each shard's own vocabulary. The parent keeps an index of
+the whole knowledge base as well: spec, comparison and address questions are
+looked up there, as in a single process, and only the rest fan out.
+"""
+
+import hashlib
+import heapq
+import multiprocessing
+import threading
+from typing import List, Dict, Any, Optional, Tuple
+
+# What a shard returns per result: merge key, result, answer text and cited source
+Candidate = Tuple[Tuple, Dict[str, Any], Optional[str], Optional[Dict[str, Any]]]
+
+def serve_shard(connection, assistant_class, entries: List[Dict[str, Any]]):
+    """Build one shard's assistant and answer search requests until told to stop"""
+    try:
+        assistant = assistant_class.from_entries(entries, cache_size=0)
+        connection.send((True, (assistant.index.version, assistant.index.collection_statistics())))
+        statistics = connection.recv()
+        if statistics is not None:
+            assistant.index.apply_collection_statistics(*statistics)
+        connection.send((True, None))
+    except Exception as e:
+        connection.send((False, f"{type(e).__name__}: {e}"))
+        return
+    while True:
+        try:
+            request = connection.recv()
+        except EOFError:
+            break  # The parent went away
+        if request is None:
+            break
+        try:
+            connection.send((True, assistant.shard_candidates(*request)))
+        except Exception as e:
+            connection.send((False, f"{type(e).__name__}: {e}"))
+    connection.close()
+
+class KnowledgeShards:
+    """Worker processes that each search one partition of the knowledge base"""
+
+    def __init__(self, assistant_class, entries: List[Any], num_shards: int):
+        if isinstance(num_shards, bool) or not isinstance(num_shards, int) or num_shards < 1:
+            raise ValueError("num_shards must be a positive integer")
+        # Forked workers inherit the entries instead of receiving them pickled
+        context = multiprocessing.get_context("fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn")
+        self.num_shards = num_shards
+        self.num_entries = len(entries)
+        self.connections = []
+        self.processes = []
+        # A pipe carries one request at a time, so concurrent searches take turns fanning out
+        self.lock = threading.Lock()
+        for shard in range(num_shards):
+            # Entries of a memory-mapped artifact are copied out so each worker owns its part
+            part = [dict(item) for item in entries[shard::num_shards]]
+            connection, child_connection = context.Pipe()
+            process = context.Process(
+                target=serve_shard, args=(child_connection, assistant_class, part),
+                name=f"knowledge-shard-{shard}", daemon=True
+            )
+            process.start()
+            child_connection.close()
+            self.connections.append(connection)
+            self.processes.append(process)
+        self.version = ""
+
+    def wait_until_built(self):
+        """Wait for the shards to index their parts, then have them rescore with the statistics of the whole collection
+
+        The shards build in parallel from the moment they are started, so the caller can
+        do other work, such as indexing the whole collection itself, before waiting.
+        """
+        num_shards = self.num_shards
+        try:
+            built = [self.unwrap(shard, self.receive(shard)) for shard in range(num_shards)]
+            statistics = self.merge_statistics([shard_statistics for _, shard_statistics in built]) if num_shards > 1 else None
+            for connection in self.connections:
+                connection.send(statistics)
+            for shard in range(num_shards):
+                self.unwrap(shard, self.receive(shard))
+        except (RuntimeError, OSError):
+            self.close()
+            raise
+        self.version = hashlib.sha1(" ".join(version for version, _ in built).encode("utf-8")).hexdigest()[:12]
+
+    @staticmethod
+    def merge_statistics(shard_statistics: List[Tuple[int, Dict[str, int], Dict[str, int]]]) -> Tuple[int, Dict[str, int], Dict[str, int]]:
+        """Sum the shards' entry counts, document frequencies and field length totals"""
+        num_docs = 0
+        doc_frequencies: Dict[str, int] = {}
+        field_length_totals: Dict[str, int] = {}
+        for shard_docs, shard_frequencies, shard_totals in shard_statistics:
+            num_docs += shard_docs
+            for term, doc_frequency in shard_frequencies.items():
+                doc_frequencies[term] = doc_frequencies.get(term, 0) + doc_frequency
+            for field, total in shard_totals.items():
+                field_length_totals[field] = field_length_totals.get(field, 0) + total
+        return num_docs, doc_frequencies, field_length_totals
+
+    def receive(self, shard: int) -> Tuple[bool, Any]:
+        """Read a shard's (ok, payload) reply"""
+        try:
+            return self.connections[shard].recv()
+        except EOFError:
+            raise RuntimeError(f"Knowledge shard {shard} exited") from None
+
+    @staticmethod
+    def unwrap(shard: int, reply: Tuple[bool, Any]) -> Any:
+        """Return a reply's payload, raising the shard's error if its request failed"""
+        ok, payload = reply
+        if not ok:
+            raise RuntimeError(f"Knowledge shard {shard} failed: {payload}")
+        return payload
+
+    def search(self, questions: List[str], k: int, ranking: str, fuzzy: bool,
+               render: bool) -> List[List[Tuple[Dict[str, Any], Optional[str], Optional[Dict[str, Any]]]]]:
+        """Search every shard in parallel and merge their results into each question's global top k
+
+        Returns (result, answer text, cited source) triples; answer and source are None unless rendered.
+        """
+        with self.lock:
+            for connection in self.connections:
+                connection.send((questions, k, ranking, fuzzy, render))
+            # Every reply is read before any error is raised, so no pipe is left holding a stale one
+            replies = [self.receive(shard) for shard in range(self.num_shards)]
+        replies = [self.unwrap(shard, reply) for shard, reply in enumerate(replies)]
+
+        merged = []
+        for position in range(len(questions)):
+            candidates: List[Candidate] = []
+            for shard, reply in enumerate(replies):
+                for key, result, answer, source in reply[position]:
+                    global_id = result["id"] * self.num_shards + shard
+                    candidates.append((key + (global_id,), dict(result, id=global_id), answer, source))
+            top = heapq.nsmallest(k, candidates, key=lambda candidate: candidate[0])
+            merged.append([(result, answer, source) for _, result, answer, source in top])
+        return merged
+
+    def close(self):
+        """Stop the worker processes"""
+        for connection in self.connections:
+            try:
+                connection.send(None)
+            except (OSError, ValueError):
+                pass  # Already gone
+        for process in self.processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+                process.join()
+        for connection in self.connections:
+            connection.close()
+        self.connections = []
+        self.processes = []
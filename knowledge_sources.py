@@ -0,0 +1,166 @@
+"""
+Knowledge-base entries loaded from a directory of files, with hot reload
+
+Each *.json file in the directory holds one entry ({"title", "keywords", "content"}).
+A file whose title matches a built-in entry replaces that entry; any other file adds
+one. Polling stats the files and re-indexes only those whose inode, mtime or size
+changed, so articles can be added or fixed without restarting the workers.
+"""
+
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Tuple
+
+from knowledge_index import KnowledgeIndex
+
+SOURCE_PATTERN = "*.json"
+DEFAULT_POLL_INTERVAL = 5.0
+
+def load_entry_file(path: Path) -> Dict[str, Any]:
+    """Read and validate one knowledge entry file"""
+    with open(path, encoding="utf-8") as file:
+        data = json.load(file)
+    if not isinstance(data, dict) or not isinstance(data.get("title"), str) or not isinstance(data.get("content"), str):
+        raise ValueError("expected an object with 'title' and 'content' strings")
+    keywords = data.get("keywords", [])
+    if not isinstance(keywords, list) or not all(isinstance(keyword, str) for keyword in keywords):
+        raise ValueError("'keywords' must be a list of strings")
+    return {"title": data["title"].strip(), "keywords": keywords, "content": data["content"]}
+
+class KnowledgeSourceWatcher:
+    """Keeps a knowledge index in sync with a directory of entry files"""
+
+    def __init__(self, directory: str, index: KnowledgeIndex, interval: float = DEFAULT_POLL_INTERVAL):
+        self.directory = Path(directory)
+        self.index = index
+        self.interval = interval
+        # file name -> (inode, mtime in ns, size) as of the last successful load, and the entry it feeds
+        self.snapshot: Dict[str, Tuple[int, int, int]] = {}
+        self.doc_ids: Dict[str, int] = {}
+        # Built-in entries by title, the originals of those overridden by a file, and ids of removed files
+        self.builtin_ids = {item["title"]: doc_id for doc_id, item in enumerate(index.entries)}
+        self.overridden: Dict[int, Any] = {}
+        self.free_ids: List[int] = []
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+        self.thread_pid: Optional[int] = None
+        self.reloads = 0
+
+    def scan(self) -> Dict[str, Tuple[int, int, int]]:
+        """Stat every entry file without reading it"""
+        snapshot = {}
+        for path in self.directory.glob(SOURCE_PATTERN):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue  # Deleted between listing and stat
+            snapshot[path.name] = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        return snapshot
+
+    def release(self, name: str, changes: Dict[int, Optional[Dict[str, Any]]]):
+        """Drop a file's entry, restoring the built-in entry it overrode"""
+        doc_id = self.doc_ids.pop(name)
+        if doc_id in self.overridden:
+            changes[doc_id] = self.overridden.pop(doc_id)
+        else:
+            changes[doc_id] = None
+            self.free_ids.append(doc_id)
+
+    def assign(self, name: str, item: Dict[str, Any], changes: Dict[int, Optional[Dict[str, Any]]]):
+        """Place a file's entry over the built-in entry with its title, a freed id or a new id"""
+        target = self.builtin_ids.get(item["title"])
+        if target is not None and target not in self.overridden:
+            # A built-in entry restored earlier in this poll is not in the index yet
+            self.overridden[target] = changes[target] if target in changes else self.index.entries[target]
+            doc_id = target
+        elif self.free_ids:
+            doc_id = self.free_ids.pop()
+        else:
+            doc_id = len(self.index.entries) + sum(1 for changed_id in changes if changed_id >= len(self.index.entries))
+        self.doc_ids[name] = doc_id
+        changes[doc_id] = item
+
+    def poll(self) -> Dict[str, Any]:
+        """Apply added, modified and deleted files to the index and report what changed"""
+        with self.lock:
+            start_time = time.perf_counter()
+            snapshot = self.scan()
+            modified = [name for name, signature in snapshot.items() if self.snapshot.get(name) != signature]
+            deleted = [name for name in self.snapshot if name not in snapshot]
+            if not modified and not deleted:
+                return {"changed": 0, "deleted": 0, "errors": 0, "seconds": 0.0}
+
+            # Bookkeeping as of the last applied poll, restored if the index update fails so the files are retried
+            applied = (dict(self.snapshot), dict(self.doc_ids), dict(self.overridden), list(self.free_ids))
+            try:
+                return self.apply(snapshot, modified, deleted, start_time)
+            except Exception:
+                self.snapshot, self.doc_ids, self.overridden, self.free_ids = applied
+                raise
+
+    def apply(self, snapshot: Dict[str, Tuple[int, int, int]], modified: List[str], deleted: List[str],
+              start_time: float) -> Dict[str, Any]:
+        """Turn added, modified and deleted files into entry changes and apply them to the index"""
+        changes: Dict[int, Optional[Dict[str, Any]]] = {}
+        for name in deleted:
+            self.release(name, changes)
+            del self.snapshot[name]
+
+        errors = 0
+        for name in sorted(modified):
+            try:
+                item = load_entry_file(self.directory / name)
+            except (OSError, ValueError) as e:
+                # Keep the previous version (a half-written file is retried on the next poll)
+                print(f"⚠️  Skipping knowledge file {name}: {e}")
+                errors += 1
+                continue
+            doc_id = self.doc_ids.get(name)
+            overrides = self.builtin_ids.get(item["title"])
+            if doc_id is not None and (doc_id == overrides or (doc_id not in self.overridden and overrides is None)):
+                changes[doc_id] = item
+            else:
+                if doc_id is not None:
+                    self.release(name, changes)
+                self.assign(name, item, changes)
+            self.snapshot[name] = snapshot[name]
+
+        if changes:
+            self.index.update_entries(changes)
+            self.reloads += 1
+        seconds = time.perf_counter() - start_time
+        return {"changed": len(modified) - errors, "deleted": len(deleted), "errors": errors, "seconds": seconds}
+
+    def run(self):
+        """Poll until stopped"""
+        while not self.stop_event.wait(self.interval):
+            try:
+                stats = self.poll()
+                if stats["changed"] or stats["deleted"]:
+                    print(f"🔄 Reloaded knowledge sources: {stats['changed']} changed, {stats['deleted']} deleted "
+                          f"in {stats['seconds'] * 1000:.1f} ms")
+            except Exception as e:
+                print(f"❌ Error polling knowledge sources: {e}")
+
+    def start(self):
+        """Start polling in a daemon thread; call again in a forked worker, which inherits no threads"""
+        if self.thread_pid == os.getpid() and self.thread is not None and self.thread.is_alive():
+            return
+        if self.thread_pid is not None and self.thread_pid != os.getpid():
+            # The parent's polling thread may have held the lock at fork time
+            self.lock = threading.Lock()
+        self.thread_pid = os.getpid()
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self.run, name="knowledge-source-watcher", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Stop the polling thread"""
+        self.stop_event.set()
+        if self.thread is not None and self.thread_pid == os.getpid():
+            self.thread.join()
+        self.thread = None
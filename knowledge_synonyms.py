@@ -0,0 +1,93 @@
+"""
+Synonyms and aliases compiled into the simple assistant's index
+
+Wherever an entry mentions one variant of a group, the terms of every other variant
+are indexed at the same word position, so a question using any spelling finds it
+without the question being expanded. The keyword automaton is compiled with the
+same variants, so keyword lists no longer need to enumerate them.
+"""
+
+import re
+from typing import List, Dict, Tuple
+
+from query_analyzer import WORD_PATTERN, fold, positioned_terms
+
+# Each group lists interchangeable spellings; multi-word variants are matched as phrases
+SYNONYM_GROUPS = [
+    ("lad", "ladder logic", "ladder diagram"),
+    ("fbd", "function block diagram"),
+    ("stl", "statement list"),
+    ("scl", "structured control language", "structured text"),
+    ("irt", "isochronous real-time"),
+    ("ob", "organization block"),
+    ("fb", "function block"),
+    ("db", "data block"),
+    ("hmi", "human machine interface", "operator panel"),
+    ("vfd", "variable frequency drive", "frequency converter"),
+    ("e-stop", "emergency stop"),
+    ("f-cpu", "fail-safe cpu", "safety cpu"),
+    ("s7-1500", "s7 1500", "s71500", "simatic s7-1500", "cpu 1500", "plc 1500"),
+    ("s7-1200", "s7 1200", "s71200", "simatic s7-1200", "cpu 1200", "plc 1200"),
+]
+
+class SynonymExpander:
+    """Compiled synonym groups: variant lookup by first word, and per-variant index terms"""
+
+    def __init__(self, groups: List[Tuple[str, ...]]):
+        # Analyzed (term, relative position) pairs of every variant, per group
+        self.group_terms: List[List[List[Tuple[str, int]]]] = []
+        # first word -> (word sequence, group, variant), longest variants first
+        self.starts: Dict[str, List[Tuple[Tuple[str, ...], int, int]]] = {}
+        # Folded spellings and whole-word patterns for keyword variants
+        self.spellings: List[List[Tuple[str, re.Pattern]]] = []
+        for group_id, group in enumerate(groups):
+            analyzed_group = []
+            spellings = []
+            for variant_id, variant in enumerate(group):
+                folded = fold(variant)
+                terms = positioned_terms(folded)
+                analyzed_group.append(terms)
+                words = tuple(term for term, _ in terms if WORD_PATTERN.fullmatch(term))
+                self.starts.setdefault(words[0], []).append((words, group_id, variant_id))
+                spellings.append((folded, re.compile(rf"(?<!\w){re.escape(folded)}(?!\w)")))
+            self.group_terms.append(analyzed_group)
+            self.spellings.append(spellings)
+        for candidates in self.starts.values():
+            candidates.sort(key=lambda candidate: -len(candidate[0]))
+
+    def expand(self, terms: List[Tuple[str, int]]) -> List[Tuple[str, int]]:
+        """Return the alias (term, position) pairs to index alongside an analyzed text"""
+        starts = [(position, term) for term, position in terms if term in self.starts]
+        if not starts:
+            return []
+        words_at = {position: term for term, position in terms if WORD_PATTERN.fullmatch(term)}
+        present = set(terms)
+        aliases = []
+        for position, word in sorted(starts):
+            for words, group_id, variant_id in self.starts.get(word, ()):
+                if all(words_at.get(position + offset) == part for offset, part in enumerate(words)):
+                    for other_id, other_terms in enumerate(self.group_terms[group_id]):
+                        if other_id == variant_id:
+                            continue
+                        for term, offset in other_terms:
+                            alias = (term, position + offset)
+                            if alias not in present:
+                                present.add(alias)
+                                aliases.append(alias)
+                    break  # Longest variant starting here wins
+        return aliases
+
+    def keyword_variants(self, keyword: str) -> List[str]:
+        """Return the folded keyword with each contained variant replaced by the other variants of its group"""
+        folded = fold(keyword)
+        variants = []
+        for spellings in self.spellings:
+            for spelling, pattern in spellings:
+                if pattern.search(folded):
+                    variants.extend(
+                        pattern.sub(lambda match, other=other: other, folded)
+                        for other, _ in spellings if other != spelling
+                    )
+        return [variant for variant in dict.fromkeys(variants) if variant != folded]
+
+SYNONYMS = SynonymExpander(SYNONYM_GROUPS)
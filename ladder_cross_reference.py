@@ -0,0 +1,168 @@
+"""
+Cross-reference of the I/O addresses and tags used in ladder logic content
+
+Rungs such as "──┤ Start ├──┤/Stop ├──( Motor )──" are parsed into their elements
+(contacts, NC contacts, coils, timers and counters) and paired with the address row
+written under them ("I0.0  I0.1  Q0.0"); I/O lists ("Q0.2 - Door Open Light") are
+read as well. Every address and tag then maps to the rungs that use it, with the
+example and network they belong to, so a question such as "what does Q0.2 do in
+the door example" is answered with just those network lines.
+"""
+
+import re
+import textwrap
+from typing import List, Dict, Any, Optional, Tuple, NamedTuple
+
+# Contacts "┤ Start ├" / "┤/Stop ├" and coils "──( Motor )" of a rung, in order
+ELEMENT_PATTERN = re.compile(r"┤\s*(/?)\s*([^┤├]+?)\s*├|(?<=─)\(\s*([^()]+?)\s*\)")
+# Entries of the address row: I0.0, %M0.0, a bare %I, T1, C1, or Timer/Counter for a T1.Q/C1.Q contact
+ADDRESS_TOKEN_PATTERN = re.compile(r"%?[IQM]\d+\.\d+|%[IQM]\b|\b[TC]\d+\b|\bTimer\b|\bCounter\b")
+ADDRESS_PATTERN = re.compile(r"^%?([IQM]\d+\.\d+|[TC]\d+)$")
+# I/O list lines "I0.2 - Door Fully Open Limit" and explanations "Start button (I0.0) initiates motor"
+ASSIGNMENT_PATTERN = re.compile(r"^%?([IQM]\d+\.\d+)\s+-\s+(.+)$")
+MENTION_PATTERN = re.compile(r"\(%?([IQM]\d+\.\d+)\)")
+# Timer/counter bits used as contacts: T1.Q, C1.Q
+BIT_PATTERN = re.compile(r"^([TC]\d+)\.\w+$")
+LADDER_ADDRESS_PATTERN = re.compile(r"\b[IQM]\d+\.\d+\b")
+EXAMPLE_PATTERN = re.compile(r"^Example \d+:")
+NETWORK_PATTERN = re.compile(r"^Network \d+:")
+TIMER_PREFIXES = ("TON", "TOF", "TP")
+COUNTER_PREFIXES = ("CTU", "CTD", "CTUD")
+AREA_ROLES = {"I": "input", "Q": "output", "M": "memory bit"}
+
+# Addresses in questions: i0.0, %q0.2, t1, c1
+QUERY_ADDRESS_PATTERN = re.compile(r"(?<![\w.#])%?([iqm]\d+\.\d+|[tc]\d+)(?![\w#])")
+QUERY_TAG_PATTERN = re.compile(r"\w+")
+
+class AddressReference(NamedTuple):
+    """One use of an address or tag: its line records, role and where in the entry it is"""
+    doc_id: int
+    line: int
+    length: int
+    address: str  # "Q0.2", "T1", or "" when only a tag is written
+    tag: str  # "Open_Light", or "" in I/O lists
+    role: str  # contact, NC contact, coil, timer, counter, input, output, memory bit
+    context: str  # example or section the use belongs to
+    network: str
+
+class AddressFacts(NamedTuple):
+    """The network lines answering a question about addresses or tags, looked up without ranking"""
+    symbols: Tuple[str, ...]
+    references: Tuple[AddressReference, ...]
+    lines: Tuple[str, ...]
+    doc_ids: Tuple[int, ...]
+
+def symbol_key(symbol: str) -> str:
+    """Lookup key of an address or tag: "%Q0.2" and "q0.2" are the same address"""
+    return symbol.lstrip("%").lower()
+
+def element_role(negated: bool, contact: Optional[str], coil: Optional[str], address: str) -> str:
+    """Role of a rung element"""
+    if contact is not None:
+        return "NC contact" if negated else "contact"
+    if coil.upper().startswith(TIMER_PREFIXES) or address.startswith("T"):
+        return "timer"
+    if coil.upper().startswith(COUNTER_PREFIXES) or address.startswith("C"):
+        return "counter"
+    return "coil"
+
+def pair_addresses(elements: List[Tuple[int, str, str]], tokens: List[Tuple[int, str]]) -> List[str]:
+    """Match the address row to rung elements: in order when the counts agree, else by nearest column"""
+    addresses = [""] * len(elements)
+    if len(tokens) == len(elements):
+        return [token for _, token in tokens]
+    for column, token in tokens:
+        nearest = min(range(len(elements)), key=lambda i: abs(elements[i][0] - column))
+        if not addresses[nearest]:
+            addresses[nearest] = token
+    return addresses
+
+def has_ladder_content(content: str) -> bool:
+    """Whether an entry may hold rungs, I/O lists or address mentions worth parsing"""
+    return "──" in content or LADDER_ADDRESS_PATTERN.search(content) is not None
+
+def entry_references(doc_id: int, content: str, sections: List[Tuple[str, int, int]]) -> Dict[str, List[AddressReference]]:
+    """Find every address and tag used in an entry's rungs and I/O lists
+
+    Line numbers are line record positions (non-empty lines), like the code table's.
+    Each use belongs to the latest "Example N:" heading, or else to its section.
+    """
+    references: Dict[str, List[AddressReference]] = {}
+    lines = [line.rstrip() for line in textwrap.dedent(content).strip().split('\n') if line.strip()]
+    section_starts = {start: title for title, start, _ in sections}
+    context, network = "", ""
+    for position, line in enumerate(lines):
+        text = line.strip()
+        if position in section_starts:
+            context, network = section_starts[position], ""
+        if EXAMPLE_PATTERN.match(text):
+            context, network = text.rstrip(":"), ""
+            continue
+        if NETWORK_PATTERN.match(text):
+            network = text
+            continue
+
+        uses: List[Tuple[str, str, str, int]] = []  # (address, tag, role, lines spanned)
+        assignment = ASSIGNMENT_PATTERN.match(text)
+        if assignment:
+            address = assignment.group(1)
+            uses.append((address, "", f"{AREA_ROLES[address[0]]} ({assignment.group(2)})", 1))
+        elif "──" in text:
+            elements = [
+                (match.start(2) if match.group(2) else match.start(3), match.group(1) == "/", match.group(2), match.group(3))
+                for match in ELEMENT_PATTERN.finditer(line)
+            ]
+            if not elements:
+                continue
+            row = lines[position + 1] if position + 1 < len(lines) else ""
+            tokens = [(match.start(), match.group()) for match in ADDRESS_TOKEN_PATTERN.finditer(row)]
+            # The next line is the address row only if it holds nothing but addresses and parameters
+            if "──" in row or not tokens:
+                tokens = []
+            addresses = pair_addresses([(column, contact, coil) for column, _, contact, coil in elements], tokens)
+            for (column, negated, contact, coil), address in zip(elements, addresses):
+                name = contact if contact is not None else coil
+                bit = BIT_PATTERN.match(name)
+                if bit:
+                    address = bit.group(1)  # "T1.Q" is the done bit of T1; the row only says "Timer"
+                elif ADDRESS_PATTERN.match(name):
+                    address, name = name, ""  # An address written as the element itself
+                address = address.lstrip("%") if ADDRESS_PATTERN.match(address) else ""
+                uses.append((address, name, element_role(negated, contact, coil, address), 2 if tokens else 1))
+        else:
+            for address in MENTION_PATTERN.findall(text):
+                uses.append((address, "", AREA_ROLES[address[0]], 1))
+
+        for address, tag, role, length in uses:
+            reference = AddressReference(doc_id, position, length, address, tag, role, context, network)
+            for symbol in dict.fromkeys(symbol for symbol in (address, tag) if symbol):
+                references.setdefault(symbol_key(symbol), []).append(reference)
+    return references
+
+def query_symbols(folded_query: str, address_index: Dict[str, List[AddressReference]]) -> List[str]:
+    """Return the known addresses and tags a folded question names
+
+    Plain words are never taken as tags ("start", "motor"); only tags with an
+    underscore or a digit, such as Safety_Feedback or OSSD1, are.
+    """
+    symbols = [address for address in QUERY_ADDRESS_PATTERN.findall(folded_query) if address in address_index]
+    symbols.extend(
+        word for word in QUERY_TAG_PATTERN.findall(folded_query)
+        if ("_" in word or any(char.isdigit() for char in word)) and word in address_index
+    )
+    return list(dict.fromkeys(symbols))
+
+def describe(reference: AddressReference) -> str:
+    """One-phrase role of a use: "coil Open_Light", "output (Door Open Light)" """
+    return f"{reference.role} {reference.tag}" if reference.tag else reference.role
+
+def reference_json(reference: AddressReference, title: str) -> Dict[str, Any]:
+    """Plain-dict form of a reference for API responses"""
+    return {
+        "title": title,
+        "context": reference.context,
+        "network": reference.network,
+        "address": reference.address,
+        "tag": reference.tag,
+        "role": reference.role
+    }
@@ -0,0 +1,140 @@
+"""
+PDF text extraction for the RAG assistant, serially or in a process pool
+
+Extraction and cleaning are CPU-bound, so with several workers each PDF is split
+into page ranges that are extracted in parallel. A file's first task extracts its
+first range and also reports its page count, so a short file is read in one task
+and a long one is never parsed just to be counted. Results are collected in
+submission order, so the pages come out in file and page order whatever the
+number of workers. Workers only import this module and return plain
+(page number, text) pairs.
+"""
+
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Tuple
+
+import pypdf
+
+# Pages per parallel task: large manuals are split so one file does not hold up the pool
+PAGES_PER_TASK = 32
+
+# (page number, cleaned text) of the non-empty pages of a PDF, or None if the file could not be read
+PdfPages = Optional[List[Tuple[int, str]]]
+
+def clean_pdf_text(text: str) -> str:
+    """Clean and normalize PDF text for better processing"""
+    if not text:
+        return ""
+
+    # Remove excessive whitespace
+    text = re.sub(r'\s+', ' ', text)
+
+    # Fix common PDF extraction issues
+    text = re.sub(r'([a-z])([A-Z])', r'\1 \2', text)  # Add space between lowercase and uppercase
+    text = re.sub(r'\s*\n\s*', ' ', text)  # Replace newlines with spaces
+    text = re.sub(r'\s*\f\s*', ' ', text)  # Replace form feeds
+
+    # Remove page numbers and headers/footers patterns
+    text = re.sub(r'\b\d{1,3}\s*$', '', text)  # Remove trailing page numbers
+    text = re.sub(r'^\s*\d{1,3}\s*', '', text)  # Remove leading page numbers
+
+    # Remove excessive punctuation
+    text = re.sub(r'[.]{3,}', '...', text)
+    text = re.sub(r'[-]{3,}', '---', text)
+
+    return text.strip()
+
+def read_pdf_pages(pdf_path: str, start: int = 0, end: Optional[int] = None) -> Tuple[int, List[Tuple[int, str]]]:
+    """Return a PDF's page count and its cleaned pages [start, end), both from one parse (see extract_pdf_pages)"""
+    pages = []
+    with open(pdf_path, 'rb') as file:
+        pdf_reader = pypdf.PdfReader(file)
+        num_pages = len(pdf_reader.pages)
+        end = num_pages if end is None else min(end, num_pages)
+        for page_num in range(start, end):
+            try:
+                cleaned_text = clean_pdf_text(pdf_reader.pages[page_num].extract_text())
+            except Exception as e:
+                print(f"Error extracting page {page_num + 1} from {pdf_path}: {e}")
+                continue
+            if cleaned_text.strip():  # Only add non-empty pages
+                pages.append((page_num + 1, cleaned_text))
+    return num_pages, pages
+
+def extract_pdf_pages(pdf_path: str, start: int = 0, end: Optional[int] = None) -> List[Tuple[int, str]]:
+    """Extract and clean pages [start, end) of a PDF as (page number, text) pairs, skipping empty pages"""
+    return read_pdf_pages(pdf_path, start, end)[1]
+
+def resolve_workers(workers: int) -> int:
+    """Turn a configured worker count into a process count: 0 means one per CPU core"""
+    if isinstance(workers, bool) or not isinstance(workers, int) or workers < 0:
+        raise ValueError("workers must be a non-negative integer (0 for one per CPU core)")
+    return workers or os.cpu_count() or 1
+
+def extract_pdf_files(pdf_files: List[Path], workers: int = 1,
+                      pages_per_task: int = PAGES_PER_TASK) -> Tuple[List[PdfPages], Dict[str, Any]]:
+    """Extract every PDF, in a process pool when workers > 1
+
+    Returns each file's pages (None where the file could not be read) in the
+    order of pdf_files, and throughput stats: pages of the files read, seconds and
+    pages per second.
+    """
+    workers = resolve_workers(workers)
+    if pages_per_task < 1:
+        raise ValueError("pages_per_task must be at least 1")
+    start_time = time.perf_counter()
+    results: List[PdfPages] = []
+    num_pages = 0
+
+    if workers == 1 or not pdf_files:
+        for pdf_file in pdf_files:
+            try:
+                pages, file_pages = read_pdf_pages(str(pdf_file))
+            except Exception as e:
+                print(f"Error loading {pdf_file}: {e}")
+                results.append(None)
+                continue
+            num_pages += pages
+            results.append(file_pages)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            # The first range of every file is extracted right away; its page count tells which ranges follow
+            first_ranges = [pool.submit(read_pdf_pages, str(pdf_file), 0, pages_per_task) for pdf_file in pdf_files]
+            # Pages of every readable file, filled from its page range tasks in page order
+            collected: Dict[int, PdfPages] = {}
+            counts: Dict[int, int] = {}
+            tasks = []
+            for position, (pdf_file, first_range) in enumerate(zip(pdf_files, first_ranges)):
+                try:
+                    counts[position], collected[position] = first_range.result()
+                except Exception as e:
+                    print(f"Error loading {pdf_file}: {e}")
+                    continue
+                for start in range(pages_per_task, counts[position], pages_per_task):
+                    tasks.append((position, pool.submit(extract_pdf_pages, str(pdf_file), start, start + pages_per_task)))
+            for position, task in tasks:
+                try:
+                    pages = task.result()
+                except Exception as e:
+                    if collected[position] is not None:
+                        print(f"Error loading {pdf_files[position]}: {e}")
+                    collected[position] = None
+                    continue
+                if collected[position] is not None:
+                    collected[position].extend(pages)
+            results = [collected.get(position) for position in range(len(pdf_files))]
+            num_pages = sum(pages for position, pages in counts.items() if collected[position] is not None)
+
+    seconds = time.perf_counter() - start_time
+    stats = {
+        "files": len(pdf_files),
+        "pages": num_pages,
+        "workers": workers,
+        "seconds": round(seconds, 3),
+        "pages_per_second": round(num_pages / seconds, 1) if seconds > 0 else 0.0
+    }
+    return results, stats
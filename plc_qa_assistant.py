@@ -1,6 +1,6 @@
 import os
 import requests
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
 from dotenv import load_dotenv
 import streamlit as st
 from langchain.text_splitter import RecursiveCharacterTextSplitter
@@ -16,17 +16,61 @@ from pathlib import Path
 import pypdf
 import io
 from urllib.parse import urlparse
-import hashlib
 import pickle
 from datetime import datetime
 import glob
 import re
+import time
+
+from pdf_ingestion import PAGES_PER_TASK, clean_pdf_text, extract_pdf_files, extract_pdf_pages
+from ingest_manifest import IngestManifest, chunk_id, file_hash
+from embedding_cache import DEFAULT_BATCH_SIZE, DEFAULT_CACHE_PATH, CachedEmbeddings, EmbeddingCache
 
 # Load environment variables
 load_dotenv()
 
+def configure_embedding_threads(threads: Optional[int] = None) -> Optional[int]:
+    """Set torch's intra-op thread count, used by the embedding model, for the whole process
+
+    torch.set_num_threads is process-global: it affects every model in the process,
+    not one assistant, so entry points call this once at startup. threads defaults to
+    PLC_EMBEDDING_THREADS; with neither, torch keeps its own default.
+    """
+    if threads is None and os.getenv("PLC_EMBEDDING_THREADS"):
+        threads = int(os.getenv("PLC_EMBEDDING_THREADS"))
+    if threads is None:
+        return None
+    if threads < 1:
+        raise ValueError("embedding threads must be at least 1")
+    import torch
+    torch.set_num_threads(threads)
+    return threads
+
 class SiemensPLCQAAssistant:
-    def __init__(self):
+    def __init__(self, ingest_workers: Optional[int] = None, pages_per_task: int = PAGES_PER_TASK,
+                 persist_directory: str = "./vectorstore", incremental: bool = True,
+                 embedding_cache_path: Optional[str] = DEFAULT_CACHE_PATH,
+                 embedding_batch_size: int = DEFAULT_BATCH_SIZE, sort_by_length: bool = True):
+        # PDF extraction processes: PLC_INGEST_WORKERS, else 1 (serial); 0 means one per CPU core
+        if ingest_workers is None:
+            ingest_workers = int(os.getenv("PLC_INGEST_WORKERS", "1"))
+        if ingest_workers < 0:
+            raise ValueError("ingest_workers must be non-negative (0 for one per CPU core)")
+        if pages_per_task < 1:
+            raise ValueError("pages_per_task must be at least 1")
+        self.ingest_workers = ingest_workers
+        self.pages_per_task = pages_per_task
+        # With incremental ingestion, unchanged PDFs are skipped and only changed chunks are embedded
+        self.persist_directory = persist_directory
+        self.incremental = incremental
+        self.file_hashes: Dict[str, str] = {}  # Hashes of the PDFs loaded since the last process_documents
+        # Chunk embeddings are reused across builds from this SQLite file; "" or None disables the cache
+        self.embedding_cache_path = embedding_cache_path
+        # Chunks per model batch, sorted longest first so each batch pads to similar lengths
+        if embedding_batch_size < 1:
+            raise ValueError("embedding_batch_size must be at least 1")
+        self.embedding_batch_size = embedding_batch_size
+        self.sort_by_length = sort_by_length
         self.embeddings = None
         self.vectorstore = None
         self.qa_chain = None
@@ -37,11 +81,17 @@ class SiemensPLCQAAssistant:
         """Initialize embeddings model"""
         # Use free HuggingFace embeddings
         model_name = "sentence-transformers/all-MiniLM-L6-v2"
+        encode_kwargs = {'normalize_embeddings': True, 'batch_size': self.embedding_batch_size}
         self.embeddings = HuggingFaceEmbeddings(
             model_name=model_name,
             model_kwargs={'device': 'cpu'},
-            encode_kwargs={'normalize_embeddings': True}
+            encode_kwargs=encode_kwargs
         )
+        # Normalization changes the vectors, so it is part of the cache key
+        cache_key = f"{model_name}|normalize={encode_kwargs['normalize_embeddings']}"
+        cache = EmbeddingCache(self.embedding_cache_path) if self.embedding_cache_path else None
+        self.embeddings = CachedEmbeddings(self.embeddings, cache, cache_key,
+                                           batch_size=self.embedding_batch_size, sort_by_length=self.sort_by_length)
         
     def load_siemens_resources(self):
         """Load Siemens PLC resources from various free sources including enhanced PDF processing"""
@@ -80,95 +130,87 @@ class SiemensPLCQAAssistant:
         self.documents = documents
         return documents
     
-    def load_pdfs_from_directory(self, pdf_dir: Path) -> List[Document]:
-        """Enhanced PDF loading with better text extraction and metadata"""
+    def load_pdfs_from_directory(self, pdf_dir: Path, workers: Optional[int] = None) -> List[Document]:
+        """Enhanced PDF loading with better text extraction and metadata
+        
+        With more than one worker, PDFs are split into page ranges that are extracted
+        and cleaned in a process pool; documents keep file and page order either way.
+        """
         documents = []
+        workers = self.ingest_workers if workers is None else workers
         
-        # Support multiple PDF extensions
+        # Support multiple PDF extensions; sorted (and deduplicated on case-insensitive filesystems) for a stable order
         pdf_patterns = ["*.pdf", "*.PDF"]
         pdf_files = []
         
         for pattern in pdf_patterns:
             pdf_files.extend(pdf_dir.glob(pattern))
+        pdf_files = sorted(set(pdf_files))
         
+        # PDFs already in the vector store with the same content are not extracted again
+        manifest = IngestManifest(self.persist_directory) if self.incremental else None
+        changed_files = []
         for pdf_file in pdf_files:
             try:
-                # Use PyPDF for better text extraction
-                docs = self.extract_pdf_content(pdf_file)
+                source_hash = file_hash(str(pdf_file))
+            except OSError as e:
+                print(f"Error loading {pdf_file}: {e}")
+                continue
+            if manifest is not None and manifest.is_unchanged(str(pdf_file), source_hash):
+                continue
+            self.file_hashes[str(pdf_file)] = source_hash
+            changed_files.append(pdf_file)
+        if len(changed_files) < len(pdf_files):
+            print(f"⏭️  Skipped {len(pdf_files) - len(changed_files)} unchanged PDFs in {pdf_dir}")
+        pdf_files = changed_files
+        
+        extracted, stats = extract_pdf_files(pdf_files, workers, self.pages_per_task)
+        
+        for pdf_file, pages in zip(pdf_files, extracted):
+            if pages is not None:
+                docs = self.pdf_page_documents(pdf_file, pages)
                 documents.extend(docs)
                 print(f"Loaded {len(docs)} pages from {pdf_file.name}")
-            except Exception as e:
-                print(f"Error loading {pdf_file}: {e}")
-                # Try fallback method
-                try:
-                    loader = PyPDFLoader(str(pdf_file))
-                    docs = loader.load()
-                    documents.extend(docs)
-                    print(f"Fallback: Loaded {len(docs)} pages from {pdf_file.name}")
-                except Exception as fallback_error:
-                    print(f"Fallback also failed for {pdf_file}: {fallback_error}")
+                continue
+            # Try fallback method
+            try:
+                loader = PyPDFLoader(str(pdf_file))
+                docs = loader.load()
+                documents.extend(docs)
+                print(f"Fallback: Loaded {len(docs)} pages from {pdf_file.name}")
+            except Exception as fallback_error:
+                print(f"Fallback also failed for {pdf_file}: {fallback_error}")
         
+        if pdf_files:
+            print(f"📄 Extracted {stats['pages']} pages from {stats['files']} PDFs in {pdf_dir} "
+                  f"in {stats['seconds']:.2f}s ({stats['pages_per_second']:.1f} pages/s, {stats['workers']} workers)")
         return documents
     
     def extract_pdf_content(self, pdf_path: Path) -> List[Document]:
         """Extract content from PDF with enhanced text processing"""
-        documents = []
-        
-        with open(pdf_path, 'rb') as file:
-            pdf_reader = pypdf.PdfReader(file)
-            
-            for page_num, page in enumerate(pdf_reader.pages):
-                try:
-                    # Extract text from page
-                    text = page.extract_text()
-                    
-                    # Clean and process text
-                    cleaned_text = self.clean_pdf_text(text)
-                    
-                    if cleaned_text.strip():  # Only add non-empty pages
-                        # Create document with rich metadata
-                        doc = Document(
-                            page_content=cleaned_text,
-                            metadata={
-                                "source": str(pdf_path),
-                                "page": page_num + 1,
-                                "filename": pdf_path.name,
-                                "file_type": "pdf",
-                                "extraction_method": "pypdf",
-                                "processed_at": datetime.now().isoformat(),
-                                "char_count": len(cleaned_text)
-                            }
-                        )
-                        documents.append(doc)
-                        
-                except Exception as e:
-                    print(f"Error extracting page {page_num + 1} from {pdf_path}: {e}")
-                    continue
-        
-        return documents
+        return self.pdf_page_documents(pdf_path, extract_pdf_pages(str(pdf_path)))
+    
+    def pdf_page_documents(self, pdf_path: Path, pages: List[Tuple[int, str]]) -> List[Document]:
+        """Create documents with rich metadata from a PDF's extracted (page number, text) pairs"""
+        return [
+            Document(
+                page_content=cleaned_text,
+                metadata={
+                    "source": str(pdf_path),
+                    "page": page_num,
+                    "filename": pdf_path.name,
+                    "file_type": "pdf",
+                    "extraction_method": "pypdf",
+                    "processed_at": datetime.now().isoformat(),
+                    "char_count": len(cleaned_text)
+                }
+            )
+            for page_num, cleaned_text in pages
+        ]
     
     def clean_pdf_text(self, text: str) -> str:
         """Clean and normalize PDF text for better processing"""
-        if not text:
-            return ""
-        
-        # Remove excessive whitespace
-        text = re.sub(r'\s+', ' ', text)
-        
-        # Fix common PDF extraction issues
-        text = re.sub(r'([a-z])([A-Z])', r'\1 \2', text)  # Add space between lowercase and uppercase
-        text = re.sub(r'\s*\n\s*', ' ', text)  # Replace newlines with spaces
-        text = re.sub(r'\s*\f\s*', ' ', text)  # Replace form feeds
-        
-        # Remove page numbers and headers/footers patterns
-        text = re.sub(r'\b\d{1,3}\s*$', '', text)  # Remove trailing page numbers
-        text = re.sub(r'^\s*\d{1,3}\s*', '', text)  # Remove leading page numbers
-        
-        # Remove excessive punctuation
-        text = re.sub(r'[.]{3,}', '...', text)
-        text = re.sub(r'[-]{3,}', '---', text)
-        
-        return text.strip()
+        return clean_pdf_text(text)
     
     def upload_pdf_file(self, uploaded_file) -> List[Document]:
         """Process uploaded PDF file (for Streamlit file uploader)"""
@@ -326,7 +368,12 @@ class SiemensPLCQAAssistant:
         return documents
     
     def process_documents(self, documents: List[Document]):
-        """Process and chunk documents for vector storage"""
+        """Process and chunk documents for vector storage
+        
+        With an ingest manifest in the persist directory, only chunks of new or changed
+        sources are embedded and added, and chunks that are gone (including those of
+        deleted PDFs) are removed. Without one, the vector store is built from scratch.
+        """
         
         # Split documents into chunks
         text_splitter = RecursiveCharacterTextSplitter(
@@ -339,13 +386,70 @@ class SiemensPLCQAAssistant:
         chunks = text_splitter.split_documents(documents)
         print(f"Created {len(chunks)} document chunks")
         
-        # Create vector store using Chroma
-        self.vectorstore = Chroma.from_documents(
-            chunks, 
-            self.embeddings,
-            persist_directory="./vectorstore"
-        )
-        print("Vector store created successfully")
+        # Chunks by source and content-hash id; a chunk repeated on the same page is stored once
+        source_chunks: Dict[str, Dict[str, Document]] = {}
+        for chunk in chunks:
+            source = str(chunk.metadata.get("source", ""))
+            source_chunks.setdefault(source, {}).setdefault(
+                chunk_id(source, chunk.metadata.get("page", ""), chunk.page_content), chunk
+            )
+        
+        embedding_before = self.embeddings.stats() if isinstance(self.embeddings, CachedEmbeddings) else None
+        start_time = time.perf_counter()
+        manifest = IngestManifest(self.persist_directory)
+        if self.incremental and manifest.exists():
+            if self.vectorstore is None:
+                self.load_vectorstore()
+            plan = manifest.plan(source_chunks)
+            for source in plan.removed:
+                manifest.remove(source)
+                print(f"🗑️  Removing chunks of deleted file {source}")
+            all_chunks = {id: chunk for chunks in source_chunks.values() for id, chunk in chunks.items()}
+            new_chunks = [all_chunks[id] for id in plan.added]
+            
+            if plan.stale:
+                self.vectorstore.delete(ids=plan.stale)
+            if new_chunks:
+                self.vectorstore.add_documents(new_chunks, ids=plan.added)
+            stored = len(new_chunks)
+            print(f"Vector store updated: {len(new_chunks)} chunks added, {len(plan.stale)} removed, {plan.unchanged} unchanged")
+        else:
+            if os.path.exists(self.persist_directory):
+                # A store without a manifest cannot be diffed, so it is rebuilt rather than appended to
+                Chroma(persist_directory=self.persist_directory, embedding_function=self.embeddings).delete_collection()
+            manifest.sources = {}
+            
+            # Create vector store using Chroma
+            unique_chunks = [chunk for chunks_by_id in source_chunks.values() for chunk in chunks_by_id.values()]
+            self.vectorstore = Chroma.from_documents(
+                unique_chunks,
+                self.embeddings,
+                ids=[id for chunks_by_id in source_chunks.values() for id in chunks_by_id],
+                persist_directory=self.persist_directory
+            )
+            stored = len(unique_chunks)
+            print("Vector store created successfully")
+        
+        for source, chunks_by_id in source_chunks.items():
+            manifest.record(source, self.file_hashes.get(source), chunks_by_id)
+        manifest.save()
+        self.file_hashes = {}
+        
+        seconds = time.perf_counter() - start_time
+        if stored:
+            print(f"⚡ Stored {stored} chunks in {seconds:.1f}s ({stored / seconds:.1f} chunks/s)")
+        if embedding_before is not None:
+            embedding = self.embeddings.stats()
+            hits = embedding["hits"] - embedding_before["hits"]
+            misses = embedding["misses"] - embedding_before["misses"]
+            embedded = embedding["embedded"] - embedding_before["embedded"]
+            embed_seconds = embedding["embed_seconds"] - embedding_before["embed_seconds"]
+            if embedded and embed_seconds > 0:
+                print(f"⚡ Embedded {embedded} chunks in {embed_seconds:.1f}s ({embedded / embed_seconds:.1f} chunks/s, "
+                      f"batch size {self.embedding_batch_size}, {'sorted by length' if self.sort_by_length else 'unsorted'})")
+            if self.embedding_cache_path and hits + misses:
+                print(f"🧠 Embedding cache: {hits} hits, {misses} misses ({hits / (hits + misses):.0%} hit rate, "
+                      f"{embedding['cached']} embeddings cached)")
         
         return chunks
     
@@ -424,14 +528,16 @@ class SiemensPLCQAAssistant:
             "num_sources": len(sources)
         }
     
-    def save_vectorstore(self, path: str = "./vectorstore"):
+    def save_vectorstore(self, path: Optional[str] = None):
         """Save the vector store to disk"""
+        path = path or self.persist_directory
         if self.vectorstore:
             # Chroma automatically persists to the directory specified during creation
             print(f"Vector store persisted to {path}")
     
-    def load_vectorstore(self, path: str = "./vectorstore"):
+    def load_vectorstore(self, path: Optional[str] = None):
         """Load vector store from disk"""
+        path = path or self.persist_directory
         if os.path.exists(path):
             self.vectorstore = Chroma(
                 persist_directory=path,
@@ -455,6 +561,7 @@ def main():
     
     # Initialize session state
     if 'assistant' not in st.session_state:
+        configure_embedding_threads()
         st.session_state.assistant = SiemensPLCQAAssistant()
         st.session_state.initialized = False
     
@@ -0,0 +1,199 @@
+"""
+Product specifications extracted from the knowledge base's product entries
+
+Entries whose title names exactly one product ("Siemens S7-1500 Overview") are
+scanned once at build time for typed attributes: work and load memory, bit
+operation time and communication interfaces. Spec and comparison questions
+("What is the difference between S7-1500 and S7-1200?", "S7-1200 work memory")
+are then answered by looking the products up in this table, and comparisons read
+a side-by-side table precomputed for every pair of products.
+"""
+
+import re
+from collections.abc import Mapping
+from typing import List, Dict, Any, Optional, Tuple, NamedTuple
+
+from knowledge_synonyms import SYNONYMS
+
+PRODUCT_PATTERN = re.compile(r"\bS7-\d{3,4}\b", re.IGNORECASE)
+
+# A quantity such as "5 MB" or "1 μs" (micro sign or Greek mu), optionally "up to"
+QUANTITY = r"(up to\s+)?(\d+(?:\.\d+)?)\s*(KB|MB|GB|ns|[μµu]s|ms)"
+QUANTITY_PATTERNS = {
+    "work_memory": re.compile(rf"{QUANTITY}\s+work memory", re.IGNORECASE),
+    "load_memory": re.compile(rf"{QUANTITY}\s+load memory", re.IGNORECASE),
+    "bit_operation_time": re.compile(rf"{QUANTITY}\s+bit operations?", re.IGNORECASE)
+}
+# Interfaces are read from lines about interfaces, ports or communication
+INTERFACE_LINE_PATTERN = re.compile(r"\b(?:interfaces?|ports?|communication)\b", re.IGNORECASE)
+INTERFACE_NAMES = {"profinet": "PROFINET", "profibus": "PROFIBUS", "ethernet": "Ethernet", "serial": "Serial"}
+INTERFACE_PATTERN = re.compile(rf"\b({'|'.join(INTERFACE_NAMES)})\b", re.IGNORECASE)
+
+ATTRIBUTE_LABELS = {
+    "work_memory": "Work memory",
+    "load_memory": "Load memory",
+    "bit_operation_time": "Bit operation time",
+    "interfaces": "Interfaces"
+}
+# How questions name each attribute; bare "memory" asks for both memories
+ATTRIBUTE_ALIASES = {
+    "work memory": ("work_memory",),
+    "ram": ("work_memory",),
+    "load memory": ("load_memory",),
+    "memory": ("work_memory", "load_memory"),
+    "bit operation": ("bit_operation_time",),
+    "bit operations": ("bit_operation_time",),
+    "processing speed": ("bit_operation_time",),
+    "which interfaces": ("interfaces",),
+    "what interfaces": ("interfaces",),
+    "which ports": ("interfaces",),
+    "what ports": ("interfaces",),
+    "interface": ("interfaces",),
+    "interfaces": ("interfaces",),
+    "ports": ("interfaces",)
+}
+# Aliases too general to make a one-product question a spec lookup ("retain memory on the S7-1500")
+COMPARISON_ALIASES = frozenset(["memory", "interface", "interfaces", "ports"])
+ATTRIBUTE_PATTERN = re.compile(
+    rf"(?<!\w)({'|'.join(re.escape(alias) for alias in sorted(ATTRIBUTE_ALIASES, key=len, reverse=True))})(?!\w)"
+)
+# Two products only make a comparison when the question asks for one or names an attribute
+COMPARISON_PATTERN = re.compile(r"\b(?:difference|differences|differ|compare|comparison|vs|versus)\b")
+
+class Spec(NamedTuple):
+    """One product attribute: its typed value, unit and displayed text, and the entry it was read from"""
+    value: Any  # float for quantities, tuple of names for interfaces
+    unit: str
+    text: str
+    doc_id: int
+
+class SpecFacts(NamedTuple):
+    """The answer to a spec or comparison question, looked up without ranking"""
+    products: Tuple[str, ...]
+    attributes: Tuple[str, ...]
+    lines: Tuple[str, ...]
+    doc_ids: Tuple[int, ...]
+    # The listed specs it was answered from (product -> attribute -> spec), so rendering never reads a rebuilt table
+    specs: Dict[str, Dict[str, Spec]]
+
+def product_of(title: str) -> Optional[str]:
+    """Return the product an entry title is about, if it names exactly one"""
+    products = {match.upper() for match in PRODUCT_PATTERN.findall(title)}
+    return products.pop() if len(products) == 1 else None
+
+def extract_specs(content: str, doc_id: int) -> Dict[str, Spec]:
+    """Read the typed attributes written in an entry's content"""
+    specs: Dict[str, Spec] = {}
+    interfaces: List[str] = []
+    for line in content.split('\n'):
+        text = line.strip()
+        for attribute, pattern in QUANTITY_PATTERNS.items():
+            match = pattern.search(text)
+            if match and attribute not in specs:
+                up_to, value, unit = match.groups()
+                unit = "μs" if unit.lower() in ("µs", "us") else unit
+                specs[attribute] = Spec(float(value), unit, f"{up_to or ''}{value} {unit}", doc_id)
+        if INTERFACE_LINE_PATTERN.search(text):
+            interfaces.extend(INTERFACE_NAMES[name.lower()] for name in INTERFACE_PATTERN.findall(text))
+    if interfaces:
+        names = tuple(dict.fromkeys(interfaces))
+        specs["interfaces"] = Spec(names, "", ", ".join(names), doc_id)
+    return specs
+
+class ProductSpecs:
+    """Typed attribute table keyed by product, with precomputed side-by-side comparisons"""
+
+    def __init__(self, entries: List[Mapping]):
+        # product -> attribute -> spec; a product's first entry wins each attribute
+        self.products: Dict[str, Dict[str, Spec]] = {}
+        for doc_id, item in enumerate(entries):
+            product = product_of(item["title"])
+            if product is None:
+                continue
+            specs = self.products.setdefault(product, {})
+            if len(specs) == len(ATTRIBUTE_LABELS):
+                continue  # Complete; later entries about the product are not read
+            for attribute, spec in extract_specs(item["content"], doc_id).items():
+                specs.setdefault(attribute, spec)
+        self.products = {product: specs for product, specs in self.products.items() if specs}
+        # Every spelling of a product a question may use, through its synonym group
+        spellings = {}
+        for product in self.products:
+            folded = product.lower()
+            for spelling in [folded] + SYNONYMS.keyword_variants(folded):
+                spellings[spelling] = product
+        self.spellings = spellings
+        self.product_pattern = re.compile(
+            rf"(?<!\w)({'|'.join(re.escape(spelling) for spelling in sorted(spellings, key=len, reverse=True))})s?(?!\w)"
+        ) if spellings else None
+        # (product, product) -> attribute -> side-by-side line
+        self.comparisons: Dict[Tuple[str, str], Dict[str, str]] = {
+            (first, second): {
+                attribute: f"- {label}: {first} {self.spec_text(first, attribute)} | {second} {self.spec_text(second, attribute)}"
+                for attribute, label in ATTRIBUTE_LABELS.items()
+            }
+            for first in self.products for second in self.products if first != second
+        }
+
+    def spec_text(self, product: str, attribute: str) -> str:
+        """Displayed value of a product attribute"""
+        spec = self.products[product].get(attribute)
+        return spec.text if spec else "not listed"
+
+    def mentioned_products(self, folded_query: str) -> List[str]:
+        """Return the products a folded query names, in order of first mention"""
+        if self.product_pattern is None:
+            return []
+        return list(dict.fromkeys(self.spellings[match] for match in self.product_pattern.findall(folded_query)))
+
+    def lookup(self, folded_query: str) -> Optional[SpecFacts]:
+        """Answer a spec or comparison question from the table, or None if it is neither"""
+        products = self.mentioned_products(folded_query)
+        if not products:
+            return None
+        aliases = ATTRIBUTE_PATTERN.findall(folded_query)
+        if len(products) == 1:
+            aliases = [alias for alias in aliases if alias not in COMPARISON_ALIASES]
+        attributes = tuple(dict.fromkeys(attribute for alias in aliases for attribute in ATTRIBUTE_ALIASES[alias]))
+        if len(products) == 1:
+            # One product: only questions about its quantities or interfaces are facts
+            if not attributes:
+                return None
+            product = products[0]
+            lines = [f"{product} specifications:"]
+            lines.extend(f"- {ATTRIBUTE_LABELS[attribute]}: {self.spec_text(product, attribute)}" for attribute in attributes)
+        else:
+            if not attributes and not COMPARISON_PATTERN.search(folded_query):
+                return None
+            attributes = attributes or tuple(ATTRIBUTE_LABELS)
+            lines = [f"{' vs '.join(products)}:"]
+            if len(products) == 2:
+                comparison = self.comparisons[tuple(products)]
+                lines.extend(comparison[attribute] for attribute in attributes)
+            else:
+                lines.extend(
+                    f"- {ATTRIBUTE_LABELS[attribute]}: " + " | ".join(f"{product} {self.spec_text(product, attribute)}" for product in products)
+                    for attribute in attributes
+                )
+        specs = {
+            product: {
+                attribute: spec
+                for attribute in attributes for spec in [self.products[product].get(attribute)] if spec
+            }
+            for product in products
+        }
+        doc_ids = dict.fromkeys(spec.doc_id for product_specs in specs.values() for spec in product_specs.values())
+        if not doc_ids:
+            return None  # Nothing asked for is listed; leave it to the search
+        return SpecFacts(tuple(products), attributes, tuple(lines), tuple(doc_ids), specs)
+
+def spec_table(facts: SpecFacts) -> Dict[str, Dict[str, Any]]:
+    """Typed values of the looked-up attributes: product -> attribute -> value, unit and text"""
+    return {
+        product: {
+            attribute: {"value": list(spec.value) if isinstance(spec.value, tuple) else spec.value,
+                        "unit": spec.unit, "text": spec.text}
+            for attribute, spec in product_specs.items()
+        }
+        for product, product_specs in facts.specs.items()
+    }
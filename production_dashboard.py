@@ -11,7 +11,7 @@ from flask_cors import CORS
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 from datetime import datetime
-from simple_plc_assistant import SimplePLCQAAssistant
+from simple_plc_assistant import SimplePLCQAAssistant, validate_top_k
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -43,7 +43,15 @@ limiter.init_app(app)
 # Global assistant instance
 try:
     from simple_plc_assistant import SimplePLCQAAssistant
-    assistant = SimplePLCQAAssistant()
+    # Typo-tolerant lookup ("profinett", "tia protal"); set FUZZY_SEARCH=false to disable
+    # PLC_KB_DIR points at a directory of JSON entries, polled every KB_RELOAD_INTERVAL seconds
+    assistant = SimplePLCQAAssistant(
+        fuzzy=os.getenv('FUZZY_SEARCH', 'true').lower() == 'true',
+        reload_interval=float(os.getenv('KB_RELOAD_INTERVAL', '5'))
+    )
+    # A preloading gunicorn master only forks; each worker starts its own watcher in post_fork
+    if os.getenv('PLC_KB_WATCH_AFTER_FORK', 'false').lower() != 'true':
+        assistant.start_watching()
     logger.info("✅ Simple PLC Assistant loaded successfully")
 except Exception as e:
     logger.error(f"❌ Failed to load assistant: {e}")
@@ -71,7 +79,9 @@ def api_status():
         "ready": True,
         "status": "ready",
         "message": "Simple PLC Assistant ready!",
-        "version": "1.0.0"
+        "version": "1.0.0",
+        "cache": assistant.cache_stats() if assistant else None,
+        "knowledge_version": assistant.knowledge_version() if assistant else None
     })
 
 @app.route('/api/ask', methods=['POST'])
@@ -107,9 +117,26 @@ def api_ask():
             "error": "Question too long (max 1000 characters)"
         }), 400
     
+    top_k = data.get('top_k')
+    if top_k is not None:
+        try:
+            validate_top_k(top_k)
+        except ValueError as e:
+            return jsonify({
+                "success": False, 
+                "error": f"Invalid top_k: {e}"
+            }), 400
+    
+    debug = data.get('debug', False)
+    if not isinstance(debug, bool):
+        return jsonify({
+            "success": False, 
+            "error": "debug must be true or false"
+        }), 400
+    
     try:
-        # Get answer from assistant
-        result = assistant.ask_question(question)
+        # Get answer from assistant (debug adds score breakdowns and stage timings)
+        result = assistant.ask_question(question, k=top_k, explain=debug)
         
         # Store in session history
         if 'chat_history' not in session:
@@ -129,14 +156,21 @@ def api_ask():
         if len(session['chat_history']) > 20:
             session['chat_history'] = session['chat_history'][-20:]
         
-        return jsonify({
+        response = {
             "success": True,
             "question": question,
             "answer": result["answer"],
             "sources": result["sources"],
             "num_sources": result["num_sources"],
             "timestamp": chat_entry["timestamp"]
-        })
+        }
+        if "specs" in result:
+            response["specs"] = result["specs"]  # Typed values behind a spec or comparison answer
+        if "cross_reference" in result:
+            response["cross_reference"] = result["cross_reference"]  # Address and tag uses behind an address answer
+        if debug:
+            response["explain"] = result["explain"]
+        return jsonify(response)
         
     except Exception as e:
         logger.error(f"Error processing question: {e}")
@@ -0,0 +1,113 @@
+"""
+Text analysis shared by the simple assistant's index and its queries
+
+Text is Unicode-folded (NFKC, case-folded, accents stripped) and split by a
+PLC-aware tokenizer: identifiers such as "s7-1500", "16#8087", "i0.0" or
+"et-200sp" are kept whole, and their parts are emitted as well so "S7 1500" still
+finds them. Alphabetic terms get light plural stemming. Every term carries its
+word position (a compound shares the position of its first part), so phrases can be
+matched against positional postings. Queries additionally drop stopwords and single
+characters, keep "quoted phrases" apart, and the analysis of recent queries is memoized.
+"""
+
+import re
+import unicodedata
+from functools import lru_cache
+from typing import List, Dict, Any, FrozenSet, NamedTuple, Tuple
+
+WORD_PATTERN = re.compile(r"\w+")
+# Words joined by "-", "#" or "." without spaces: S7-1500, 16#8087, W#16#8087, I0.0, DB1.DBX0.1
+TOKEN_PATTERN = re.compile(r"\w+(?:[-#.]\w+)*")
+PHRASE_PATTERN = re.compile(r'"([^"]+)"')
+QUOTE_TRANSLATION = str.maketrans({"\u201c": '"', "\u201d": '"', "\u201e": '"'})
+
+# Question words and function words that carry no topic
+STOPWORDS = frozenset("""
+a about an and any are as at be been but by can could do does did for from had has have how i if in into is it
+its me my of on or our should so than that the their them then there these they this those to was we were what
+when where which who why will with would you your
+""".split())
+
+# Analyses of recent queries (questions repeat far more often than entries change)
+ANALYSIS_CACHE_SIZE = 4096
+
+class AnalyzedQuery(NamedTuple):
+    """A query analyzed once and shared by retrieval, ranking and answer extraction"""
+    text: str
+    terms: Tuple[str, ...]
+    term_set: FrozenSet[str]
+    # Word position of each term, and the quoted phrases as (term, offset in phrase) pairs
+    positions: Tuple[int, ...]
+    phrases: Tuple[Tuple[Tuple[str, int], ...], ...]
+
+def fold(text: str) -> str:
+    """Normalize compatibility characters, case-fold and strip accents"""
+    if text.isascii():
+        return text.lower()  # Nothing to normalize or strip, and ASCII case-folding is lowercasing
+    text = unicodedata.normalize("NFKD", unicodedata.normalize("NFKC", text).casefold())
+    if not any(map(unicodedata.combining, text)):
+        return text
+    return "".join(char for char in text if not unicodedata.combining(char))
+
+@lru_cache(maxsize=65536)
+def stem(term: str) -> str:
+    """Light plural stemming (the S-stemmer): modules -> module, entries -> entry, status stays"""
+    if len(term) <= 3 or not term.isalpha():
+        return term
+    if term.endswith("ies") and not term.endswith(("eies", "aies")):
+        return term[:-3] + "y"
+    if term.endswith("es") and not term.endswith(("aes", "ees", "oes")):
+        return term[:-1]
+    if term.endswith("s") and not term.endswith(("us", "ss")):
+        return term[:-1]
+    return term
+
+def positioned_terms(folded: str, stopwords: FrozenSet[str] = frozenset()) -> List[Tuple[str, int]]:
+    """Split already-folded text into (stemmed term, word position) pairs, each compound followed by its parts
+
+    Dropped stopwords still advance the position, so phrase offsets stay exact.
+    """
+    terms = []
+    position = 0
+    for token in TOKEN_PATTERN.findall(folded):
+        if WORD_PATTERN.fullmatch(token):
+            if token not in stopwords:
+                terms.append((stem(token), position))
+            position += 1
+            continue
+        terms.append((token, position))
+        for part in WORD_PATTERN.findall(token):
+            if part not in stopwords:
+                terms.append((stem(part), position))
+            position += 1
+    return terms
+
+def analyze_text(text: str) -> List[str]:
+    """Analyze indexed text into terms (stopwords are kept; queries simply never ask for them)"""
+    return [term for term, _ in positioned_terms(fold(text))]
+
+@lru_cache(maxsize=ANALYSIS_CACHE_SIZE)
+def analyze_query(query: str) -> AnalyzedQuery:
+    """Fold, tokenize, drop stopwords and stem a query, and pick out its quoted phrases"""
+    text = fold(query).translate(QUOTE_TRANSLATION)
+    analyzed = [(term, position) for term, position in positioned_terms(text, STOPWORDS) if len(term) > 1]
+    terms = tuple(term for term, _ in analyzed)
+    phrases = []
+    for quoted in PHRASE_PATTERN.findall(text):
+        phrase = [(term, position) for term, position in positioned_terms(quoted, STOPWORDS) if len(term) > 1]
+        if phrase:
+            start = phrase[0][1]
+            phrases.append(tuple((term, position - start) for term, position in phrase))
+    return AnalyzedQuery(text, terms, frozenset(terms), tuple(position for _, position in analyzed), tuple(phrases))
+
+def analysis_stats() -> Dict[str, Any]:
+    """Return hit/miss counters of the query analysis memo"""
+    info = analyze_query.cache_info()
+    lookups = info.hits + info.misses
+    return {
+        "hits": info.hits,
+        "misses": info.misses,
+        "size": info.currsize,
+        "max_size": info.maxsize,
+        "hit_rate": round(info.hits / lookups, 3) if lookups else 0.0
+    }
@@ -56,7 +56,8 @@ def initialize_assistant():
         
         # Import here to avoid import errors if dependencies not available
         try:
-            from plc_qa_assistant import SiemensPLCQAAssistant
+            from plc_qa_assistant import SiemensPLCQAAssistant, configure_embedding_threads
+            configure_embedding_threads()
             assistant = SiemensPLCQAAssistant()
         except ImportError:
             # Fallback to simple assistant if RAG dependencies not available
@@ -182,9 +183,18 @@ def api_ask():
             "error": "Question too long (max 1000 characters)"
         }), 400
     
+    debug = data.get('debug', False)
+    if not isinstance(debug, bool):
+        return jsonify({
+            "success": False, 
+            "error": "debug must be true or false"
+        }), 400
+    
     try:
-        # Get answer from assistant (works with both RAG and simple)
-        result = assistant.ask_question(question)
+        # Get answer from assistant (works with both RAG and simple; only the simple one can explain its ranking)
+        rag_enabled = "plc_qa_assistant" in str(type(assistant))
+        explain = debug and not rag_enabled
+        result = assistant.ask_question(question, explain=True) if explain else assistant.ask_question(question)
         
         # Store in session history
         if 'chat_history' not in session:
@@ -196,7 +206,7 @@ def api_ask():
             "answer": result["answer"],
             "sources": result["sources"],
             "num_sources": result["num_sources"],
-            "rag_enabled": "plc_qa_assistant" in str(type(assistant))
+            "rag_enabled": rag_enabled
         }
         
         session['chat_history'].append(chat_entry)
@@ -205,7 +215,7 @@ def api_ask():
         if len(session['chat_history']) > 20:
             session['chat_history'] = session['chat_history'][-20:]
         
-        return jsonify({
+        response = {
             "success": True,
             "question": question,
             "answer": result["answer"],
@@ -213,7 +223,14 @@ def api_ask():
             "num_sources": result["num_sources"],
             "timestamp": chat_entry["timestamp"],
             "rag_enabled": chat_entry["rag_enabled"]
-        })
+        }
+        if "specs" in result:
+            response["specs"] = result["specs"]  # Typed values behind a spec or comparison answer
+        if "cross_reference" in result:
+            response["cross_reference"] = result["cross_reference"]  # Address and tag uses behind an address answer
+        if explain:
+            response["explain"] = result["explain"]
+        return jsonify(response)
         
     except Exception as e:
         logger.error(f"Error processing question: {e}")
@@ -9,7 +9,7 @@ import os
 import json
 import time
 from datetime import datetime
-from simple_plc_assistant import SimplePLCQAAssistant
+from simple_plc_assistant import SimplePLCQAAssistant, validate_top_k
 import logging
 import socket
 
@@ -68,9 +68,26 @@ def api_ask():
             "error": "Please provide a question"
         }), 400
     
+    debug = data.get('debug', False)
+    if not isinstance(debug, bool):
+        return jsonify({
+            "success": False, 
+            "error": "debug must be true or false"
+        }), 400
+    
+    top_k = data.get('top_k')
+    if top_k is not None:
+        try:
+            validate_top_k(top_k)
+        except ValueError as e:
+            return jsonify({
+                "success": False, 
+                "error": f"Invalid top_k: {e}"
+            }), 400
+    
     try:
-        # Get answer from assistant
-        result = assistant.ask_question(question)
+        # Get answer from assistant (top_k selects how many sources to cite, debug explains the ranking)
+        result = assistant.ask_question(question, k=top_k, explain=debug)
         
         # Store in session history
         if 'chat_history' not in session:
@@ -90,14 +107,21 @@ def api_ask():
         if len(session['chat_history']) > 20:
             session['chat_history'] = session['chat_history'][-20:]
         
-        return jsonify({
+        response = {
             "success": True,
             "question": question,
             "answer": result["answer"],
             "sources": result["sources"],
             "num_sources": result["num_sources"],
             "timestamp": chat_entry["timestamp"]
-        })
+        }
+        if "specs" in result:
+            response["specs"] = result["specs"]  # Typed values behind a spec or comparison answer
+        if "cross_reference" in result:
+            response["cross_reference"] = result["cross_reference"]  # Address and tag uses behind an address answer
+        if debug:
+            response["explain"] = result["explain"]
+        return jsonify(response)
         
     except Exception as e:
         logger.error(f"Error processing question: {e}")
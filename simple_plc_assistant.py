@@ -5,21 +5,199 @@ Simplified Siemens PLC QA Assistant without complex transformer dependencies
 
 import os
 import json
-from typing import List, Dict, Any
+import heapq
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from typing import List, Dict, Any, FrozenSet, Iterable, Optional, Tuple, Union
 from pathlib import Path
 import re
+from knowledge_index import KnowledgeIndex, PROXIMITY_POOL
+from query_analyzer import AnalyzedQuery, analyze_query, analysis_stats
+from answer_cache import AnswerCache, normalize_question
+from knowledge_artifact import load_artifact
+from knowledge_sources import KnowledgeSourceWatcher, DEFAULT_POLL_INTERVAL
+from knowledge_shards import KnowledgeShards, Candidate
+from product_specs import SpecFacts, spec_table
+from ladder_cross_reference import AddressFacts, reference_json
+
+RANKING_MODES = ("legacy", "bm25")
+MAX_TOP_K = 20
+
+def validate_top_k(k: int) -> int:
+    """Check that a requested number of results is within the supported range"""
+    if isinstance(k, bool) or not isinstance(k, int) or not 1 <= k <= MAX_TOP_K:
+        raise ValueError(f"k must be an integer between 1 and {MAX_TOP_K}")
+    return k
+
+def validate_ranking(ranking: str) -> str:
+    """Check that a ranking mode is supported"""
+    if ranking not in RANKING_MODES:
+        raise ValueError(f"Unknown ranking mode '{ranking}'. Choose from: {', '.join(RANKING_MODES)}")
+    return ranking
+
+def pinned_index(method):
+    """Run an assistant method on one index version (see SimplePLCQAAssistant.consistent_index)"""
+    @wraps(method)
+    def pinned(self, *args, **kwargs):
+        with self.consistent_index():
+            return method(self, *args, **kwargs)
+    return pinned
 
 class SimplePLCQAAssistant:
-    def __init__(self):
+    def __init__(self, ranking: str = "legacy", top_k: int = 3, cache_size: int = 256, cache_ttl: float = 300.0,
+                 artifact_path: Optional[str] = None, fuzzy: bool = False, knowledge_dir: Optional[str] = None,
+                 reload_interval: float = DEFAULT_POLL_INTERVAL, shards: int = 0, entries: Optional[List[Any]] = None):
+        # The index version each thread's current question reads (see consistent_index)
+        self.pinned = threading.local()
+        self.ranking = validate_ranking(ranking)
+        self.top_k = validate_top_k(top_k)
+        # Fuzzy mode corrects unknown query terms ("profinett", "tia protal") before searching
+        self.fuzzy = fuzzy
+        self.answer_cache = AnswerCache(max_size=cache_size, ttl=cache_ttl)
+        # A compiled artifact (see knowledge_artifact.py) replaces the built-in literal when available
+        self.artifact_path = os.getenv("PLC_KB_ARTIFACT") if artifact_path is None else artifact_path
         self.knowledge_base = []
-        self.initialize_knowledge()
+        self.index = None
+        if entries is not None:
+            # Given entries replace the built-in knowledge base, which is then never indexed
+            self.index = KnowledgeIndex(entries)
+            self.knowledge_base = self.index.entries
+        else:
+            self.initialize_knowledge()
+        # Entries from a directory of JSON files (see knowledge_sources.py) are applied on top and can be hot-reloaded
+        self.knowledge_dir = os.getenv("PLC_KB_DIR") if knowledge_dir is None else knowledge_dir
+        self.source_watcher = None
+        if self.knowledge_dir:
+            self.load_knowledge_sources(self.knowledge_dir, reload_interval)
+        # With shards, searches fan out to worker processes that each index part of the knowledge base
+        self.shards = None
+        if shards:
+            self.start_shards(shards)
+    
+    @property
+    def index(self) -> Optional[KnowledgeIndex]:
+        """The index searched: the version pinned for this thread's question, else the latest one"""
+        pinned = getattr(self.pinned, "index", None)
+        return pinned if pinned is not None else self.live_index
+    
+    @index.setter
+    def index(self, index: Optional[KnowledgeIndex]):
+        self.live_index = index
+    
+    @property
+    def knowledge_base(self) -> List[Any]:
+        """The entries searched: the index's, or entries only the shards have indexed so far"""
+        index = self.index
+        return index.entries if index is not None else self.unindexed_entries
+    
+    @knowledge_base.setter
+    def knowledge_base(self, entries: List[Any]):
+        self.unindexed_entries = entries
+    
+    @contextmanager
+    def consistent_index(self):
+        """Pin the current index version for this thread, so one question never mixes two versions
+
+        Knowledge directory reloads publish new versions while questions are answered
+        (see KnowledgeIndex.update_entries). Nested calls keep the outermost pin.
+        """
+        if getattr(self.pinned, "index", None) is not None or self.live_index is None:
+            yield
+            return
+        self.pinned.index = self.live_index.snapshot()
+        try:
+            yield
+        finally:
+            self.pinned.index = None
+    
+    @classmethod
+    def from_entries(cls, entries: List[Any], **kwargs) -> "SimplePLCQAAssistant":
+        """Build an assistant over the given entries instead of the built-in knowledge base"""
+        return cls(artifact_path="", knowledge_dir="", entries=entries, **kwargs)
+    
+    def start_shards(self, num_shards: int, entries: Optional[List[Any]] = None):
+        """Partition the knowledge base, or the given entries, across worker processes that search in parallel
+
+        The shards serve the entries as of this call; knowledge directory reloads
+        reach them when the shards are started again. Given entries replace the
+        knowledge base (and its directory entries). This process indexes them too,
+        while the shards build, since fact lookups and explain run on its own index.
+        """
+        if self.shards is not None:
+            self.shards.close()
+            self.shards = None
+        if entries is not None and self.source_watcher is not None:
+            self.source_watcher.stop()
+            self.source_watcher = None
+        start_time = time.perf_counter()
+        try:
+            self.shards = KnowledgeShards(type(self), self.knowledge_base if entries is None else entries, num_shards)
+            if entries is not None:
+                self.index = KnowledgeIndex(entries)
+                self.knowledge_base = self.index.entries
+            self.shards.wait_until_built()
+        except Exception:
+            self.stop_shards()
+            raise
+        print(f"🧩 Indexed {len(self.knowledge_base)} entries in {num_shards} shards "
+              f"in {time.perf_counter() - start_time:.1f} s")
+    
+    def stop_shards(self):
+        """Stop the shard processes and search in this process again"""
+        if self.shards is not None:
+            self.shards.close()
+            self.shards = None
+    
+    def knowledge_version(self) -> str:
+        """Return the version of the knowledge being searched, for answer cache keys"""
+        if self.shards is not None:
+            # Fact answers come from this process's index, which knowledge directory reloads keep updating
+            return f"{self.shards.version}+{self.index.version}"
+        return self.index.version
+    
+    def load_knowledge_artifact(self, path: str) -> bool:
+        """Load the knowledge base and index from a compiled, memory-mapped artifact"""
+        if not os.path.exists(path):
+            print(f"Knowledge artifact {path} not found, using built-in knowledge base")
+            return False
+        try:
+            self.knowledge_base, self.index = load_artifact(path)
+            return True
+        except Exception as e:
+            print(f"Error loading knowledge artifact {path}: {e}")
+            return False
+    
+    def load_knowledge_sources(self, directory: str, reload_interval: float) -> bool:
+        """Apply the entry files of a knowledge directory to the index"""
+        if not os.path.isdir(directory):
+            print(f"Knowledge directory {directory} not found, using built-in knowledge base only")
+            return False
+        self.source_watcher = KnowledgeSourceWatcher(directory, self.index, reload_interval)
+        self.source_watcher.poll()
+        return True
+    
+    def reload_knowledge(self) -> Dict[str, Any]:
+        """Re-index the knowledge files changed since the last poll"""
+        if self.source_watcher is None:
+            return {"changed": 0, "deleted": 0, "errors": 0, "seconds": 0.0}
+        return self.source_watcher.poll()
+    
+    def start_watching(self):
+        """Poll the knowledge directory in the background (once per process)"""
+        if self.source_watcher is not None:
+            self.source_watcher.start()
     
     def initialize_knowledge(self):
         """Initialize the PLC knowledge base"""
+        if self.artifact_path and self.load_knowledge_artifact(self.artifact_path):
+            return
+        
         self.knowledge_base = [
             {
                 "title": "Siemens S7-1500 Overview",
-                "keywords": ["s7-1500", "s7 1500", "simatic s7-1500", "cpu 1500", "plc 1500"],
+                "keywords": ["s7-1500"],
                 "content": """
                 The Siemens S7-1500 is a high-performance PLC system for demanding automation tasks.
                 
@@ -38,7 +216,7 @@ class SimplePLCQAAssistant:
             },
             {
                 "title": "Siemens S7-1200 Overview", 
-                "keywords": ["s7-1200", "s7 1200", "simatic s7-1200", "cpu 1200", "plc 1200"],
+                "keywords": ["s7-1200"],
                 "content": """
                 The Siemens S7-1200 is a compact PLC for small to medium automation applications.
                 
@@ -664,7 +842,7 @@ class SimplePLCQAAssistant:
             },
             {
                 "title": "Ladder Logic Programming Examples",
-                "keywords": ["ladder logic", "lad", "programming examples", "ladder diagram", "contacts", "coils", "rungs"],
+                "keywords": ["ladder logic", "programming examples", "contacts", "coils", "rungs"],
                 "content": """
                 Comprehensive ladder logic programming examples for learning and troubleshooting.
                 
@@ -1077,42 +1255,116 @@ class SimplePLCQAAssistant:
                 """
             }
         ]
+        
+        # Build the inverted index once so queries only touch matching entries
+        self.index = KnowledgeIndex(self.knowledge_base)
+        self.knowledge_base = self.index.entries
+    
+    @pinned_index
+    def search_knowledge(self, query: str, ranking: Optional[str] = None, k: Optional[int] = None,
+                         fuzzy: Optional[bool] = None) -> List[Dict[str, Any]]:
+        """Search the knowledge base for the k most relevant entries"""
+        if self.shards is not None:
+            ranking = validate_ranking(ranking or self.ranking)
+            k = self.top_k if k is None else validate_top_k(k)
+            fuzzy = self.fuzzy if fuzzy is None else fuzzy
+            return [result for result, _, _ in self.shards.search([query], k, ranking, fuzzy, render=False)[0]]
+        if self.fuzzy if fuzzy is None else fuzzy:
+            query = self.index.correct_query(query)
+        return self.search_analyzed(analyze_query(query), ranking, k)
+    
+    def search_analyzed(self, analysis: AnalyzedQuery, ranking: Optional[str] = None,
+                        k: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Search the knowledge base with an already analyzed query"""
+        return self.format_results(*self.rank_analyzed(analysis, ranking, k))
+    
+    def rank_analyzed(self, analysis: AnalyzedQuery, ranking: Optional[str] = None,
+                      k: Optional[int] = None) -> Tuple[List[Any], Dict[int, List[str]]]:
+        """Rank entries for an analyzed query: the top (entry id, score) pairs and the error codes they describe"""
+        ranking = validate_ranking(ranking or self.ranking)
+        k = self.top_k if k is None else validate_top_k(k)
+        return self.rank_candidates(analysis, self.retrieve_candidates(analysis, ranking, k), ranking, k)
+    
+    def retrieve_candidates(self, analysis: AnalyzedQuery, ranking: str, k: int) -> Iterable[Tuple[int, Any]]:
+        """Find the scored (entry id, score) candidates for a query"""
+        if analysis.phrases:
+            # Quoted phrases are required; only entries containing them are ranked
+            keyword_hits = self.index.keyword_matches(analysis.text) if ranking == "legacy" else set()
+            return self.index.phrase_top_k(analysis.phrases, list(analysis.terms), k, ranking, keyword_hits)
+        if ranking == "bm25":
+            # MaxScore pruning skips entries that cannot make the top k; a wider pool is re-ranked by proximity
+            return self.index.bm25_top_k(analysis.terms, k * PROXIMITY_POOL)
+        return self.legacy_scores(analysis).items()
+    
+    def rank_candidates(self, analysis: AnalyzedQuery, candidates: Iterable[Tuple[int, Any]], ranking: str,
+                        k: int) -> Tuple[List[Any], Dict[int, List[str]]]:
+        """Order retrieved candidates into the final top k, error-code entries first"""
+        if analysis.phrases:
+            top = list(candidates)
+        elif ranking == "bm25":
+            top = self.index.proximity_rerank(candidates, list(analysis.terms), list(analysis.positions), k)
+        else:
+            # Partial heap selection instead of sorting every scored entry
+            top = heapq.nlargest(k, candidates, key=lambda x: (x[1], -x[0]))
+        
+        return self.resolve_error_codes(analysis, top, k, ranking)
+    
+    def resolve_error_codes(self, analysis: AnalyzedQuery, top: List[Any], k: int,
+                            ranking: str) -> Tuple[List[Any], Dict[int, List[str]]]:
+        """Put entries describing an error/event code in the query ahead of the general ranking"""
+        code_matches = self.index.code_matches(analysis.text)
+        if not code_matches:
+            return top, {}
+        
+        scores = dict(top)
+        keyword_hits = self.index.keyword_matches(analysis.text) if ranking == "legacy" else set()
+        missing = [
+            (doc_id, self.index.entry_score(doc_id, list(analysis.terms), ranking, keyword_hits))
+            for doc_id in code_matches if doc_id not in scores
+        ]
+        if ranking == "bm25" and not analysis.phrases:
+            # Score them the way the ranked entries were, whether or not they made the pool
+            missing = self.index.proximity_rerank(missing, list(analysis.terms), list(analysis.positions), len(missing))
+        scores.update(missing)
+        resolved = [(doc_id, scores[doc_id]) for doc_id in code_matches]
+        rest = [(doc_id, score) for doc_id, score in top if doc_id not in code_matches]
+        return (resolved + rest)[:k], code_matches
     
-    def search_knowledge(self, query: str) -> List[Dict[str, Any]]:
-        """Search the knowledge base for relevant information"""
-        query_lower = query.lower()
+    def format_results(self, top: List[Any], code_matches: Optional[Dict[int, List[str]]] = None) -> List[Dict[str, Any]]:
+        """Turn ranked (entry id, score) pairs into search result dicts
+
+        Results reference their entry by id (knowledge_base[result["id"]]) instead of copying its content.
+        """
+        code_matches = code_matches or {}
         results = []
+        for doc_id, score in top:
+            if score > 0 or doc_id in code_matches:
+                result = {
+                    "id": doc_id,
+                    "title": self.knowledge_base[doc_id]["title"],
+                    "score": round(score, 3) if isinstance(score, float) else score
+                }
+                if doc_id in code_matches:
+                    result["error_codes"] = code_matches[doc_id]
+                results.append(result)
         
-        for item in self.knowledge_base:
-            score = 0
-            
-            # Check title match
-            if any(keyword in query_lower for keyword in item["keywords"]):
-                score += 10
-            
-            # Check content match
-            content_lower = item["content"].lower()
-            query_words = query_lower.split()
-            
-            for word in query_words:
-                if len(word) > 2:  # Skip very short words
-                    if word in content_lower:
-                        score += content_lower.count(word)
-            
-            if score > 0:
-                results.append({
-                    "title": item["title"],
-                    "content": item["content"],
-                    "score": score,
-                    "keywords": item["keywords"]
-                })
+        return results
+    
+    def legacy_scores(self, analysis: AnalyzedQuery) -> Dict[int, int]:
+        """Original scoring: +10 for a keyword hit plus content term counts"""
+        # Check title match: one automaton pass finds every entry with a keyword in the query
+        keyword_hits = self.index.keyword_matches(analysis.text)
         
-        # Sort by relevance score
-        results.sort(key=lambda x: x["score"], reverse=True)
-        return results[:3]  # Return top 3 results
+        # Check content match through the postings lists
+        return self.index.legacy_scores(list(analysis.terms), keyword_hits)
     
-    def ask_question(self, question: str) -> Dict[str, Any]:
-        """Answer a question based on the knowledge base"""
+    @pinned_index
+    def ask_question(self, question: str, k: Optional[int] = None, explain: bool = False) -> Dict[str, Any]:
+        """Answer a question based on the knowledge base, citing up to k sources
+
+        With explain, the answer also carries an "explain" section with each cited
+        entry's score breakdown and the time spent in every stage.
+        """
         if not question.strip():
             return {
                 "question": question,
@@ -1121,9 +1373,240 @@ class SimplePLCQAAssistant:
                 "num_sources": 0
             }
         
-        # Search for relevant information
-        results = self.search_knowledge(question)
+        # Serve repeated questions from the cache; the KB version in the key drops stale answers after edits
+        k = self.top_k if k is None else validate_top_k(k)
+        if explain:
+            return self.explain_question(question, k)
+        cache_key = (normalize_question(question), self.ranking, self.fuzzy, k, self.knowledge_version())
+        cached = self.answer_cache.get(cache_key)
+        if cached is not None:
+            return dict(cached, question=question)
+        
+        result = self.answer_from_knowledge(question, k)
+        self.answer_cache.put(cache_key, result)
+        return result
+    
+    def explain_question(self, question: str, k: int) -> Dict[str, Any]:
+        """Answer a question stage by stage, timing each stage and breaking down the cited entries' scores
+
+        Explained answers bypass the answer cache, so every stage really runs. With
+        shards, the question is explained on this process's index, whose collection
+        statistics are the ones the shards rescore with, so the scores are the same.
+        """
+        timings = {}
+        start_time = stage_start = time.perf_counter()
+        
+        def lap(stage: str):
+            nonlocal stage_start
+            now = time.perf_counter()
+            timings[stage] = round((now - stage_start) * 1000, 3)
+            stage_start = now
+        
+        searched = self.search_query(question)
+        analysis = analyze_query(searched)
+        lap("analyze")
+        facts = self.lookup_facts(analysis, k)
+        if facts is not None:
+            # Answered from the product table or cross-reference: the cited entries are scored directly, nothing is ranked
+            lap("lookup")
+            candidates = results = self.fact_results(facts, analysis, k)
+            top, code_matches = [(item["id"], item["score"]) for item in results], {}
+            lap("format")
+            result = self.build_fact_answer(question, facts, results, analysis)
+        else:
+            # Legacy candidates are a lazy view of the score map; materialize them so retrieval is timed as such
+            candidates = list(self.retrieve_candidates(analysis, self.ranking, k))
+            lap("retrieve")
+            top, code_matches = self.rank_candidates(analysis, candidates, self.ranking, k)
+            lap("rank")
+            results = self.format_results(top, code_matches)
+            lap("format")
+            result = self.build_answer(question, results, analysis)
+        lap("extract")
+        timings["total"] = round((time.perf_counter() - start_time) * 1000, 3)
         
+        scores = dict(top)
+        keyword_hits = self.index.keyword_matches(analysis.text) if self.ranking == "legacy" else set()
+        explained = []
+        for item in results:
+            doc_id = item["id"]
+            breakdown = self.index.explain_score(doc_id, list(analysis.terms), self.ranking, keyword_hits)
+            entry = {"id": doc_id, "title": item["title"], "score": item["score"], **breakdown}
+            if self.ranking == "bm25" and not analysis.phrases and facts is None:
+                # Whatever the term contributions do not account for came from proximity re-ranking
+                base = self.index.entry_score(doc_id, list(analysis.terms), self.ranking, keyword_hits)
+                entry["proximity"] = round(scores[doc_id] - base, 4)
+            if doc_id in code_matches:
+                entry["error_codes"] = code_matches[doc_id]
+            explained.append(entry)
+        
+        result["explain"] = {
+            "ranking": self.ranking,
+            "query": {
+                "searched": searched,
+                "terms": list(analysis.terms),
+                "phrases": [[term for term, _ in phrase] for phrase in analysis.phrases]
+            },
+            "retrieved": len(candidates),
+            "candidates": explained,
+            "timings_ms": timings
+        }
+        if isinstance(facts, SpecFacts):
+            result["explain"]["product_specs"] = {"products": list(facts.products), "attributes": list(facts.attributes)}
+        elif facts is not None:
+            result["explain"]["cross_reference"] = {"symbols": list(facts.symbols), "uses": len(facts.references)}
+        return result
+    
+    def cache_stats(self) -> Dict[str, Any]:
+        """Return answer cache counters, plus the query analysis memo's under 'analysis'"""
+        return dict(self.answer_cache.stats(), analysis=analysis_stats())
+    
+    @pinned_index
+    def ask_questions(self, questions: List[str], k: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Answer a batch of questions, scoring all uncached ones together in one pass"""
+        k = self.top_k if k is None else validate_top_k(k)
+        answers: List[Optional[Dict[str, Any]]] = [None] * len(questions)
+        pending = []
+        
+        for i, question in enumerate(questions):
+            if not question.strip():
+                answers[i] = self.ask_question(question, k=k)
+                continue
+            cache_key = (normalize_question(question), self.ranking, self.fuzzy, k, self.knowledge_version())
+            cached = self.answer_cache.get(cache_key)
+            if cached is not None:
+                answers[i] = dict(cached, question=question)
+            else:
+                pending.append((i, question, cache_key))
+        
+        if pending:
+            analyses = [analyze_query(self.search_query(question)) for _, question, _ in pending]
+            # Spec, comparison and address questions are looked up directly, with or without shards
+            facts = [self.lookup_facts(analysis, k) for analysis in analyses]
+            searched = [j for j in range(len(pending)) if facts[j] is None]
+            tops: Dict[int, List[Any]] = {}
+            shard_answers: Dict[int, Dict[str, Any]] = {}
+            if self.shards is not None:
+                if searched:
+                    shard_answers = dict(zip(searched, self.answers_from_shards([pending[j][1] for j in searched], k)))
+            else:
+                # Phrase questions are answered one by one; the rest are scored together
+                batched = [j for j in searched if not analyses[j].phrases]
+                keyword_hits = None
+                if self.ranking == "legacy":
+                    keyword_hits = [self.index.keyword_matches(analyses[j].text) for j in batched]
+                pool = k if self.ranking == "legacy" else k * PROXIMITY_POOL
+                tops = dict(zip(batched, self.index.batch_top_k(
+                    [list(analyses[j].terms) for j in batched], pool, self.ranking, keyword_hits
+                )))
+            
+            for j, ((i, question, cache_key), analysis) in enumerate(zip(pending, analyses)):
+                if facts[j] is not None:
+                    result = self.build_fact_answer(question, facts[j], self.fact_results(facts[j], analysis, k), analysis)
+                elif self.shards is not None:
+                    result = shard_answers[j]
+                else:
+                    if j not in tops:
+                        results = self.search_analyzed(analysis, k=k)
+                    else:
+                        top = tops[j]
+                        if self.ranking == "bm25":
+                            top = self.index.proximity_rerank(top, list(analysis.terms), list(analysis.positions), k)
+                        top, code_matches = self.resolve_error_codes(analysis, top, k, self.ranking)
+                        results = self.format_results(top, code_matches)
+                    result = self.build_answer(question, results, analysis)
+                self.answer_cache.put(cache_key, result)
+                answers[i] = result
+        
+        return answers
+    
+    def search_query(self, question: str) -> str:
+        """Return the text actually searched for a question, with typos corrected in fuzzy mode"""
+        return self.index.correct_query(question) if self.fuzzy else question
+    
+    def answer_from_knowledge(self, question: str, k: int) -> Dict[str, Any]:
+        """Search the knowledge base and build an answer with up to k sources"""
+        # Analyze once; search and answer extraction share the result
+        analysis = analyze_query(self.search_query(question))
+        facts = self.lookup_facts(analysis, k)
+        if facts is not None:
+            return self.build_fact_answer(question, facts, self.fact_results(facts, analysis, k), analysis)
+        if self.shards is not None:
+            return self.answers_from_shards([question], k)[0]
+        return self.build_answer(question, self.search_analyzed(analysis, k=k), analysis)
+    
+    def lookup_facts(self, analysis: AnalyzedQuery, k: int) -> Optional[Union[SpecFacts, AddressFacts]]:
+        """Look spec and comparison questions up in the product table, and address questions in the cross-reference"""
+        facts = self.index.product_specs.lookup(analysis.text)
+        if facts is None:
+            facts = self.index.address_facts(analysis.text, analysis.term_set, k)
+        return facts
+    
+    def fact_results(self, facts: Union[SpecFacts, AddressFacts], analysis: AnalyzedQuery, k: int) -> List[Dict[str, Any]]:
+        """Score the entries a looked-up answer was read from, to cite them as sources"""
+        keyword_hits = self.index.keyword_matches(analysis.text) if self.ranking == "legacy" else set()
+        terms = list(analysis.terms)
+        return self.format_results(
+            [(doc_id, self.index.entry_score(doc_id, terms, self.ranking, keyword_hits)) for doc_id in facts.doc_ids[:k]]
+        )
+    
+    def build_fact_answer(self, question: str, facts: Union[SpecFacts, AddressFacts], results: List[Dict[str, Any]],
+                          analysis: AnalyzedQuery) -> Dict[str, Any]:
+        """Answer from looked-up facts, citing the entries they were read from
+
+        Spec answers carry the typed values under "specs", address answers every use under "cross_reference".
+        """
+        sources = [self.render_result(result, analysis.term_set, main=False)[1] for result in results]
+        answer = {
+            "question": question,
+            "answer": '\n'.join(facts.lines),
+            "sources": sources,
+            "num_sources": len(sources)
+        }
+        if isinstance(facts, SpecFacts):
+            answer["specs"] = spec_table(facts)
+        else:
+            answer["cross_reference"] = [
+                reference_json(reference, self.knowledge_base[reference.doc_id]["title"]) for reference in facts.references
+            ]
+        return answer
+    
+    def answers_from_shards(self, questions: List[str], k: int) -> List[Dict[str, Any]]:
+        """Answer questions from the merged, already rendered results of every shard"""
+        answers = []
+        for question, merged in zip(questions, self.shards.search(questions, k, self.ranking, self.fuzzy, render=True)):
+            if merged:
+                answers.append(self.compose_answer(question, [(answer, source) for _, answer, source in merged]))
+            else:
+                answers.append(self.build_answer(question, []))
+        return answers
+    
+    def shard_candidates(self, questions: List[str], k: int, ranking: str, fuzzy: bool,
+                         render: bool) -> List[List[Candidate]]:
+        """Rank questions on this assistant's entries as one shard: merge keys, results and, if asked, rendered answers
+
+        Merge keys order error-code entries first, as resolve_error_codes does, then by score.
+        """
+        candidates = []
+        for question in questions:
+            analysis = analyze_query(self.index.correct_query(question) if fuzzy else question)
+            top, code_matches = self.rank_analyzed(analysis, ranking, k)
+            scores = dict(top)
+            ranked = []
+            for result in self.format_results(top, code_matches):
+                doc_id = result["id"]
+                if doc_id in code_matches:
+                    key = (0,) + self.index.code_match_key(doc_id, code_matches[doc_id])
+                else:
+                    key = (1, -scores[doc_id])
+                answer, source = self.render_result(result, analysis.term_set, main=True) if render else (None, None)
+                ranked.append((key, result, answer, source))
+            candidates.append(ranked)
+        return candidates
+    
+    def build_answer(self, question: str, results: List[Dict[str, Any]],
+                     analysis: Optional[AnalyzedQuery] = None) -> Dict[str, Any]:
+        """Build the answer and source list from ranked search results"""
         if not results:
             return {
                 "question": question,
@@ -1133,44 +1616,48 @@ class SimplePLCQAAssistant:
             }
         
         # Combine information from top results
-        answer_parts = []
-        sources = []
+        query_terms = (analysis or analyze_query(question)).term_set
+        rendered = [self.render_result(result, query_terms, main=i == 0) for i, result in enumerate(results)]
+        return self.compose_answer(question, rendered)
+    
+    def render_result(self, result: Dict[str, Any], query_terms: FrozenSet[str],
+                      main: bool) -> Tuple[Optional[str], Dict[str, Any]]:
+        """Render a search result as a cited source, plus the answer text when it is the main result"""
+        # Large entries are answered and cited from their best matching section
+        section = self.index.best_section(result["id"], query_terms)
+        content = self.index.section_text(section) if section else self.knowledge_base[result["id"]]["content"]
         
-        for i, result in enumerate(results):
-            if i == 0:  # Main answer from best match
-                # Extract most relevant section
-                content_lines = result["content"].strip().split('\n')
-                relevant_lines = []
-                
-                query_words = question.lower().split()
-                for line in content_lines:
-                    line_lower = line.lower()
-                    if any(word in line_lower for word in query_words if len(word) > 2):
-                        relevant_lines.append(line.strip())
-                
-                if relevant_lines:
-                    answer_parts.append('\n'.join(relevant_lines[:5]))  # Top 5 relevant lines
-                else:
-                    # Fallback to first few lines
-                    answer_parts.append('\n'.join(content_lines[:5]))
-            
-            # Add to sources
-            sources.append({
-                "content": result["content"][:300] + "..." if len(result["content"]) > 300 else result["content"],
-                "metadata": {
-                    "title": result["title"],
-                    "source": "knowledge_base",
-                    "score": result["score"]
-                }
-            })
+        answer = None
+        if main:  # Main answer from best match
+            if "error_codes" in result:
+                # Code questions are answered with the code's own description
+                answer = '\n'.join(self.index.code_lines(result["id"], result["error_codes"]))
+            else:
+                # Extract most relevant section from the precomputed line records
+                answer = '\n'.join(self.index.relevant_lines(result["id"], query_terms, section=section))
         
-        answer = '\n\n'.join(answer_parts) if answer_parts else results[0]["content"]
+        metadata = {
+            "title": result["title"],
+            "source": "knowledge_base",
+            "score": result["score"]
+        }
+        if section:
+            metadata["section"] = section.title
         
+        source = {
+            "content": content[:300] + "..." if len(content) > 300 else content,
+            "metadata": metadata
+        }
+        return answer, source
+    
+    @staticmethod
+    def compose_answer(question: str, rendered: List[Tuple[Optional[str], Dict[str, Any]]]) -> Dict[str, Any]:
+        """Assemble an answer from rendered results, the first of which carries the answer text"""
         return {
             "question": question,
-            "answer": answer,
-            "sources": sources,
-            "num_sources": len(sources)
+            "answer": rendered[0][0],
+            "sources": [source for _, source in rendered],
+            "num_sources": len(rendered)
         }
 
 def main():
@@ -0,0 +1,407 @@
+#!/usr/bin/env python3
+"""
+Test script for the RAG assistant's ingestion helpers, without PDFs or models
+"""
+
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import Future
+from pathlib import Path
+import pdf_ingestion
+from pdf_ingestion import extract_pdf_files
+from ingest_manifest import IngestManifest, chunk_id, file_hash
+from embedding_cache import EmbeddingCache, CachedEmbeddings
+
+# Stand-in PDFs are text files with one page per line; "BAD" files cannot be
+# opened and "FAIL" pages break the range that contains them
+
+def fake_pdf_lines(pdf_path: str):
+    """Read the pages of a stand-in PDF"""
+    with open(pdf_path, "r", encoding="utf-8") as file:
+        lines = file.read().splitlines()
+    if lines and lines[0] == "BAD":
+        raise ValueError(f"{pdf_path} is not a PDF")
+    return lines
+
+def fake_read_pdf_pages(pdf_path: str, start: int = 0, end=None):
+    """read_pdf_pages for stand-in PDFs"""
+    return len(fake_pdf_lines(pdf_path)), fake_extract_pdf_pages(pdf_path, start, end)
+
+def fake_extract_pdf_pages(pdf_path: str, start: int = 0, end=None):
+    """extract_pdf_pages for stand-in PDFs; the first range is slowest, so later ranges finish first"""
+    lines = fake_pdf_lines(pdf_path)
+    end = len(lines) if end is None else min(end, len(lines))
+    if start == 0:
+        time.sleep(0.05)
+    pages = []
+    for page_num in range(start, end):
+        if lines[page_num] == "FAIL":
+            raise ValueError(f"page {page_num + 1} of {pdf_path} is damaged")
+        if lines[page_num]:
+            pages.append((page_num + 1, lines[page_num]))
+    return pages
+
+class RecordingExecutor:
+    """ProcessPoolExecutor stand-in that runs tasks inline and records their arguments"""
+
+    submitted = []
+
+    def __init__(self, max_workers=None):
+        self.max_workers = max_workers
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def submit(self, fn, *args):
+        RecordingExecutor.submitted.append((fn.__name__, args))
+        future = Future()
+        try:
+            future.set_result(fn(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+class FakeEmbeddings:
+    """Embedding model stand-in whose vectors encode the text, recording every batch it is given"""
+
+    def __init__(self, scale: float = 1.0):
+        self.scale = scale
+        self.batches = []
+
+    def vector(self, text: str):
+        """Small integers, so vectors round-trip through float32 exactly"""
+        return [float(len(text)) * self.scale, float(sum(map(ord, text)) % 1000), float(text.count(" "))]
+
+    def embed_documents(self, texts):
+        self.batches.append(list(texts))
+        return [self.vector(text) for text in texts]
+
+    def embed_query(self, text):
+        return self.vector(text)
+
+def write_fake_pdfs(directory: str, files: dict):
+    """Write stand-in PDFs named by files' keys, returning their paths in order"""
+    paths = []
+    for name, pages in files.items():
+        path = Path(directory) / name
+        path.write_text("\n".join(pages), encoding="utf-8")
+        paths.append(path)
+    return paths
+
+def with_fake_extractor(test):
+    """Run test with pdf_ingestion's page readers replaced by the stand-ins"""
+    def run():
+        read, extract = pdf_ingestion.read_pdf_pages, pdf_ingestion.extract_pdf_pages
+        pdf_ingestion.read_pdf_pages, pdf_ingestion.extract_pdf_pages = fake_read_pdf_pages, fake_extract_pdf_pages
+        try:
+            return test()
+        finally:
+            pdf_ingestion.read_pdf_pages, pdf_ingestion.extract_pdf_pages = read, extract
+    run.__name__ = test.__name__
+    run.__doc__ = test.__doc__
+    return run
+
+@with_fake_extractor
+def test_page_range_tasks():
+    """Test that each PDF is split into pages_per_task page ranges and reassembled in page order"""
+
+    print("\n📑 Testing Page Range Tasks")
+    print("=" * 30)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        pdf_files = write_fake_pdfs(temp_dir, {
+            "manual.pdf": [f"manual page {i}" for i in range(1, 6)],
+            "empty.pdf": [],
+            "short.pdf": ["short page 1", "", "short page 3"]
+        })
+        executor = pdf_ingestion.ProcessPoolExecutor
+        pdf_ingestion.ProcessPoolExecutor = RecordingExecutor
+        RecordingExecutor.submitted = []
+        try:
+            results, stats = extract_pdf_files(pdf_files, workers=2, pages_per_task=2)
+        finally:
+            pdf_ingestion.ProcessPoolExecutor = executor
+
+        manual, empty, short = (str(path) for path in pdf_files)
+        first = [args for name, args in RecordingExecutor.submitted if name == "fake_read_pdf_pages"]
+        ranges = [args for name, args in RecordingExecutor.submitted if name == "fake_extract_pdf_pages"]
+        # Every file is opened once for its first range, which also counts its pages; no file is parsed just to count
+        assert first == [(manual, 0, 2), (empty, 0, 2), (short, 0, 2)], first
+        # Five pages make three ranges, the last one short; an empty file gets no further task and blank pages are dropped
+        assert ranges == [(manual, 2, 4), (manual, 4, 6), (short, 2, 4)], ranges
+        print(f"✅ Tasks: {[(Path(path).name, start, end) for path, start, end in first + ranges]}")
+
+        assert results == [
+            [(i, f"manual page {i}") for i in range(1, 6)],
+            [],
+            [(1, "short page 1"), (3, "short page 3")]
+        ], results
+        assert stats["files"] == 3 and stats["pages"] == 8 and stats["workers"] == 2, stats
+        print(f"✅ {stats['pages']} pages reassembled in page order")
+
+    return True
+
+@with_fake_extractor
+def test_parallel_extraction_order():
+    """Test that a process pool extracts the same pages in the same order as one worker"""
+
+    print("\n⚙️  Testing Parallel Extraction Order")
+    print("=" * 30)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        pdf_files = write_fake_pdfs(temp_dir, {
+            "b_manual.pdf": [f"b page {i}" for i in range(1, 8)],
+            "a_corrupt.pdf": ["BAD"],
+            "c_damaged.pdf": ["c page 1", "c page 2", "c page 3", "FAIL", "c page 5"],
+            "d_manual.pdf": [f"d page {i}" for i in range(1, 4)]
+        })
+
+        serial, serial_stats = extract_pdf_files(pdf_files, workers=1, pages_per_task=2)
+        parallel, parallel_stats = extract_pdf_files(pdf_files, workers=3, pages_per_task=2)
+
+        # Files stay in the given order, unreadable ones as None
+        assert serial[0] == [(i, f"b page {i}") for i in range(1, 8)], serial[0]
+        assert serial[1] is None and serial[2] is None, serial
+        assert serial[3] == [(i, f"d page {i}") for i in range(1, 4)], serial[3]
+        assert parallel == serial, parallel
+        print(f"✅ 3 workers match 1 worker: {[None if pages is None else len(pages) for pages in parallel]} pages")
+
+        assert parallel_stats["workers"] == 3 and parallel_stats["files"] == 4, parallel_stats
+        # Page counts leave out files that could not be read, also when only a later page range fails
+        assert serial_stats["pages"] == parallel_stats["pages"] == 10, (serial_stats, parallel_stats)
+        print(f"✅ {parallel_stats['pages']} pages counted")
+
+        no_files, stats = extract_pdf_files([], workers=3)
+        assert no_files == [] and stats["pages"] == 0, (no_files, stats)
+        try:
+            extract_pdf_files(pdf_files, workers=2, pages_per_task=0)
+        except ValueError:
+            print("✅ pages_per_task below 1 rejected")
+        else:
+            raise AssertionError("pages_per_task=0 was accepted")
+
+    return True
+
+def test_ingest_manifest():
+    """Test diffing new, changed, unchanged and deleted PDFs against the ingest manifest"""
+
+    print("\n🗂️  Testing Ingest Manifest")
+    print("=" * 30)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        persist_directory = os.path.join(temp_dir, "chroma_db")
+        kept, edited, deleted = (os.path.join(temp_dir, name) for name in ("kept.pdf", "edited.pdf", "deleted.pdf"))
+        for path in (kept, edited, deleted):
+            with open(path, "w", encoding="utf-8") as file:
+                file.write(f"contents of {os.path.basename(path)}")
+
+        # Chunk ids depend on the source, page and text
+        assert chunk_id(kept, 1, "text") == chunk_id(kept, 1, "text")
+        assert len({chunk_id(kept, 1, "text"), chunk_id(kept, 2, "text"), chunk_id(edited, 1, "text"),
+                    chunk_id(kept, 1, "other text")}) == 4
+
+        # New PDFs: nothing is stored, so every chunk is added
+        manifest = IngestManifest(persist_directory)
+        assert not manifest.exists() and not manifest.is_unchanged(kept, file_hash(kept))
+        source_ids = {
+            kept: [chunk_id(kept, 1, "k1"), chunk_id(kept, 2, "k2")],
+            edited: [chunk_id(edited, 1, "e1"), chunk_id(edited, 2, "e2")],
+            deleted: [chunk_id(deleted, 1, "d1")],
+            "knowledge_base": [chunk_id("knowledge_base", "", "kb")]
+        }
+        plan = manifest.plan(source_ids)
+        assert plan.added == [id for ids in source_ids.values() for id in ids], plan
+        assert plan.stale == [] and plan.removed == [] and plan.unchanged == 0, plan
+        for source, ids in source_ids.items():
+            manifest.record(source, None if source == "knowledge_base" else file_hash(source), ids)
+        manifest.save()
+        assert manifest.exists() and not manifest.path.with_suffix(".tmp").exists()
+        print(f"✅ New: {len(plan.added)} chunks added")
+
+        # Reloaded, unchanged files are recognised by their content hash
+        manifest = IngestManifest(persist_directory)
+        assert manifest.sources == {
+            source: {"file_hash": None if source == "knowledge_base" else file_hash(source), "chunk_ids": ids}
+            for source, ids in source_ids.items()
+        }, manifest.sources
+        assert manifest.is_unchanged(kept, file_hash(kept)) and manifest.is_unchanged(edited, file_hash(edited))
+        assert manifest.removed_files() == []
+        print("✅ Unchanged: file hashes and chunk ids survive a reload")
+
+        # A changed file keeps its unchanged chunks, adds new ones and drops the rest;
+        # a deleted file's chunks are dropped; sources not being ingested are left alone
+        with open(edited, "a", encoding="utf-8") as file:
+            file.write(" with an extra page")
+        os.remove(deleted)
+        assert not manifest.is_unchanged(edited, file_hash(edited))
+        assert manifest.removed_files() == [deleted]
+        edited_ids = [chunk_id(edited, 1, "e1"), chunk_id(edited, 2, "e2 revised"), chunk_id(edited, 3, "e3")]
+        plan = manifest.plan({edited: edited_ids})
+        assert plan.added == edited_ids[1:], plan
+        assert plan.stale == [chunk_id(deleted, 1, "d1"), chunk_id(edited, 2, "e2")], plan
+        assert plan.removed == [deleted] and plan.unchanged == 1, plan
+        print(f"✅ Changed and deleted: {len(plan.added)} added, {len(plan.stale)} removed, {plan.unchanged} unchanged")
+
+        # A file ingested again under its old path is not treated as deleted
+        assert manifest.plan({deleted: source_ids[deleted]}) == ([], [], [], 1)
+
+        manifest.remove(deleted)
+        manifest.record(edited, file_hash(edited), edited_ids)
+        manifest.save()
+        manifest = IngestManifest(persist_directory)
+        assert sorted(manifest.sources) == sorted([kept, edited, "knowledge_base"]), manifest.sources
+        assert manifest.chunk_ids(edited) == edited_ids and manifest.chunk_ids(deleted) == []
+        assert manifest.is_unchanged(edited, file_hash(edited))
+        print("✅ Chunk bookkeeping saved")
+
+        # An unreadable or older manifest is ignored rather than trusted
+        with open(manifest.path, "w", encoding="utf-8") as file:
+            file.write("{not json")
+        assert IngestManifest(persist_directory).sources == {}
+        with open(manifest.path, "w", encoding="utf-8") as file:
+            file.write('{"version": 0, "sources": {"old.pdf": {}}}')
+        assert IngestManifest(persist_directory).sources == {}
+        print("✅ Unreadable manifests ignored")
+
+    return True
+
+def test_embedding_cache():
+    """Test cache hits and misses, input order with mixed hits, and keying by model"""
+
+    print("\n💾 Testing Embedding Cache")
+    print("=" * 30)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        cache_path = os.path.join(temp_dir, "embedding_cache.sqlite")
+        cache = EmbeddingCache(cache_path)
+        model = FakeEmbeddings()
+        embeddings = CachedEmbeddings(model, cache, "fake-model")
+
+        first = ["PROFINET setup", "OB1 cycle", "PROFINET setup", "TIA Portal project"]
+        vectors = embeddings.embed_documents(first)
+        assert vectors == [model.vector(text) for text in first], vectors
+        # A text repeated in one call is embedded once
+        assert sorted(text for batch in model.batches for text in batch) == sorted(set(first)), model.batches
+        stats = embeddings.stats()
+        assert (stats["hits"], stats["misses"], stats["cached"]) == (0, 4, 3), stats
+        print(f"✅ Cold cache: {stats['misses']} misses, {stats['cached']} texts embedded")
+
+        # Hits and misses interleaved come back in input order; only the misses reach the model
+        model.batches = []
+        mixed = ["S7-1500 memory", "OB1 cycle", "Safety program", "PROFINET setup", "S7-1500 memory"]
+        vectors = embeddings.embed_documents(mixed)
+        assert vectors == [model.vector(text) for text in mixed], vectors
+        assert sorted(text for batch in model.batches for text in batch) == ["S7-1500 memory", "Safety program"], model.batches
+        stats = embeddings.stats()
+        assert (stats["hits"], stats["misses"], stats["cached"]) == (2, 7, 5), stats
+        assert stats["hit_rate"] == round(2 / 9, 3), stats
+        print(f"✅ Mixed: order kept, {stats['hits']} hits, hit rate {stats['hit_rate']}")
+
+        # The cache persists, so a new process embeds nothing it has seen
+        cache.close()
+        cache = EmbeddingCache(cache_path)
+        model.batches = []
+        reopened = CachedEmbeddings(model, cache, "fake-model")
+        assert reopened.embed_documents(mixed + first) == [model.vector(text) for text in mixed + first]
+        assert model.batches == [] and reopened.stats()["hit_rate"] == 1.0, (model.batches, reopened.stats())
+        print("✅ Reopened cache: every text is a hit")
+
+        # Another model name never sees these vectors, even for the same text
+        other_model = FakeEmbeddings(scale=2.0)
+        other = CachedEmbeddings(other_model, cache, "other-model")
+        assert other.embed_documents(["OB1 cycle"]) == [other_model.vector("OB1 cycle")]
+        assert other.stats()["misses"] == 1 and other_model.batches == [["OB1 cycle"]], other.stats()
+        assert reopened.embed_documents(["OB1 cycle"]) == [model.vector("OB1 cycle")]
+        assert cache.size("fake-model") == 5 and cache.size("other-model") == 1 and cache.size() == 6
+        print("✅ Vectors are keyed by model name")
+
+        # Queries go straight to the model
+        assert reopened.embed_query("OB1 cycle") == model.vector("OB1 cycle") and model.batches == []
+        assert reopened.embed_documents([]) == []
+        cache.close()
+
+    return True
+
+def test_embedding_batches():
+    """Test that sorting by length keeps output order and that batches respect batch_size"""
+
+    print("\n📦 Testing Embedding Batches")
+    print("=" * 30)
+
+    texts = [" ".join(["word"] * (1 + (i * 7) % 11)) + f" {i}" for i in range(23)]
+    outputs = {}
+    for sort_by_length in (True, False):
+        model = FakeEmbeddings()
+        # No cache, so every text goes to the model
+        embeddings = CachedEmbeddings(model, None, "fake-model", batch_size=5, sort_by_length=sort_by_length)
+        outputs[sort_by_length] = embeddings.embed_documents(texts)
+        sizes = [len(batch) for batch in model.batches]
+        assert sizes == [5, 5, 5, 5, 3], sizes
+        fed = [text for batch in model.batches for text in batch]
+        if sort_by_length:
+            assert [len(text) for text in fed] == sorted((len(text) for text in texts), reverse=True), fed
+        else:
+            assert fed == texts, fed
+        assert embeddings.stats()["embedded"] == len(texts) and embeddings.stats()["cached"] == 0
+        print(f"✅ {'Sorted' if sort_by_length else 'Unsorted'}: batches of {sizes}")
+
+    # The vectors come back in input order either way
+    assert outputs[True] == outputs[False] == [FakeEmbeddings().vector(text) for text in texts]
+    print("✅ Output order unchanged by sorting")
+
+    model = FakeEmbeddings()
+    CachedEmbeddings(model, None, "fake-model", batch_size=1).embed_documents(texts[:3])
+    assert [len(batch) for batch in model.batches] == [1, 1, 1], model.batches
+    try:
+        CachedEmbeddings(model, None, "fake-model", batch_size=0)
+    except ValueError:
+        print("✅ batch_size below 1 rejected")
+    else:
+        raise AssertionError("batch_size=0 was accepted")
+
+    return True
+
+def main():
+    """Run all tests"""
+
+    print("🚀 RAG Ingestion Test Suite")
+    print("=" * 60)
+
+    tests = [
+        ("Page Range Tasks", test_page_range_tasks),
+        ("Parallel Extraction Order", test_parallel_extraction_order),
+        ("Ingest Manifest", test_ingest_manifest),
+        ("Embedding Cache", test_embedding_cache),
+        ("Embedding Batches", test_embedding_batches)
+    ]
+
+    passed = 0
+    total = len(tests)
+
+    for test_name, test_func in tests:
+        print(f"\n🧪 Running {test_name} test...")
+        try:
+            if test_func():
+                passed += 1
+                print(f"✅ {test_name} test PASSED")
+            else:
+                print(f"❌ {test_name} test FAILED")
+        except Exception as e:
+            print(f"❌ {test_name} test FAILED with exception: {e}")
+
+    print(f"\n📊 Test Results: {passed}/{total} tests passed")
+
+    if passed == total:
+        print("🎉 All tests passed!")
+        return 0
+    else:
+        print("⚠️  Some tests failed. Check the output above for details.")
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,860 @@
+#!/usr/bin/env python3
+"""
+Test script for the Simple Siemens PLC QA Assistant
+"""
+
+import json
+import os
+import sys
+import tempfile
+import knowledge_index
+from simple_plc_assistant import SimplePLCQAAssistant
+from knowledge_index import KnowledgeIndex, KeywordAutomaton, TrigramIndex, edit_distance, extract_query_codes
+from query_analyzer import analyze_text, analyze_query, fold, positioned_terms, stem
+from knowledge_synonyms import SYNONYMS, SynonymExpander
+from product_specs import extract_specs, spec_table
+from ladder_cross_reference import entry_references
+from answer_cache import AnswerCache, normalize_question
+from knowledge_artifact import build_artifact, load_artifact, LazyEntry
+
+def test_inverted_index():
+    """Test that postings match a full scan of the knowledge base"""
+
+    print("\n🧪 Testing Inverted Index")
+    print("=" * 30)
+
+    assistant = SimplePLCQAAssistant()
+    index = assistant.index
+
+    for term in ["profinet", "ladder", "retain", "16"]:
+        expected = {}
+        for doc_id, item in enumerate(assistant.knowledge_base):
+            analyzed = positioned_terms(fold(item["content"]))
+            count = [term for term, _ in analyzed + SYNONYMS.expand(analyzed)].count(term)
+            if count:
+                expected[doc_id] = count
+        assert index.postings.get(term, {}) == expected, f"Postings mismatch for '{term}'"
+        print(f"   ✅ '{term}' found in {len(expected)} entries")
+
+    assert index.term_frequencies(["nonexistentterm"]) == {}
+    return True
+
+def test_search_knowledge():
+    """Test that searches return the expected entries"""
+
+    print("\n🧪 Testing Knowledge Search")
+    print("=" * 30)
+
+    assistant = SimplePLCQAAssistant()
+    cases = {
+        "What is retain memory?": "Data Blocks and Memory",
+        "How do I troubleshoot communication errors?": "Communication Troubleshooting",
+        "What is the difference between PROFINET RT and IRT?": "PROFINET Communication",
+    }
+
+    for question, title in cases.items():
+        results = assistant.search_knowledge(question)
+        titles = [result["title"] for result in results]
+        assert title in titles, f"'{title}' not returned for '{question}': {titles}"
+        print(f"   ✅ {question} -> {titles[0]}")
+
+    result = assistant.ask_question("")
+    assert result["num_sources"] == 0
+    return True
+
+def test_bm25_ranking():
+    """Test the BM25F ranking mode against its precomputed statistics"""
+
+    print("\n🧪 Testing BM25 Ranking")
+    print("=" * 30)
+
+    assistant = SimplePLCQAAssistant(ranking="bm25")
+    index = assistant.index
+
+    assert index.idf["profinet"] < index.idf["isochronous"], "Rare terms should weigh more"
+    results = assistant.search_knowledge("What is retain memory?")
+    assert results[0]["title"] == "Data Blocks and Memory"
+    assert results == sorted(results, key=lambda x: x["score"], reverse=True)
+
+    legacy = assistant.search_knowledge("What is retain memory?", ranking="legacy")
+    assert isinstance(legacy[0]["score"], int)
+    print(f"   ✅ bm25: {results[0]['score']} / legacy: {legacy[0]['score']}")
+
+    try:
+        SimplePLCQAAssistant(ranking="unknown")
+        raise AssertionError("Unknown ranking mode accepted")
+    except ValueError:
+        pass
+    return True
+
+def test_keyword_automaton():
+    """Test that one automaton pass finds the same entries as per-entry keyword checks"""
+
+    print("\n🧪 Testing Keyword Automaton")
+    print("=" * 30)
+
+    automaton = KeywordAutomaton()
+    for doc_id, keyword in enumerate(["he", "she", "his", "hers"]):
+        automaton.add(keyword, doc_id)
+    automaton.finalize()
+    assert automaton.match("ushers") == {0, 1, 3}
+
+    assistant = SimplePLCQAAssistant()
+    for question in ["s7 1200 vs cpu 1500", "profinet error 16#8087", "tia portal and wincc hmi"]:
+        expected = {
+            doc_id for doc_id, item in enumerate(assistant.knowledge_base)
+            if any(variant in question for keyword in item["keywords"]
+                   for variant in [keyword.lower()] + SYNONYMS.keyword_variants(keyword))
+        }
+        assert assistant.index.keyword_matches(question) == expected, f"Mismatch for '{question}'"
+        print(f"   ✅ '{question}' matched {len(expected)} entries")
+    return True
+
+def test_answer_extraction():
+    """Test that answers are built from the lines whose query terms weigh most"""
+
+    print("\n🧪 Testing Answer Extraction")
+    print("=" * 30)
+
+    index = KnowledgeIndex([{
+        "title": "Example",
+        "keywords": ["example"],
+        "content": """
+        Intro line
+        retain memory keeps data
+        memory areas
+        retain memory on power loss keeps data
+        """
+    }])
+    assert [record.text for record in index.lines[0]][0] == "Intro line"
+    lines = index.relevant_lines(0, {"retain", "memory", "power"}, limit=2)
+    assert lines == ["retain memory keeps data", "retain memory on power loss keeps data"], lines
+    assert index.relevant_lines(0, {"unrelated"}, limit=1) == ["Intro line"]
+
+    # A rare term outweighs common terms repeated on a generic line
+    index = KnowledgeIndex([
+        {"title": "Timers", "keywords": ["timer"], "content": "Ladder logic rungs read like ladder logic\nA timer delays an output"},
+        {"title": "Contacts", "keywords": ["contact"], "content": "Ladder logic contacts"},
+        {"title": "Coils", "keywords": ["coil"], "content": "Ladder logic coils"}
+    ])
+    lines = index.relevant_lines(0, {"ladder", "logic", "timer"}, limit=1)
+    assert lines == ["A timer delays an output"], lines
+
+    assistant = SimplePLCQAAssistant()
+    result = assistant.ask_question("What is retain memory?")
+    assert "Retain memory: Data preserved during power loss" in result["answer"]
+    print("   ✅ Relevant lines extracted")
+    return True
+
+def test_top_k_selection():
+    """Test that MaxScore top-k selection agrees with exhaustive scoring"""
+
+    print("\n🧪 Testing Top-k Selection")
+    print("=" * 30)
+
+    assistant = SimplePLCQAAssistant(ranking="bm25")
+    index = assistant.index
+    terms = ["profinet", "safety", "ladder", "memory", "error", "isochronous"]
+
+    for k in [1, 3, 10, 20]:
+        scores = index.bm25_scores(terms)
+        expected = sorted(scores.items(), key=lambda x: (x[1], -x[0]), reverse=True)[:k]
+        top = index.bm25_top_k(terms, k)
+        assert [doc_id for doc_id, _ in top] == [doc_id for doc_id, _ in expected], f"Mismatch for k={k}"
+        print(f"   ✅ k={k}: {len(top)} results")
+
+    assert len(assistant.search_knowledge("safety relay", k=1)) == 1
+    assert len(assistant.search_knowledge("safety relay", ranking="legacy", k=7)) == 7
+    for k in [0, 21, "3"]:
+        try:
+            assistant.search_knowledge("safety", k=k)
+            raise AssertionError(f"Invalid k={k!r} accepted")
+        except ValueError:
+            pass
+    return True
+
+def test_answer_cache():
+    """Test LRU/TTL bounds, key normalization and KB version invalidation"""
+
+    print("\n🧪 Testing Answer Cache")
+    print("=" * 30)
+
+    assert normalize_question("  What is  RETAIN memory?? ") == "what is retain memory"
+    assert normalize_question("PROFINET error 16#8087?") == "profinet error 16#8087"
+    assert normalize_question("(S7-1500) vs I0.0.") == "s7-1500 vs i0.0"
+    assert normalize_question('"Cycle time"?') == '"cycle time"'
+
+    cache = AnswerCache(max_size=2, ttl=60)
+    cache.put("a", {"answer": 1})
+    cache.put("b", {"answer": 2})
+    cache.get("a")
+    cache.put("c", {"answer": 3})
+    assert cache.get("b") is None and cache.get("a") is not None
+    assert cache.stats()["evictions"] == 1
+
+    expired = AnswerCache(max_size=2, ttl=-1)
+    expired.put("a", {"answer": 1})
+    assert expired.get("a") is None
+
+    assistant = SimplePLCQAAssistant()
+    first = assistant.ask_question("What is retain memory?")
+    second = assistant.ask_question("what is   retain memory")
+    assert second["answer"] == first["answer"] and second["question"] == "what is   retain memory"
+    assert assistant.cache_stats()["hits"] == 1
+
+    # Editing the KB changes the version, so the cached answer is not reused
+    item = assistant.knowledge_base[5]
+    assistant.index.update_entries({5: dict(item, content=item["content"] + "\nRetain memory edited")})
+    assistant.ask_question("What is retain memory?")
+    stats = assistant.cache_stats()
+    assert stats["hits"] == 1 and stats["misses"] == 2, stats
+    print(f"   ✅ Cache stats: {stats}")
+    return True
+
+def test_knowledge_artifact():
+    """Test that a compiled artifact answers exactly like the built-in knowledge base"""
+
+    print("\n🧪 Testing Knowledge Artifact")
+    print("=" * 30)
+
+    source = SimplePLCQAAssistant(artifact_path="")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "kb.plckb")
+        build_artifact(source.knowledge_base, source.index, path)
+
+        compiled = SimplePLCQAAssistant(artifact_path=path)
+        assert isinstance(compiled.knowledge_base[0], LazyEntry)
+        assert compiled.index.version == source.index.version
+        assert compiled.knowledge_base[3]["content"] == source.knowledge_base[3]["content"]
+
+        for question in ["What is retain memory?", "PROFINET error 16#8087", "How do I use ladder logic?"]:
+            assert compiled.ask_question(question) == source.ask_question(question), f"Mismatch for '{question}'"
+        print(f"   ✅ {len(compiled.knowledge_base)} entries loaded from artifact")
+
+        with open(path, "r+b") as file:
+            file.write(b"broken")
+        try:
+            load_artifact(path)
+            raise AssertionError("Corrupt artifact loaded")
+        except ValueError:
+            pass
+        fallback = SimplePLCQAAssistant(artifact_path=path)
+        assert not isinstance(fallback.knowledge_base[0], LazyEntry)
+        del compiled, fallback
+    return True
+
+def test_batch_questions():
+    """Test that batch answering matches answering questions one at a time"""
+
+    print("\n🧪 Testing Batch Questions")
+    print("=" * 30)
+
+    questions = [
+        "What is retain memory?",
+        "How do I troubleshoot communication errors?",
+        "",
+        "profinett",
+        "unrelated gibberish xyzzy",
+        "What is retain memory?"
+    ]
+    for ranking in ["legacy", "bm25"]:
+        assistant = SimplePLCQAAssistant(ranking=ranking, cache_size=0)
+        batch = assistant.ask_questions(questions, k=5)
+        single = [assistant.ask_question(question, k=5) for question in questions]
+        for batch_result, single_result in zip(batch, single):
+            assert batch_result["answer"] == single_result["answer"]
+            assert [source["metadata"]["score"] for source in batch_result["sources"]] == \
+                [source["metadata"]["score"] for source in single_result["sources"]]
+        print(f"   ✅ {ranking}: {len(batch)} answers match")
+
+    # The sparse-matrix path and the per-question postings fallback give the same answers
+    if knowledge_index.sparse is None:
+        assert not os.getenv("PLC_REQUIRE_SCIPY"), "PLC_REQUIRE_SCIPY is set but numpy/scipy are not installed"
+        print("   ⚠️  numpy/scipy not installed, only the postings fallback was tested")
+        return True
+    sparse = knowledge_index.sparse
+    for ranking in ["legacy", "bm25"]:
+        assistant = SimplePLCQAAssistant(ranking=ranking, cache_size=0)
+        assert assistant.index.bm25_matrix is not None and assistant.index.tf_matrix is not None
+        batch = assistant.ask_questions(questions, k=5)
+        knowledge_index.sparse = None
+        try:
+            fallback = assistant.ask_questions(questions, k=5)
+        finally:
+            knowledge_index.sparse = sparse
+        for batch_result, fallback_result in zip(batch, fallback):
+            assert batch_result["answer"] == fallback_result["answer"]
+            assert [source["metadata"]["score"] for source in batch_result["sources"]] == \
+                [source["metadata"]["score"] for source in fallback_result["sources"]]
+        print(f"   ✅ {ranking}: sparse matrices match the postings fallback")
+    return True
+
+def test_fuzzy_matching():
+    """Test typo correction through the trigram index"""
+
+    print("\n🧪 Testing Fuzzy Matching")
+    print("=" * 30)
+
+    assert edit_distance("protal", "portal", 2) == 1
+    assert edit_distance("profinett", "profinet", 2) == 1
+    assert edit_distance("memory", "safety", 2) == 3
+
+    trigrams = TrigramIndex({"portal": 5, "profinet": 9, "total": 2})
+    assert trigrams.correct("protal") == "portal"
+    assert trigrams.correct("xyzzy") is None
+
+    assistant = SimplePLCQAAssistant(fuzzy=True)
+    cases = {
+        "profinett": "profinet",
+        "tia protal": "tia portal",
+        "tiaportal": "tia portal",
+        "s71500 memory": "s71500 memory",
+        "80878088": "80878088",
+        "error 16#8099": "error 16#8099"
+    }
+    for query, expected in cases.items():
+        corrected = assistant.index.correct_query(query)
+        assert corrected == expected, f"'{query}' corrected to '{corrected}'"
+        print(f"   ✅ '{query}' -> '{corrected}'")
+
+    result = assistant.ask_question("How do I configure profinett?")
+    assert result["sources"][0]["metadata"]["title"] == "PROFINET Communication"
+    # Run-together product names are indexed spellings rather than split corrections
+    assert assistant.search_knowledge("s71500 overview")[0]["title"] == "Siemens S7-1500 Overview"
+    assert SimplePLCQAAssistant().search_knowledge("profinett", ranking="bm25") == []
+    return True
+
+def test_error_code_lookup():
+    """Test that code questions resolve through the code table before general ranking"""
+
+    print("\n🧪 Testing Error Code Lookup")
+    print("=" * 30)
+
+    assert extract_query_codes("DW#16#808a or 0x8087, f7902") == ["16#808A", "F7902", "16#8087"]
+    assert extract_query_codes("PLC status 3501") == ["16#3501"]
+    assert extract_query_codes("what is 3501") == []
+    assert not SimplePLCQAAssistant().index.code_matches("what is 3501")
+
+    for ranking in ["legacy", "bm25"]:
+        assistant = SimplePLCQAAssistant(ranking=ranking)
+        for question in ["PROFINET error 16#8087", "What does 0x3501 mean?", "Drive shows F7121"]:
+            result = assistant.ask_question(question)
+            assert result["sources"][0]["metadata"]["title"] == "Specific Error Codes and Solutions", question
+            code = extract_query_codes(question)[0]
+            assert code.split("#")[-1] in result["answer"].upper(), result["answer"]
+        print(f"   ✅ {ranking}: code questions resolved")
+
+    assistant = SimplePLCQAAssistant()
+    assert "16#8000" in assistant.index.code_index
+    assert all("error_codes" not in result for result in assistant.search_knowledge("error 16#9999"))
+    return True
+
+def test_section_index():
+    """Test that large entries are split into sections answered on their own"""
+
+    print("\n🧪 Testing Section Index")
+    print("=" * 30)
+
+    assistant = SimplePLCQAAssistant()
+    index = assistant.index
+    doc_id = next(i for i, item in enumerate(assistant.knowledge_base) if item["title"] == "Practical Ladder Logic Examples")
+    titles = [index.sections[section_id].title for section_id in index.entry_sections[doc_id]]
+    assert "Example 3: Automatic Door Control" in titles, titles
+    assert all(index.sections[section_id].doc_id == doc_id for section_id in index.entry_sections[doc_id])
+
+    section = index.best_section(doc_id, {"door", "q0", "example"})
+    assert section.title == "Example 3: Automatic Door Control"
+    assert "Conveyor" not in index.section_text(section)
+
+    result = assistant.ask_question("What does Q0.2 do in the door example?")
+    top = result["sources"][0]["metadata"]
+    assert top["section"] == "Example 3: Automatic Door Control", top
+    assert "Conveyor" not in result["answer"]
+
+    # "Example N:" lines and title-case labels start sections even with no blank line after them
+    doc_id = next(i for i, item in enumerate(assistant.knowledge_base) if item["title"] == "Ladder Logic Programming Examples")
+    titles = [index.sections[section_id].title for section_id in index.entry_sections[doc_id]]
+    assert "Example 2: Timer-Based Sequence" in titles and "Example 3: Counter Application" in titles, titles
+    cases = {
+        "How do I program a timer in ladder logic?": ("Example 2: Timer-Based Sequence", "Network 1: Start Timer", "Counter"),
+        "How do I program a counter in ladder logic?": ("Example 3: Counter Application", "Network 2: Counter Output", "Timer")
+    }
+    for question, (section_title, expected, unexpected) in cases.items():
+        result = assistant.ask_question(question)
+        top = result["sources"][0]["metadata"]
+        assert top["title"] == "Ladder Logic Programming Examples" and top["section"] == section_title, top
+        assert expected in result["answer"] and unexpected not in result["answer"], result["answer"]
+        assert "Basic Ladder Logic Elements" not in result["answer"], result["answer"]
+
+    doc_id = next(i for i, item in enumerate(assistant.knowledge_base) if item["title"] == "Ladder Logic Troubleshooting Guide")
+    titles = [index.sections[section_id].title for section_id in index.entry_sections[doc_id]]
+    assert "3. Timer Programming Issues" in titles and "Common Troubleshooting Steps" in titles, titles
+    # Single-word labels such as "Correct:" stay inside their section
+    assert "Correct" not in titles and "Incorrect" not in titles, titles
+    print(f"   ✅ {len(index.sections)} sections across {len(assistant.knowledge_base)} entries")
+    return True
+
+def test_query_analyzer():
+    """Test PLC-aware tokenization, stopwords, stemming and the analysis memo"""
+
+    print("\n🧪 Testing Query Analyzer")
+    print("=" * 30)
+
+    analysis = analyze_query("Does I0.0 drive the Modules of an ET-200SP?")
+    assert analysis.terms == ("i0.0", "i0", "drive", "module", "et-200sp", "et", "200sp"), analysis.terms
+    assert analyze_query("PROFINET Fehler 16#8087 über").terms == ("profinet", "fehler", "16#8087", "16", "8087", "uber")
+    assert [stem(word) for word in ["entries", "devices", "status", "process", "s7"]] == ["entry", "device", "status", "process", "s7"]
+    assert all(stem(stem(word)) == stem(word) for word in ["modules", "entries", "analysis", "buses"])
+
+    # Compounds are indexed whole and by part, so both spellings find the same entry
+    assistant = SimplePLCQAAssistant(ranking="bm25")
+    assert "s7-1500" in assistant.index.bm25_weights and "16#8087" in assistant.index.bm25_weights
+    assert assistant.search_knowledge("S7-1500 CPU")[0]["title"] == assistant.search_knowledge("s7 1500 cpu")[0]["title"]
+
+    analyze_query.cache_clear()
+    assistant.ask_question("What is retain memory?")
+    assistant.ask_question("What is retain memory?", k=5)
+    stats = assistant.cache_stats()["analysis"]
+    assert stats["misses"] == 1 and stats["hits"] == 1, stats
+    print(f"   ✅ {analysis.terms}")
+    return True
+
+def test_phrase_queries():
+    """Test quoted phrases and proximity boosting from the positional postings"""
+
+    print("\n🧪 Testing Phrase Queries")
+    print("=" * 30)
+
+    assistant = SimplePLCQAAssistant(ranking="bm25")
+    index = assistant.index
+
+    for phrase in ["safety relay feedback", "optimized data block", "cycle time monitoring"]:
+        results = assistant.search_knowledge(f'"{phrase}"')
+        expected = {
+            doc_id for doc_id, item in enumerate(assistant.knowledge_base)
+            if phrase in " ".join(analyze_text(item["title"] + "\n" + item["content"]))
+        }
+        assert results and {result["id"] for result in results} <= expected, phrase
+        print(f"   ✅ \"{phrase}\" -> {[result['title'] for result in results]}")
+
+    # Word order matters and phrases never span two fields or keywords
+    assert assistant.search_knowledge('"relay safety"') == []
+    assert index.phrase_matches((("s7-1500", 0), ("s7", 0), ("1500", 1))) != {}
+    assert assistant.search_knowledge('"overview siemens"') == []
+
+    # Entries where the words stand together gain a proximity boost over the plain BM25 score
+    analysis = analyze_query("safety relay feedback")
+    plain = dict(index.bm25_top_k(analysis.terms, 10))
+    boosted = dict(index.proximity_rerank(list(plain.items()), list(analysis.terms), list(analysis.positions), 10))
+    phrase_entries = index.phrase_matches(analyze_query('"safety relay feedback"').phrases[0])
+    assert all(boosted[doc_id] > plain[doc_id] for doc_id in phrase_entries)
+    assert assistant.ask_questions(['"cycle time monitoring"'])[0]["sources"][0]["metadata"]["title"] == \
+        assistant.search_knowledge('"cycle time monitoring"')[0]["title"]
+
+    # Quoted and unquoted questions are cached apart, whichever is asked first
+    for phrase in ["safety relay feedback", "cycle time monitoring"]:
+        uncached = SimplePLCQAAssistant(ranking="bm25", cache_size=0).ask_question(f'"{phrase}"')
+        cached = SimplePLCQAAssistant(ranking="bm25")
+        cached.ask_question(phrase)
+        assert cached.ask_question(f'"{phrase}"')["sources"] == uncached["sources"], phrase
+    return True
+
+def test_synonym_expansion():
+    """Test that synonyms compiled into the index match every spelling without expanding queries"""
+
+    print("\n🧪 Testing Synonym Expansion")
+    print("=" * 30)
+
+    expander = SynonymExpander([("fbd", "function block diagram"), ("irt", "isochronous real-time")])
+    terms = positioned_terms(fold("Use FBD with IRT"))
+    assert set(expander.expand(terms)) == {
+        ("function", 1), ("block", 2), ("diagram", 3),
+        ("isochronous", 3), ("real-time", 4), ("real", 4), ("time", 5)
+    }
+    assert expander.keyword_variants("FBD editor") == ["function block diagram editor"]
+    assert expander.keyword_variants("fbds") == []
+
+    index = KnowledgeIndex([
+        {"title": "Editors", "keywords": ["fbd"], "content": "Graphical FBD networks"},
+        {"title": "Timing", "keywords": ["profinet"], "content": "Isochronous real-time cycles"},
+    ])
+    for query, doc_id in [("function block diagram", 0), ("irt cycles", 1), ("fbd", 0)]:
+        top = index.bm25_top_k(analyze_query(query).terms, 2)
+        assert top and top[0][0] == doc_id, (query, top)
+    assert index.phrase_matches(analyze_query('"fbd networks"').phrases[0]) == {0: 1}
+    assert index.phrase_matches(analyze_query('"graphical function block"').phrases[0]) == {0: 1}
+    assert index.keyword_matches("function block diagram basics") == {0}
+    # Aliases share the aliased word's position and do not lengthen the field
+    assert index.field_lengths["content"][0] == 3
+
+    assistant = SimplePLCQAAssistant(ranking="bm25")
+    for question, title in [
+        ("What is the function block diagram language?", "TIA Portal Programming"),
+        ("isochronous real-time communication", "PROFINET Communication"),
+        ("simatic s7-1500 cpu", "Siemens S7-1500 Overview"),
+    ]:
+        titles = [result["title"] for result in assistant.search_knowledge(question)]
+        assert title in titles, f"'{title}' not returned for '{question}': {titles}"
+        print(f"   ✅ {question} -> {titles[0]}")
+    return True
+
+def test_sharded_search():
+    """Test that searching shard processes returns the same answers as a single index"""
+
+    print("\n🧪 Testing Sharded Search")
+    print("=" * 30)
+
+    builtin = SimplePLCQAAssistant().knowledge_base
+    entries = [dict(item, title=f"{item['title']} #{i}") for i, item in enumerate(builtin * 3)]
+    questions = [
+        "How do I configure PROFINET communication?",
+        "PROFINET error 16#8087",
+        '"safety relay feedback"',
+        "What is the difference between optimized and non-optimized data blocks?",
+    ]
+
+    for ranking in ["legacy", "bm25"]:
+        single = SimplePLCQAAssistant.from_entries(entries, ranking=ranking, cache_size=0)
+        sharded = SimplePLCQAAssistant(ranking=ranking, cache_size=0)
+        sharded.start_shards(3, entries)
+        try:
+            assert sharded.ask_questions(questions, k=5) == [single.ask_question(question, k=5) for question in questions]
+            assert sharded.ask_question(questions[0]) == single.ask_question(questions[0])
+            assert [result["id"] for result in sharded.search_knowledge("ladder logic timers", k=10)] == \
+                [result["id"] for result in single.search_knowledge("ladder logic timers", k=10)]
+            # Comparison and address questions are looked up before fanning out, as in a single process
+            fact_questions = ["What is the difference between S7-1500 and S7-1200?", "What does Q0.2 do in the door example?"]
+            expected = [single.ask_question(question) for question in fact_questions]
+            assert "specs" in expected[0] and "cross_reference" in expected[1]
+            assert [sharded.ask_question(question) for question in fact_questions] == expected
+            assert sharded.ask_questions(fact_questions + questions[:1]) == expected + [single.ask_question(questions[0])]
+            explained = sharded.ask_question(questions[0], explain=True)["explain"]
+            assert explained["candidates"] == single.ask_question(questions[0], explain=True)["explain"]["candidates"]
+        finally:
+            sharded.stop_shards()
+        # Stopped, it searches the entries it was given with its own index
+        for question in ["retain memory", questions[0]]:
+            assert sharded.search_knowledge(question, k=5) == single.search_knowledge(question, k=5), question
+        print(f"   ✅ {ranking}: 3 shards match a single index")
+
+    try:
+        SimplePLCQAAssistant().start_shards(0)
+        assert False, "Expected ValueError for 0 shards"
+    except ValueError:
+        pass
+    return True
+
+def test_product_specs():
+    """Test that spec and comparison questions are answered from the product table"""
+
+    print("\n🧪 Testing Product Specs")
+    print("=" * 30)
+
+    specs = extract_specs("Memory: up to 5 MB work memory, 2 GB load memory\nCommunication: PROFINET, Ethernet", 7)
+    assert (specs["work_memory"].value, specs["work_memory"].unit, specs["work_memory"].text) == (5.0, "MB", "up to 5 MB")
+    assert specs["load_memory"].text == "2 GB" and specs["interfaces"].value == ("PROFINET", "Ethernet")
+
+    for ranking in ["legacy", "bm25"]:
+        assistant = SimplePLCQAAssistant(ranking=ranking)
+        result = assistant.ask_question("What is the difference between S7-1500 and S7-1200?")
+        assert result["answer"].splitlines()[0] == "S7-1500 vs S7-1200:", result["answer"]
+        assert "- Work memory: S7-1500 up to 5 MB | S7-1200 up to 100 KB" in result["answer"]
+        assert [source["metadata"]["title"] for source in result["sources"]] == \
+            ["Siemens S7-1500 Overview", "Siemens S7-1200 Overview"]
+        assert result["specs"]["S7-1200"]["load_memory"] == {"value": 4.0, "unit": "MB", "text": "4 MB"}
+
+        # Synonym spellings, restricted attributes and single-product facts
+        result = assistant.ask_question("compare memory of cpu 1200 and simatic s7-1500")
+        assert result["answer"].splitlines() == [
+            "S7-1200 vs S7-1500:",
+            "- Work memory: S7-1200 up to 100 KB | S7-1500 up to 5 MB",
+            "- Load memory: S7-1200 4 MB | S7-1500 2 GB"
+        ], result["answer"]
+        result = assistant.ask_question("Which interfaces does the S7-1200 have?")
+        assert result["answer"] == "S7-1200 specifications:\n- Interfaces: PROFINET, Ethernet, Serial", result["answer"]
+
+        # Other questions about products are still ranked
+        for question in ["How do I use retain memory on the S7-1500?", "How do I connect an S7-1500 to an S7-1200?"]:
+            assert "specs" not in assistant.ask_question(question), question
+        print(f"   ✅ {ranking}: spec questions answered from the table")
+
+    # Editing a product entry refreshes the table
+    assistant = SimplePLCQAAssistant(cache_size=0)
+    item = assistant.knowledge_base[1]
+    content = item["content"].replace("100 KB work memory", "150 KB work memory")
+    assistant.index.update_entries({1: dict(item, content=content)})
+    assert assistant.ask_question("S7-1200 work memory")["answer"].endswith("up to 150 KB")
+
+    # Facts render from what they were looked up in, even if a reload drops the product meanwhile
+    facts = assistant.index.product_specs.lookup("s7-1200 work memory")
+    assistant.index.update_entries({1: dict(item, title="Compact Controller Overview", content=content)})
+    assert "S7-1200" not in assistant.index.product_specs.products
+    assert spec_table(facts) == {"S7-1200": {"work_memory": {"value": 150.0, "unit": "KB", "text": "up to 150 KB"}}}
+    return True
+
+def test_address_cross_reference():
+    """Test that address and tag questions are answered from the ladder cross-reference"""
+
+    print("\n🧪 Testing Address Cross-Reference")
+    print("=" * 30)
+
+    content = """
+    Network 1: Latch
+    ──┤ Start ├──┤/Stop ├──┤ Motor ├──( Motor )──
+       I0.0       I0.1      Q0.0      Q0.0
+
+    Network 2: Delay
+    ──┤ T1.Q ├──( TON_Delay )──
+       Timer     T1, PT: T#2s
+    """
+    references = entry_references(0, content, [])
+    assert [(reference.tag, reference.role) for reference in references["q0.0"]] == [("Motor", "contact"), ("Motor", "coil")]
+    assert references["stop"][0].address == "I0.1" and references["stop"][0].role == "NC contact"
+    assert {reference.role for reference in references["t1"]} == {"contact", "timer"}
+    assert references["i0.0"][0].network == "Network 1: Latch"
+
+    for ranking in ["legacy", "bm25"]:
+        assistant = SimplePLCQAAssistant(ranking=ranking)
+        result = assistant.ask_question("What does Q0.2 do in the door example?")
+        lines = result["answer"].splitlines()
+        assert lines[0] == "Example 3: Automatic Door Control (Practical Ladder Logic Examples)", lines
+        assert "Q0.2: output (Door Open Light), coil Open_Light" in lines and "Network 4: Status Lights" in lines
+        assert not any("Fault" in line or "Counter" in line for line in lines), lines
+        assert [source["metadata"]["title"] for source in result["sources"]] == ["Practical Ladder Logic Examples"]
+
+        result = assistant.ask_question("Where is Safety_Feedback used?")
+        assert "Safety_Feedback: contact (I0.5), NC contact (I0.5)" in result["answer"], result["answer"]
+        assert {use["network"] for use in result["cross_reference"]} == \
+            {"Network 2: Safety Relay Control", "Network 4: Fault Detection"}
+        assert "OSSD1: contact (I0.0)" in assistant.ask_question("what is OSSD1")["answer"]
+
+        # Plain words are not tags, so other questions are still ranked
+        assert "cross_reference" not in assistant.ask_question("How do I reset the safety relay?")
+        print(f"   ✅ {ranking}: address questions answered from the cross-reference")
+
+    # Edited rungs are re-indexed incrementally
+    assistant = SimplePLCQAAssistant(cache_size=0)
+    doc_id = next(i for i, item in enumerate(assistant.knowledge_base) if item["title"] == "Practical Ladder Logic Examples")
+    item = assistant.knowledge_base[doc_id]
+    assistant.index.update_entries({doc_id: dict(item, content=item["content"].replace("Open_Light", "Door_Lamp"))})
+    assert "coil Door_Lamp" in assistant.ask_question("What does Q0.2 do in the door example?")["answer"]
+    assert "open_light" not in assistant.index.address_index
+    return True
+
+def test_explain_mode():
+    """Test that explained answers match plain ones and account for every score"""
+
+    print("\n🧪 Testing Explain Mode")
+    print("=" * 30)
+
+    for ranking in ["legacy", "bm25"]:
+        assistant = SimplePLCQAAssistant(ranking=ranking)
+        for question in ["How do I configure PROFINET communication?", "PROFINET error 16#8087", '"safety relay feedback"']:
+            plain = assistant.ask_question(question)
+            explained = assistant.ask_question(question, explain=True)
+            explain = explained.pop("explain")
+            assert explained == plain, question
+            assert list(explain["timings_ms"]) == ["analyze", "retrieve", "rank", "format", "extract", "total"]
+            assert [candidate["title"] for candidate in explain["candidates"]] == \
+                [source["metadata"]["title"] for source in plain["sources"]]
+            for candidate in explain["candidates"]:
+                total = candidate["keyword_hit"] + sum(term["contribution"] for term in candidate["terms"].values())
+                total += candidate.get("proximity", 0.0)
+                assert abs(total - candidate["score"]) < 0.01, (question, candidate)
+            print(f"   ✅ {ranking}: {question} ({explain['timings_ms']['total']} ms)")
+
+        # Explained answers bypass the cache
+        before = assistant.cache_stats()
+        assistant.ask_question("What is retain memory?", explain=True)
+        after = assistant.cache_stats()
+        assert (after["hits"], after["misses"], after["size"]) == (before["hits"], before["misses"], before["size"])
+
+    explain = SimplePLCQAAssistant(ranking="bm25").ask_question("S7-1500 work memory", explain=True)["explain"]
+    fields = explain["candidates"][0]["terms"]["s7-1500"]["fields"]
+    assert fields.get("title") and fields.get("keywords"), fields
+    return True
+
+def write_entry(directory: str, name: str, entry: dict):
+    """Write a knowledge entry file, bumping its mtime so every rewrite is seen as a change"""
+    path = os.path.join(directory, name)
+    previous = os.stat(path).st_mtime_ns if os.path.exists(path) else 0
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(entry, file)
+    os.utime(path, ns=(previous + 10**9, previous + 10**9))
+
+def test_knowledge_reload():
+    """Test that edited knowledge files are re-indexed incrementally and match a full rebuild"""
+
+    print("\n🧪 Testing Knowledge Reload")
+    print("=" * 30)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        write_entry(tmp_dir, "tracking.json", {
+            "title": "Conveyor Tracking",
+            "keywords": ["conveyor tracking"],
+            "content": "Track parts on a conveyor with an encoder and a zebraflux shift register."
+        })
+        assistant = SimplePLCQAAssistant(ranking="bm25", artifact_path="", knowledge_dir=tmp_dir)
+        index = assistant.index
+        builtin_count = len(assistant.knowledge_base) - 1
+        doc_id = next(i for i, item in enumerate(assistant.knowledge_base) if item["title"] == "Data Blocks and Memory")
+        original = assistant.knowledge_base[doc_id]
+        assert assistant.search_knowledge("zebraflux")[0]["title"] == "Conveyor Tracking"
+        assert assistant.reload_knowledge()["changed"] == 0
+
+        # Edit the added entry and override a built-in one by title
+        version = index.version
+        write_entry(tmp_dir, "tracking.json", {
+            "title": "Conveyor Tracking",
+            "keywords": ["conveyor tracking"],
+            "content": "Track parts with a quixotron FIFO and PROFINET IRT timing."
+        })
+        write_entry(tmp_dir, "data_blocks.json", {
+            "title": "Data Blocks and Memory",
+            "keywords": ["retain"],
+            "content": "Retentive data survives a power cycle; see the blorptastic checklist."
+        })
+        stats = assistant.reload_knowledge()
+        assert stats["changed"] == 2 and index.version != version, stats
+        assert not assistant.search_knowledge("zebraflux")
+        assert assistant.search_knowledge("quixotron")[0]["title"] == "Conveyor Tracking"
+        assert len(assistant.knowledge_base) == builtin_count + 1
+        assert assistant.search_knowledge("blorptastic")[0]["id"] == doc_id
+
+        # Changed entries weigh exactly what a full build over the same entries gives them
+        rebuilt = KnowledgeIndex(list(assistant.knowledge_base))
+        for term in ["quixotron", "blorptastic", "retain", "profinet"]:
+            assert set(index.bm25_weights[term]) == set(rebuilt.bm25_weights[term]), term
+            for entry_id in {doc_id, builtin_count}:
+                expected = rebuilt.bm25_weights[term].get(entry_id, 0.0)
+                assert abs(index.bm25_weights[term].get(entry_id, 0.0) - expected) < 1e-9, term
+        assert index.keyword_matches("conveyor tracking") == rebuilt.keyword_matches("conveyor tracking")
+        assert assistant.ask_questions(["quixotron fifo"])[0]["sources"][0]["metadata"]["title"] == "Conveyor Tracking"
+
+        # A failed index update leaves the file unapplied, so the next poll retries it
+        write_entry(tmp_dir, "retry.json", {"title": "Retry Entry", "keywords": [], "content": "Flumbergast retry."})
+        update_entries = index.update_entries
+        def failing_update(changes):
+            raise RuntimeError("update failed")
+        index.update_entries = failing_update
+        try:
+            assistant.reload_knowledge()
+            raise AssertionError("Failed update was not reported")
+        except RuntimeError:
+            pass
+        finally:
+            index.update_entries = update_entries
+        assert not assistant.search_knowledge("flumbergast")
+        assert assistant.reload_knowledge()["changed"] == 1
+        assert assistant.search_knowledge("flumbergast")[0]["title"] == "Retry Entry"
+        os.remove(os.path.join(tmp_dir, "retry.json"))
+        assert assistant.reload_knowledge()["deleted"] == 1
+
+        # Deleting the files removes the addition and restores the built-in entry
+        os.remove(os.path.join(tmp_dir, "tracking.json"))
+        os.remove(os.path.join(tmp_dir, "data_blocks.json"))
+        assert assistant.reload_knowledge()["deleted"] == 2
+        assert not assistant.search_knowledge("quixotron") and not assistant.search_knowledge("blorptastic")
+        assert assistant.knowledge_base[doc_id] is original
+        print(f"   ✅ Reloads applied (version {index.version})")
+
+    return True
+
+def test_index_updates():
+    """Test that index updates publish whole versions, do not count removed entries and periodically rebuild"""
+
+    print("\n🧪 Testing Index Updates")
+    print("=" * 30)
+
+    entries = [{"title": "Starter Note", "keywords": [], "content": "Motor starter note."}]
+    entries += [{"title": f"Bracket Note {i}", "keywords": [], "content": "Motor starter bracket note."} for i in range(3)]
+    entries.append({"title": "Zorbium Relay", "keywords": ["zorbium"], "content": "The zorbium relay latches the motor starter."})
+    index = KnowledgeIndex(entries)
+    rebuilt = KnowledgeIndex(entries[:4])
+
+    # A snapshot keeps reading the version it was taken from after an update is published
+    snapshot = index.snapshot()
+    index.update_entries({4: None})
+    assert snapshot.entries[4]["title"] == "Zorbium Relay" and snapshot.keyword_matches("zorbium") == {4}
+    assert 4 in snapshot.bm25_weights["motor"] and snapshot.code_index is not index.code_index
+    assert "zorbium" not in index.bm25_weights and not index.keyword_matches("zorbium")
+
+    # The removed entry's placeholder does not count towards N
+    assert snapshot.num_docs == 5 and index.num_docs == 4 and len(index.entries) == 5
+    assert abs(index.idf["motor"] - rebuilt.idf["motor"]) < 1e-9
+    assert index.avg_field_lengths == rebuilt.avg_field_lengths
+
+    # Terms no update touched keep a stale idf until the MAX_INCREMENTAL_UPDATES-th update rebuilds the index
+    while index.updates_since_build < knowledge_index.MAX_INCREMENTAL_UPDATES - 1:
+        index.update_entries({0: entries[0]})
+    assert index.idf["bracket"] != rebuilt.idf["bracket"]
+    index.update_entries({0: entries[0]})
+    assert index.updates_since_build == 0 and index.num_docs == 4
+    assert abs(index.idf["bracket"] - rebuilt.idf["bracket"]) < 1e-9
+
+    # A question reads one pinned version even if an update is published meanwhile
+    assistant = SimplePLCQAAssistant.from_entries(entries)
+    with assistant.consistent_index():
+        assistant.live_index.update_entries({4: None})
+        assert assistant.search_knowledge("zorbium")[0]["title"] == "Zorbium Relay"
+        assert assistant.knowledge_base[4]["title"] == "Zorbium Relay"
+    assert not assistant.search_knowledge("zorbium") and not assistant.knowledge_base[4]["title"]
+    print(f"   ✅ Rebuilt after {knowledge_index.MAX_INCREMENTAL_UPDATES} updates (N = {index.num_docs})")
+
+    return True
+
+def main():
+    """Run all tests"""
+
+    print("🚀 Simple PLC QA Assistant Test Suite")
+    print("=" * 60)
+
+    tests = [
+        ("Inverted Index", test_inverted_index),
+        ("Knowledge Search", test_search_knowledge),
+        ("BM25 Ranking", test_bm25_ranking),
+        ("Keyword Automaton", test_keyword_automaton),
+        ("Answer Extraction", test_answer_extraction),
+        ("Top-k Selection", test_top_k_selection),
+        ("Answer Cache", test_answer_cache),
+        ("Knowledge Artifact", test_knowledge_artifact),
+        ("Batch Questions", test_batch_questions),
+        ("Fuzzy Matching", test_fuzzy_matching),
+        ("Error Code Lookup", test_error_code_lookup),
+        ("Section Index", test_section_index),
+        ("Query Analyzer", test_query_analyzer),
+        ("Phrase Queries", test_phrase_queries),
+        ("Synonym Expansion", test_synonym_expansion),
+        ("Sharded Search", test_sharded_search),
+        ("Product Specs", test_product_specs),
+        ("Address Cross-Reference", test_address_cross_reference),
+        ("Explain Mode", test_explain_mode),
+        ("Knowledge Reload", test_knowledge_reload),
+        ("Index Updates", test_index_updates)
+    ]
+
+    passed = 0
+    total = len(tests)
+
+    for test_name, test_func in tests:
+        print(f"\n🧪 Running {test_name} test...")
+        try:
+            if test_func():
+                passed += 1
+                print(f"✅ {test_name} test PASSED")
+            else:
+                print(f"❌ {test_name} test FAILED")
+        except Exception as e:
+            print(f"❌ {test_name} test FAILED with exception: {e}")
+
+    print(f"\n📊 Test Results: {passed}/{total} tests passed")
+
+    if passed == total:
+        print("🎉 All tests passed! The simple assistant is working correctly.")
+        return 0
+    else:
+        print("⚠️  Some tests failed. Check the output above for details.")
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -10,7 +10,7 @@ import json
 import threading
 import time
 from datetime import datetime
-from plc_qa_assistant import SiemensPLCQAAssistant
+from plc_qa_assistant import SiemensPLCQAAssistant, configure_embedding_threads
 import logging
 
 # Configure logging
@@ -35,6 +35,7 @@ def initialize_assistant():
         initialization_status["status"] = "initializing"
         initialization_status["message"] = "Creating assistant instance..."
         
+        configure_embedding_threads()
         assistant = SiemensPLCQAAssistant()
         
         initialization_status["message"] = "Loading documents..."